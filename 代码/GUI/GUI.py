@@ -1,31 +1,85 @@
+from perf import PERF, STARTUP  # First, so startup timing covers every import below
+
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
-import serial
-import serial.tools.list_ports
+from tkinter import ttk, messagebox, scrolledtext, filedialog
+import logging
 import threading
 import time
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib
-import csv
-import os
-from datetime import datetime
+from collections import deque
+import numpy as np
+
+from history_loader import HistoryLoader
+from ingest import ARCHIVE_DIR, ROLLUP_FILE, ROSTER_FILE, WAL_FILE, IngestPipeline, available_ports, format_record
+from ingest_queue import IngestQueue, QueueConsumer, WriteAheadLog
+from intensity import DEFAULT_MODEL, IntensityModel, IntensityScorer
+from live_chart import IncrementalPlot, StripChart
+from live_metrics import LiveMetricsHub
+from record_store import RecordStore
+from rollups import METRICS, Roster, RollupStore, day_date, today
+from running_stats import StatsEngine
+from serial_reader import read_chunks
+from session_archive import SessionArchive
+from telemetry import STREAM_OFF, STREAM_ON, FrameDecoder, HeartRate, Jump, SessionStart
+from virtual_table import VirtualTable
+
+log = logging.getLogger(__name__)
+
+# matplotlib and pyserial are imported on first use; matplotlib alone is most of a cold start
+_chart_backend = None
+
 
-# Configure matplotlib to support English display
-matplotlib.rcParams["font.family"] = ["Arial", "sans-serif"]
-matplotlib.rcParams["axes.unicode_minus"] = False  # Fix minus sign display issue
+def chart_backend():
+    """Import matplotlib with the TkAgg canvas and toolbar; returns (Figure, canvas class, toolbar class)"""
+    global _chart_backend
+    if _chart_backend is None:
+        start = time.perf_counter()
+        import matplotlib
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+
+        # Configure matplotlib to support English display
+        matplotlib.rcParams["font.family"] = ["Arial", "sans-serif"]
+        matplotlib.rcParams["axes.unicode_minus"] = False  # Fix minus sign display issue
+        _chart_backend = (Figure, FigureCanvasTkAgg, NavigationToolbar2Tk)
+        STARTUP.record("chart imports", time.perf_counter() - start)
+    return _chart_backend
+
+
+STARTUP.mark("imports")
 
 
 class SmartRopeApp(tk.Tk):
-    def __init__(self):
+    # Import the chart stack on a background thread once the main page is up
+    PRELOAD_CHART = True
+    # Ingest queue between the reader and parsing/storage: lines held, what to drop when full, and
+    # seconds between checkpoints (session file and archive written, write-ahead log marked)
+    QUEUE_LINES = 20000
+    OVERFLOW_POLICY = "drop_oldest"
+    CHECKPOINT_INTERVAL = 1.0
+
+    def __init__(self, startup_log=None, exit_after_paint=False):
         super().__init__()
+        self.startup_log = startup_log  # JSON lines file that startup timings are appended to
+        self.exit_after_paint = exit_after_paint
         self.title("Smart Jump Rope Data Visualization Tool")
         self.geometry("800x600")
         self.configure(bg="#f0f0f0")
 
         # Data storage
-        self.serial_data = []  # Stores data received from serial port
-        self.data_by_mode = {0: [], 1: [], 2: []}  # Data categorized by exercise mode
+        self.records = RecordStore()  # Columnar store of data received from serial port, indexed by mode
+        self.stats = StatsEngine()  # Running statistics per (mode, metric)
+        self.live_metrics = LiveMetricsHub()  # Rolling in-session metrics from streamed telemetry
+        self.intensity = IntensityScorer()  # Intensity scores of stored records, cached per model
+        self.intensity_model = DEFAULT_MODEL
+        self.roster = Roster(ROSTER_FILE)  # Athlete using each port, and their teams
+        self._rollups = None  # Per-athlete rollups, loaded on first use
+        # Ingest pipeline, write-ahead log and consumer; set up by start_ingest() once the main page is painted
+        self.pipeline = None
+        self.wal = None
+        self.ingest_queue = None
+        self.consumer = None
+        self.recovered_lines = 0
+        self.ingest_listeners = []  # Called with every parsed batch on the consumer thread
         self.current_plot_mode = 0  # Currently selected exercise mode
         self.current_y_axis = "exerciseDuration"  # Currently selected Y-axis data
 
@@ -33,19 +87,136 @@ class SmartRopeApp(tk.Tk):
         self.container = tk.Frame(self)
         self.container.pack(fill="both", expand=True)
 
-        # Create three pages
+        # Pages are built the first time they are shown; only MainPage is needed to paint
         self.frames = {}
-        for F in (MainPage, SerialPage, ChartPage):
-            frame = F(self.container, self)
-            self.frames[F] = frame
-            frame.grid(row=0, column=0, sticky="nsew")
+        self.current_frame = None
 
         # Show main page initially
         self.show_frame(MainPage)
+        self.frames[MainPage].bind("<Map>", self.on_first_map)
+        STARTUP.mark("app init")
+
+        # Make sure buffered data reaches disk when the window is closed
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    @property
+    def rollups(self):
+        """Per-(athlete, mode, day) aggregates behind the leaderboard"""
+        if self._rollups is None:
+            self._rollups = RollupStore(ROLLUP_FILE, self.roster)
+        return self._rollups
+
+    def start_ingest(self):
+        """Open the archive, catch up the rollups, replay the write-ahead log and start the consumer.
+
+        Runs once, right after the first paint or before the first page
+        other than MainPage is built, so crash recovery and the leaderboard
+        never depend on the Serial page having been opened.
+        """
+        if self.pipeline is not None:
+            return
+        start = time.perf_counter()
+        archive = SessionArchive(ARCHIVE_DIR)
+        rollups = self.rollups
+        try:
+            # Catch up on archived records the rollups missed, e.g. after a crash
+            rollups.sync(archive)
+        except Exception:
+            # The leaderboard falls behind until the next sync; ingest itself still works
+            log.exception("Could not bring the rollups up to date with the archive")
+        self.pipeline = IngestPipeline(records=self.records,
+                                       stats=self.stats,
+                                       archive=archive,
+                                       rollups=rollups,
+                                       on_error=self.report_save_error,
+                                       defer_writes=True)
+
+        # Serial reader threads only queue lines; parsing and storage run on the consumer
+        self.wal = WriteAheadLog(WAL_FILE)
+        self.ingest_queue = IngestQueue(self.QUEUE_LINES, self.OVERFLOW_POLICY, wal=self.wal)
+        self.consumer = QueueConsumer(self.ingest_queue, self.process_lines, on_checkpoint=self.pipeline.flush,
+                                      on_error=self.report_ingest_error,
+                                      checkpoint_interval=self.CHECKPOINT_INTERVAL, name="SerialConsumer")
+        self.recovered_lines = self.consumer.replay(self.wal.recover())
+        self.consumer.start()
+        STARTUP.record("start ingest", time.perf_counter() - start)
+
+    def stop_ingest(self):
+        """Process what is still queued and close the session file, archive and log"""
+        if self.consumer is None:
+            return
+        self.consumer.stop()
+        self.pipeline.close()
+        self.wal.close()
+
+    @PERF.timed("serial.process", items=lambda self, lines, *args: len(lines))
+    def process_lines(self, lines, timestamp=None, device=None):
+        """Parse, store and save a batch of queued lines, then show it (consumer thread)"""
+        batch = self.pipeline.process_lines(lines, timestamp, device=device)
+        for listener in self.ingest_listeners:
+            listener(batch)
+
+    def report_save_error(self, error):
+        """Session file writes failed; the rows are retried on the next flush"""
+        page = self.frames.get(SerialPage)
+        if page is not None:
+            page.status_var.set(f"Error saving data: {str(error)}")
+
+    def report_ingest_error(self, device, error):
+        """Errors raised on the consumer thread; device is None for checkpoint errors"""
+        page = self.frames.get(SerialPage)
+        if page is not None:
+            page.report_ingest_error(device, error)
+
+    def get_frame(self, cont):
+        """The page of class cont, built on first use"""
+        frame = self.frames.get(cont)
+        if frame is None:
+            if cont is not MainPage:
+                self.start_ingest()
+            start = time.perf_counter()
+            frame = cont(self.container, self)
+            self.frames[cont] = frame
+            frame.grid(row=0, column=0, sticky="nsew")
+            STARTUP.record(f"build {cont.__name__}", time.perf_counter() - start)
+        return frame
 
     def show_frame(self, cont):
-        frame = self.frames[cont]
+        frame = self.get_frame(cont)
         frame.tkraise()
+        self.current_frame = cont
+
+    def on_first_map(self, event):
+        """Main page is mapped; measure first paint once Tk has drawn it"""
+        self.frames[MainPage].unbind("<Map>")
+        self.after_idle(self.on_first_paint)
+
+    def on_first_paint(self):
+        self.update_idletasks()
+        STARTUP.mark("first paint")
+        if self.startup_log:
+            try:
+                STARTUP.append_to(self.startup_log)
+            except Exception:
+                log.warning("Could not save startup times to %s", self.startup_log, exc_info=True)
+        if self.exit_after_paint:
+            self.destroy()
+            return
+        self.after_idle(self.start_ingest)
+        if self.PRELOAD_CHART:
+            preload = threading.Thread(target=chart_backend, name="ChartPreload")
+            preload.daemon = True
+            preload.start()
+
+    def on_close(self):
+        """Disconnect, flush pending data and exit"""
+        if SerialPage in self.frames:
+            self.frames[SerialPage].disconnect()
+        try:
+            self.stop_ingest()
+        except Exception as e:
+            messagebox.showerror("Error", f"Error closing data file: {str(e)}")
+        self.destroy()
 
 
 class MainPage(tk.Frame):
@@ -92,6 +263,19 @@ class MainPage(tk.Frame):
                                  bg="#2196F3", fg="white")
         chart_button.pack(side=tk.LEFT, padx=20)
 
+        # Leaderboard page button
+        leaderboard_button = tk.Button(button_frame, text="Leaderboard",
+                                       font=("Arial", 14), width=15, height=2,
+                                       command=lambda: controller.show_frame(LeaderboardPage),
+                                       bg="#FF9800", fg="white")
+        leaderboard_button.pack(side=tk.LEFT, padx=20)
+
+        # Diagnostics page link
+        diagnostics_button = tk.Button(self, text="Performance Diagnostics", font=("Arial", 10),
+                                       command=lambda: controller.show_frame(DiagnosticsPage),
+                                       bg="#e0e0e0", bd=0)
+        diagnostics_button.pack(pady=5)
+
         # Footer information
         footer_label = tk.Label(self, text="© 2025 Smart Jump Rope Analysis System",
                                 font=("Arial", 10), bg="#f0f0f0")
@@ -99,12 +283,30 @@ class MainPage(tk.Frame):
 
 
 class SerialPage(tk.Frame):
+    # Serial reading: "chunked" bulk reads with our own line framing, or "line" for readline()
+    READ_MODE = "chunked"
+    READ_CHUNK_SIZE = 4096
+    READ_TIMEOUT = 0.1
+    # UI refresh: records are coalesced into one update every UI_INTERVAL ms
+    UI_INTERVAL = 100
+    LOG_LINES = 500  # Lines kept in the received-data log
+    TABLE_ROWS = 10
+
     def __init__(self, parent, controller):
         tk.Frame.__init__(self, parent, bg="#f0f0f0")
         self.controller = controller
         self.serial_port = None
+        self.device_name = None  # Port the current records come from
         self.serial_thread = None
         self.stop_thread = threading.Event()
+        # Records and messages waiting for the next UI refresh; the oldest are dropped under bursts
+        self.ui_pending = deque(maxlen=self.LOG_LINES)
+        self.log_line_count = 0
+        PERF.gauge("ui.pending", lambda: len(self.ui_pending))
+        # Streaming telemetry: listeners get (device, events) from the reader thread
+        self.telemetry_listeners = [controller.live_metrics.on_events]
+        self.live_jumps = None
+        self.live_heart_rate = None
 
         # Create navigation bar
         nav_frame = tk.Frame(self, bg="#e0e0e0", height=40)
@@ -118,6 +320,11 @@ class SerialPage(tk.Frame):
                                  bg="#e0e0e0", bd=0, font=("Arial", 10))
         chart_button.pack(side=tk.LEFT, padx=10, pady=5)
 
+        diagnostics_button = tk.Button(nav_frame, text="Diagnostics",
+                                       command=lambda: controller.show_frame(DiagnosticsPage),
+                                       bg="#e0e0e0", bd=0, font=("Arial", 10))
+        diagnostics_button.pack(side=tk.LEFT, padx=10, pady=5)
+
         # Create serial settings frame
         settings_frame = tk.LabelFrame(self, text="Serial Settings", font=("Arial", 12), bg="#f0f0f0")
         settings_frame.pack(fill="x", padx=20, pady=10)
@@ -146,6 +353,24 @@ class SerialPage(tk.Frame):
                                         bg="#4CAF50", fg="white", font=("Arial", 10))
         self.connect_button.grid(row=0, column=5, padx=20, pady=10)
 
+        # Ask the rope to stream per-jump and heart rate frames during a session
+        self.stream_var = tk.BooleanVar(value=False)
+        stream_check = tk.Checkbutton(settings_frame, text="Stream Telemetry", variable=self.stream_var,
+                                      bg="#f0f0f0", font=("Arial", 10), command=self.send_stream_command)
+        stream_check.grid(row=0, column=6, padx=10, pady=10)
+
+        # Who is jumping with the rope on this port; saved in the roster on connect
+        tk.Label(settings_frame, text="Athlete:", font=("Arial", 10), bg="#f0f0f0").grid(row=1, column=0, padx=10,
+                                                                                         pady=(0, 10))
+        self.athlete_var = tk.StringVar()
+        tk.Entry(settings_frame, textvariable=self.athlete_var, width=17).grid(row=1, column=1, padx=10, pady=(0, 10))
+        tk.Label(settings_frame, text="Team:", font=("Arial", 10), bg="#f0f0f0").grid(row=1, column=3, padx=10,
+                                                                                      pady=(0, 10))
+        self.team_var = tk.StringVar()
+        tk.Entry(settings_frame, textvariable=self.team_var, width=12).grid(row=1, column=4, padx=10, pady=(0, 10))
+        self.port_combobox.bind("<<ComboboxSelected>>", self.show_athlete)
+        self.show_athlete()
+
         # Create data display area
         data_frame = tk.LabelFrame(self, text="Received Data", font=("Arial", 12), bg="#f0f0f0")
         data_frame.pack(fill="both", expand=True, padx=20, pady=10)
@@ -155,14 +380,11 @@ class SerialPage(tk.Frame):
                                                    font=("Arial", 10))
         self.data_text.pack(fill="both", expand=True, padx=10, pady=10)
 
-        # Create data table
+        # Create data table; only the visible rows exist as widgets
         columns = ("Mode", "Duration (s)", "Avg HR", "Max HR", "Frequency", "Jumps")
-        self.data_table = ttk.Treeview(data_frame, columns=columns, show="headings", height=10)
-
-        for col in columns:
-            self.data_table.heading(col, text=col)
-            self.data_table.column(col, width=100, anchor=tk.CENTER)
-
+        self.data_table = VirtualTable(data_frame, columns,
+                                       row_count_fn=lambda: len(self.controller.records),
+                                       row_fn=self.table_row, height=self.TABLE_ROWS, bg="#f0f0f0")
         self.data_table.pack(fill="both", expand=True, padx=10, pady=10)
 
         # Create status bar
@@ -174,31 +396,50 @@ class SerialPage(tk.Frame):
                                      bg="#e0e0e0", font=("Arial", 10))
         self.status_label.pack(side=tk.LEFT, padx=10, pady=5)
 
+        self.telemetry_var = tk.StringVar(value="")
+        self.telemetry_label = tk.Label(status_frame, textvariable=self.telemetry_var,
+                                        bg="#e0e0e0", font=("Arial", 10))
+        self.telemetry_label.pack(side=tk.LEFT, padx=10, pady=5)
+
         self.data_count_var = tk.StringVar(value="Data Count: 0")
         self.data_count_label = tk.Label(status_frame, textvariable=self.data_count_var,
                                          bg="#e0e0e0", font=("Arial", 10))
         self.data_count_label.pack(side=tk.RIGHT, padx=10, pady=5)
 
-        # Initialize data file
-        self.init_data_file()
+        # Show every batch the app's ingest consumer stores
+        controller.ingest_listeners.append(self.show_batch)
+        if controller.recovered_lines:
+            self.log_message(f"Recovered {controller.recovered_lines} lines received before the last shutdown\n")
 
-    def init_data_file(self):
-        """Initialize data storage file"""
-        if not os.path.exists("JumpRopeData"):
-            os.makedirs("JumpRopeData")
-        self.data_file = os.path.join("JumpRopeData", f"JumpRopeData_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
-        with open(self.data_file, 'w', newline='', encoding='utf-8-sig') as file:
-            writer = csv.writer(file)
-            writer.writerow(["Mode", "Duration (s)", "Avg HR", "Max HR", "Frequency", "Jumps", "Record Time"])
+        # Start periodic UI refresh
+        self.after(self.UI_INTERVAL, self.flush_ui)
 
     def refresh_ports(self):
         """Refresh available serial ports"""
-        ports = serial.tools.list_ports.comports()
-        port_list = [port.device for port in ports]
+        port_list = available_ports()
         self.port_combobox['values'] = port_list
         if port_list:
             self.port_combobox.current(0)
 
+    def show_athlete(self, event=None):
+        """Fill in the athlete and team the roster has for the selected port"""
+        roster = self.controller.roster
+        user = roster.devices.get(self.port_var.get(), "")
+        self.athlete_var.set(user)
+        self.team_var.set(roster.team(user) or "" if user else "")
+
+    def assign_athlete(self, port):
+        """Save who jumps with the rope on port, so their records roll up under their name"""
+        roster = self.controller.roster
+        user = self.athlete_var.get().strip()
+        team = self.team_var.get().strip()
+        if user == roster.devices.get(port, "") and (not user or team == (roster.team(user) or "")):
+            return
+        try:
+            roster.assign(port, user, team)
+        except Exception as e:
+            self.status_var.set(f"Error saving roster: {str(e)}")
+
     def toggle_connection(self):
         """Toggle serial connection status"""
         if self.serial_port and self.serial_port.is_open:
@@ -216,10 +457,15 @@ class SerialPage(tk.Frame):
             return
 
         try:
-            self.serial_port = serial.Serial(port, baudrate, timeout=1)
+            import serial
+
+            self.serial_port = serial.Serial(port, baudrate, timeout=self.READ_TIMEOUT)
+            self.device_name = port
+            self.assign_athlete(port)
             if self.serial_port.is_open:
                 self.connect_button.config(text="Disconnect", bg="#f44336")
                 self.status_var.set(f"Connected to {port}")
+                self.send_stream_command()
 
                 # Start serial reading thread
                 self.stop_thread.clear()
@@ -233,113 +479,170 @@ class SerialPage(tk.Frame):
         """Disconnect from serial port"""
         if self.serial_port and self.serial_port.is_open:
             self.stop_thread.set()
-            if self.serial_thread and self.serial_thread.is_alive:
+            if self.serial_thread and self.serial_thread.is_alive():
                 self.serial_thread.join(timeout=1.0)
             self.serial_port.close()
             self.connect_button.config(text="Connect", bg="#4CAF50")
             self.status_var.set("Disconnected")
+        self.flush_data_file()
+
+    def send_stream_command(self):
+        """Switch telemetry streaming on the connected rope on or off"""
+        if not (self.serial_port and self.serial_port.is_open):
+            return
+        try:
+            self.serial_port.write(STREAM_ON if self.stream_var.get() else STREAM_OFF)
+        except Exception as e:
+            self.status_var.set(f"Error sending command: {str(e)}")
+
+    def flush_data_file(self):
+        """Write any buffered records to the session file at the consumer's next checkpoint"""
+        self.controller.consumer.request_checkpoint()
 
     def read_serial_data(self):
         """Thread function to read data from serial port"""
+        if self.READ_MODE == "line":
+            self.read_serial_lines()
+            return
+
+        # Telemetry frames are split off here; only text lines reach process_lines
+        framer = FrameDecoder(on_events=self.process_events)
         while not self.stop_thread.is_set():
             try:
-                if self.serial_port.in_waiting:
-                    line = self.serial_port.readline().decode('utf-8').strip()
-                    if line:
-                        self.process_data(line)
+                read_chunks(self.serial_port, self.stop_thread, self.enqueue_lines,
+                            framer=framer, chunk_size=self.READ_CHUNK_SIZE)
             except Exception as e:
                 self.status_var.set(f"Error reading data: {str(e)}")
                 time.sleep(0.1)
 
-    def process_data(self, data_line):
-        """Process received data"""
-        try:
-            # Parse data
-            parts = data_line.split(',')
-            if len(parts) == 6:
-                mode, duration, avg_hr, max_hr, freq, count = map(float, parts)
-                mode = int(mode)
-                duration = int(duration)
-                avg_hr = int(avg_hr)
-                max_hr = int(max_hr)
-                count = int(count)
-
-                # Add to data list
-                record_time = datetime.now().strftime('%H:%M:%S')
-                data_entry = {
-                    "mode": mode,
-                    "exerciseDuration": duration,
-                    "avgHeartRate": avg_hr,
-                    "maxHeartRate": max_hr,
-                    "finalFrequency": freq,
-                    "finalJumpCount": count,
-                    "recordTime": record_time
-                }
-
-                self.controller.serial_data.append(data_entry)
-                self.controller.data_by_mode[mode].append(data_entry)
-
-                # Update UI
+    def read_serial_lines(self):
+        """Read one line at a time with readline() (no telemetry support)"""
+        while not self.stop_thread.is_set():
+            try:
+                line = self.serial_port.readline().decode('utf-8').strip()
+                if line:
+                    self.process_data(line)
+            except Exception as e:
+                self.status_var.set(f"Error reading data: {str(e)}")
+                time.sleep(0.1)
+
+    def enqueue_lines(self, lines):
+        """Hand lines from the reader thread to the consumer; never blocks"""
+        self.controller.ingest_queue.put(self.device_name, time.time(), lines)
+
+    def show_batch(self, batch):
+        """Queue the records of a stored batch for the log (consumer thread)"""
+        # While the queue is backlogged only the table is kept current
+        if self.controller.ingest_queue.backlogged:
+            self.log_message(f"{len(batch)} records stored (log skipped while catching up)\n")
+        else:
+            for data_entry in batch.records():
                 self.update_ui(data_entry)
 
-                # Save to file
-                self.save_to_file(data_entry)
-            else:
-                self.data_text.insert(tk.END, f"Format error: {data_line}\n")
-                self.data_text.see(tk.END)
+        for data_line in batch.malformed:
+            self.log_message(f"Format error: {data_line}\n")
+
+    @PERF.timed("serial.events", items=lambda self, events: len(events))
+    def process_events(self, events):
+        """Handle a batch of decoded telemetry events"""
+        try:
+            for listener in self.telemetry_listeners:
+                listener(self.device_name, events)
+            for event in events:
+                kind = type(event)
+                if kind is Jump:
+                    self.live_jumps = event.count
+                elif kind is HeartRate:
+                    self.live_heart_rate = event.avg
+                elif kind is SessionStart:
+                    self.live_jumps = 0
+                    self.live_heart_rate = None
         except Exception as e:
-            self.data_text.insert(tk.END, f"Error processing data: {str(e)}\n")
-            self.data_text.see(tk.END)
+            self.log_message(f"Error processing telemetry: {str(e)}\n")
+
+    def process_data(self, data_line):
+        """Process received data"""
+        self.enqueue_lines([data_line])
+
+    def report_ingest_error(self, device, error):
+        """Errors raised on the consumer thread; device is None for checkpoint errors"""
+        if device is None:
+            self.status_var.set(f"Error saving data: {str(error)}")
+        else:
+            self.log_message(f"Error processing data: {str(error)}\n")
+
+    def log_message(self, text):
+        """Queue a message for the data log from any thread"""
+        self.ui_pending.append(text)
 
     def update_ui(self, data):
-        """Update UI display"""
-        self.after(0, lambda: self._update_ui(data))
-
-    def _update_ui(self, data):
-        """Update UI in main thread"""
-        # Update text display
-        display_text = (f"Mode: {data['mode']}, "
-                        f"Duration: {data['exerciseDuration']}s, "
-                        f"Avg HR: {data['avgHeartRate']}BPM, "
-                        f"Max HR: {data['maxHeartRate']}BPM, "
-                        f"Frequency: {data['finalFrequency']:.1f} jumps/min, "
-                        f"Jumps: {data['finalJumpCount']}\n")
-        self.data_text.insert(tk.END, display_text)
-        self.data_text.see(tk.END)
-
-        # Update table
-        mode_text = ["Timer Mode", "Countdown Mode", "Target Count Mode"][data['mode']]
-        self.data_table.insert("", tk.END, values=(
-            mode_text,
-            data['exerciseDuration'],
-            data['avgHeartRate'],
-            data['maxHeartRate'],
-            data['finalFrequency'],
-            data['finalJumpCount']
-        ))
-
-        # Update data count
-        self.data_count_var.set(f"Data Count: {len(self.controller.serial_data)}")
-
-    def save_to_file(self, data):
-        """Save data to CSV file"""
+        """Queue a record for the next UI refresh"""
+        self.ui_pending.append(data)
+
+    @PERF.timed("ui.flush")
+    def flush_ui(self):
+        """Show everything queued since the last refresh in one batch"""
         try:
-            with open(self.data_file, 'a', newline='', encoding='utf-8-sig') as file:
-                writer = csv.writer(file)
-                writer.writerow([
-                    data['mode'],
-                    data['exerciseDuration'],
-                    data['avgHeartRate'],
-                    data['maxHeartRate'],
-                    data['finalFrequency'],
-                    data['finalJumpCount'],
-                    data['recordTime']
-                ])
-        except Exception as e:
-            self.status_var.set(f"Error saving data: {str(e)}")
+            PERF.observe("ui.pending", len(self.ui_pending))
+            items = []
+            while self.ui_pending:
+                items.append(self.ui_pending.popleft())
+
+            if items:
+                # Update text display, keeping only the last LOG_LINES lines
+                text = ''.join(item if isinstance(item, str) else format_record(item) for item in items)
+                self.data_text.insert(tk.END, text)
+                self.log_line_count += len(items)
+                excess = self.log_line_count - self.LOG_LINES
+                if excess > 0:
+                    self.data_text.delete("1.0", f"{excess + 1}.0")
+                    self.log_line_count -= excess
+                self.data_text.see(tk.END)
+
+            # Update table and data count
+            self.data_table.refresh()
+            count = f"Data Count: {len(self.controller.records)}"
+            queue = self.controller.ingest_queue
+            if queue.backlogged:
+                count += f", {len(queue)} lines queued"
+            if queue.dropped_lines:
+                count += f", {queue.dropped_lines} lines dropped"
+            self.data_count_var.set(count)
+            if self.live_jumps is not None:
+                heart_rate = f"{self.live_heart_rate} BPM" if self.live_heart_rate else "-"
+                self.telemetry_var.set(f"Live: {self.live_jumps} jumps, HR {heart_rate}")
+        finally:
+            self.after(self.UI_INTERVAL, self.flush_ui)
+
+    def table_row(self, index):
+        """Values of one data table row, read from the record store"""
+        data = self.controller.records.record(index)
+        return (["Timer Mode", "Countdown Mode", "Target Count Mode"][data['mode']],
+                data['exerciseDuration'],
+                data['avgHeartRate'],
+                data['maxHeartRate'],
+                data['finalFrequency'],
+                data['finalJumpCount'])
 
 
 class ChartPage(tk.Frame):
+    # Target frame rate for live updates while data is arriving
+    LIVE_FPS = 10
+    # Show value labels only when at most this many points are in view
+    ANNOTATE_LIMIT = 60
+    # Minimum seconds between full redraws while history is still loading
+    HISTORY_REDRAW_INTERVAL = 1.0
+
+    MODE_NAMES = ['Timer Mode', 'Countdown Mode', 'Target Count Mode']
+    Y_LABELS = {
+        "exerciseDuration": "Duration (s)",
+        "avgHeartRate": "Average Heart Rate (BPM)",
+        "maxHeartRate": "Maximum Heart Rate (BPM)",
+        "finalFrequency": "Jumping Frequency (jumps/min)",
+        "finalJumpCount": "Jumps",
+        "intensity": "Intensity Level (1-10)"
+    }
+
     def __init__(self, parent, controller):
         tk.Frame.__init__(self, parent, bg="#f0f0f0")
         self.controller = controller
@@ -357,6 +660,11 @@ class ChartPage(tk.Frame):
                                   bg="#e0e0e0", bd=0, font=("Arial", 10))
         serial_button.pack(side=tk.LEFT, padx=10, pady=5)
 
+        diagnostics_button = tk.Button(nav_frame, text="Diagnostics",
+                                       command=lambda: controller.show_frame(DiagnosticsPage),
+                                       bg="#e0e0e0", bd=0, font=("Arial", 10))
+        diagnostics_button.pack(side=tk.LEFT, padx=10, pady=5)
+
         # Create chart control area
         control_frame = tk.LabelFrame(self, text="Chart Settings", font=("Arial", 12), bg="#f0f0f0")
         control_frame.pack(fill="x", padx=20, pady=10)
@@ -386,7 +694,8 @@ class ChartPage(tk.Frame):
             "avgHeartRate": "Average Heart Rate",
             "maxHeartRate": "Maximum Heart Rate",
             "finalFrequency": "Jumping Frequency",
-            "finalJumpCount": "Jumps"
+            "finalJumpCount": "Jumps",
+            "intensity": "Intensity"
         }
 
         for key, value in y_axis_options.items():
@@ -398,94 +707,147 @@ class ChartPage(tk.Frame):
                                    bg="#4CAF50", fg="white", font=("Arial", 10))
         refresh_button.grid(row=0, column=4, padx=20, pady=10)
 
+        reset_view_button = tk.Button(control_frame, text="Reset View", command=lambda: self.plot.reset_view(),
+                                      bg="#f0f0f0", font=("Arial", 10))
+        reset_view_button.grid(row=0, column=5, padx=10, pady=10)
+
+        # History mode: also plot records from earlier session files
+        self.history_var = tk.BooleanVar(value=False)
+        self.history_loader = None
+        self.history_plotted = 0  # History records of the plotted mode on the chart
+        self.history_redrawn = 0.0
+        history_check = tk.Checkbutton(control_frame, text="Include History", variable=self.history_var,
+                                       bg="#f0f0f0", font=("Arial", 10), command=self.toggle_history)
+        history_check.grid(row=0, column=6, padx=10, pady=10)
+        self.history_status_var = tk.StringVar(value="")
+        tk.Label(control_frame, textvariable=self.history_status_var, font=("Arial", 9),
+                 bg="#f0f0f0").grid(row=1, column=6, padx=10)
+
+        # Live session: strip chart of streamed cadence and heart rate, built when first shown
+        self.live_var = tk.BooleanVar(value=False)
+        self.strip = None
+        self.strip_version = None  # LiveMetrics.version last drawn
+        live_check = tk.Checkbutton(control_frame, text="Live Session", variable=self.live_var,
+                                    bg="#f0f0f0", font=("Arial", 10), command=self.toggle_live_session)
+        live_check.grid(row=1, column=4, padx=10)
+
+        weights_button = tk.Button(control_frame, text="Intensity Weights...", command=self.edit_intensity_model,
+                                   bg="#f0f0f0", font=("Arial", 10))
+        weights_button.grid(row=1, column=5, padx=10)
+
         # Create chart area
         chart_frame = tk.LabelFrame(self, text="Data Chart", font=("Arial", 12), bg="#f0f0f0")
         chart_frame.pack(fill="both", expand=True, padx=20, pady=10)
 
         # Create chart
-        self.figure = plt.Figure(figsize=(8, 6), dpi=100)
-        self.chart = self.figure.add_subplot(111)
+        Figure, FigureCanvasTkAgg, NavigationToolbar2Tk = chart_backend()
+        self.figure = Figure(figsize=(8, 6), dpi=100)
         self.canvas = FigureCanvasTkAgg(self.figure, chart_frame)
+        # Pan/zoom toolbar; the plot re-decimates whatever range is in view
+        self.toolbar = NavigationToolbar2Tk(self.canvas, chart_frame, pack_toolbar=False)
+        self.toolbar.update()
+        self.toolbar.pack(side=tk.BOTTOM, fill="x")
         self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        self.plot = IncrementalPlot(self.figure, self.canvas, annotate_limit=self.ANNOTATE_LIMIT)
+        self.chart = self.plot.axes
+        self.plotted_series = None  # (mode, y_axis) currently on the chart
 
         # Create statistics area
-        stats_frame = tk.LabelFrame(self, text="Statistics", font=("Arial", 12), bg="#f0f0f0")
-        stats_frame.pack(fill="x", padx=20, pady=10)
+        self.stats_frame = tk.LabelFrame(self, text="Statistics", font=("Arial", 12), bg="#f0f0f0")
+        self.stats_frame.pack(fill="x", padx=20, pady=10)
 
-        self.stats_text = tk.Text(stats_frame, height=4, font=("Arial", 10), wrap=tk.WORD)
+        self.stats_text = tk.Text(self.stats_frame, height=5, font=("Arial", 10), wrap=tk.WORD)
         self.stats_text.pack(fill="both", expand=True, padx=10, pady=10)
         self.stats_text.config(state=tk.DISABLED)
 
-        # Initial chart update
+        # Initial chart update, then follow incoming records live
+        self.update_chart()
+        self.after(int(1000 / self.LIVE_FPS), self.refresh_live)
+
+    def toggle_history(self):
+        """Start loading past session files the first time history is switched on"""
+        if self.history_var.get() and self.history_loader is None:
+            self.history_loader = HistoryLoader(devices=self.controller.records.devices,
+                                                exclude=[self.controller.pipeline.data_file])
+            self.history_loader.start()
         self.update_chart()
 
+    def toggle_live_session(self):
+        """Show or hide the strip chart of the session in progress"""
+        if not self.live_var.get():
+            self.strip_frame.pack_forget()
+            return
+        if self.strip is None:
+            self.strip_frame = tk.LabelFrame(self, text="Live Session", font=("Arial", 12), bg="#f0f0f0")
+            self.live_status_var = tk.StringVar(value="")
+            tk.Label(self.strip_frame, textvariable=self.live_status_var, font=("Arial", 9),
+                     bg="#f0f0f0").pack(side=tk.TOP, anchor=tk.W, padx=10)
+            Figure, FigureCanvasTkAgg, _ = chart_backend()
+            figure = Figure(figsize=(8, 2), dpi=100)
+            canvas = FigureCanvasTkAgg(figure, self.strip_frame)
+            canvas.get_tk_widget().pack(fill="both", expand=True, padx=10, pady=5)
+            self.strip = StripChart(figure, canvas)
+        self.strip_frame.pack(fill="x", padx=20, pady=5, before=self.stats_frame)
+        self.strip_version = None
+        self.refresh_strip()
+
+    def refresh_strip(self):
+        """Redraw the strip chart when new telemetry has arrived"""
+        engine = self.controller.live_metrics.engine()
+        if engine is None:
+            self.live_status_var.set("Waiting for telemetry (enable Stream Telemetry on the serial page)")
+            return
+        if engine.version == self.strip_version:
+            return
+        self.strip_version = engine.version
+        live = engine.snapshot()
+        self.strip.update(*engine.series(), live["min_freq"], live["max_freq"])
+
+        heart_rate = f"{live['heart_rate']} BPM" if live["heart_rate"] is not None else "-"
+        state = "Session" if live["active"] else "Last session"
+        self.live_status_var.set(
+            f"{state}: {live['t_ms'] / 1000:.0f}s, {live['jumps']} jumps, "
+            f"cadence {live['cadence']:.0f}/min, HR {heart_rate}, "
+            f"out of band {(live['below_ms'] + live['above_ms']) / 1000:.1f}s "
+            f"(below {live['below_ms'] / 1000:.1f}s, above {live['above_ms'] / 1000:.1f}s)")
+
+    def history_records(self):
+        """Record store of loaded history, or None when history is off"""
+        if self.history_var.get() and self.history_loader is not None:
+            return self.history_loader.records
+        return None
+
+    @PERF.timed("chart.update")
     def update_chart(self):
         """Update chart display"""
         # Get current selections
         mode = self.mode_var.get()
         y_axis = self.y_axis_var.get()
 
-        # Get data for selected mode
-        data = self.controller.data_by_mode.get(mode, [])
-
-        # Clear chart
-        self.chart.clear()
+        # Get data for selected mode, history first
+        records = self.controller.records
+        history = self.history_records()
+        history_count = history.mode_count(mode) if history else 0
+        count = history_count + records.mode_count(mode)
 
         # If data exists, plot the chart
-        if data:
+        if count:
             # Prepare X and Y axis data
-            x_data = list(range(1, len(data) + 1))
-            y_data = [entry[y_axis] for entry in data]
-
-            # Set Y-axis label mapping
-            y_labels = {
-                "exerciseDuration": "Duration (s)",
-                "avgHeartRate": "Average Heart Rate (BPM)",
-                "maxHeartRate": "Maximum Heart Rate (BPM)",
-                "finalFrequency": "Jumping Frequency (jumps/min)",
-                "finalJumpCount": "Jumps"
-            }
-
-            # Plot chart
-            self.chart.plot(x_data, y_data, 'o-', color='#2196F3')
-            self.chart.set_title(
-                f"{['Timer Mode', 'Countdown Mode', 'Target Count Mode'][mode]} - {y_labels[y_axis]} Trend",
-                fontsize=14)
-            self.chart.set_xlabel("Record Number", fontsize=12)
-            self.chart.set_ylabel(y_labels[y_axis], fontsize=12)
-            self.chart.grid(True, linestyle='--', alpha=0.7)
-
-            # Add data labels
-            for x, y in zip(x_data, y_data):
-                self.chart.annotate(f'{y}', (x, y), textcoords="offset points",
-                                    xytext=(0, 10), ha='center')
-
-            # Calculate statistics
-            if y_axis in ["avgHeartRate", "maxHeartRate", "finalFrequency", "finalJumpCount", "exerciseDuration"]:
-                avg_value = sum(y_data) / len(y_data)
-                max_value = max(y_data)
-                min_value = min(y_data)
-
-                # Update statistics
-                self.stats_text.config(state=tk.NORMAL)
-                self.stats_text.delete(1.0, tk.END)
-                self.stats_text.insert(tk.END,
-                                       f"Data Points: {len(data)}\n"
-                                       f"Average: {avg_value:.2f}\n"
-                                       f"Maximum: {max_value}\n"
-                                       f"Minimum: {min_value}")
-                self.stats_text.config(state=tk.DISABLED)
+            y_data = self.series_column(records, mode, y_axis)
+            if history_count:
+                y_data = np.concatenate((self.series_column(history, mode, y_axis, 0, history_count), y_data))
+            count = len(y_data)
+            x_data = np.arange(1, count + 1)
+
+            self.plot.set_series(
+                x_data, y_data,
+                title=f"{self.MODE_NAMES[mode]} - {self.Y_LABELS[y_axis]} Trend",
+                xlabel="Record Number",
+                ylabel=self.Y_LABELS[y_axis])
+            self.update_stats(mode, y_axis)
         else:
             # Show message when no data available
-            self.chart.text(0.5, 0.5, 'No data available. Please receive data via serial port first.',
-                            horizontalalignment='center',
-                            verticalalignment='center',
-                            transform=self.chart.transAxes,
-                            fontsize=14,
-                            color='red',
-                            alpha=0.7)
-            self.chart.set_title("Data Chart", fontsize=14)
-            self.chart.axis('off')
+            self.plot.show_message('No data available. Please receive data via serial port first.')
 
             # Clear statistics
             self.stats_text.config(state=tk.NORMAL)
@@ -493,11 +855,429 @@ class ChartPage(tk.Frame):
             self.stats_text.insert(tk.END, "No data available")
             self.stats_text.config(state=tk.DISABLED)
 
-        # Update canvas
-        self.figure.tight_layout()
-        self.canvas.draw()
+        self.plotted_series = (mode, y_axis)
+        self.history_plotted = history_count
+        self.history_redrawn = time.monotonic()
+
+    @PERF.timed("chart.live")
+    def refresh_live(self):
+        """Append records that arrived since the last frame"""
+        try:
+            if self.live_var.get():
+                self.refresh_strip()
+            mode, y_axis = self.plotted_series
+            history = self.history_records()
+            if history is not None:
+                self.update_history_status()
+                # Newly loaded history goes before the live records, so redraw (throttled)
+                if (history.mode_count(mode) != self.history_plotted and
+                        time.monotonic() - self.history_redrawn >= self.HISTORY_REDRAW_INTERVAL):
+                    self.update_chart()
+                    return
+
+            count = self.controller.records.mode_count(mode)
+            plotted = len(self.plot) - self.history_plotted
+            if count > plotted:
+                if not len(self.plot):
+                    self.update_chart()
+                else:
+                    y_new = self.series_column(self.controller.records, mode, y_axis, plotted, count)
+                    start = self.history_plotted + plotted
+                    self.plot.extend(np.arange(start + 1, start + len(y_new) + 1), y_new)
+                    self.update_stats(mode, y_axis)
+        finally:
+            self.after(int(1000 / self.LIVE_FPS), self.refresh_live)
+
+    def update_history_status(self):
+        """Show history loading progress"""
+        loader = self.history_loader
+        if loader.error is not None:
+            self.history_status_var.set(f"History error: {loader.error}")
+        elif loader.done.is_set():
+            self.history_status_var.set(f"{loader.files_loaded} files in {loader.load_time:.1f}s")
+        else:
+            self.history_status_var.set(f"Loading {loader.files_loaded}/{loader.files_total} files")
+
+    def series_column(self, store, mode, y_axis, start=0, end=None):
+        """Y values of a mode from a record store; intensity is scored with the current model"""
+        if y_axis == "intensity":
+            return self.controller.intensity.mode_column(store, mode, self.controller.intensity_model, start, end)
+        return store.mode_column(mode, y_axis, start, end)
+
+    def edit_intensity_model(self):
+        """Dialog for the weights and normalization ranges of the intensity score"""
+        dialog = tk.Toplevel(self)
+        dialog.title("Intensity Weights")
+        dialog.configure(bg="#f0f0f0")
+        dialog.transient(self)
+
+        for column, text in enumerate(("Metric", "Weight", "Min", "Max")):
+            tk.Label(dialog, text=text, font=("Arial", 10, "bold"), bg="#f0f0f0").grid(row=0, column=column,
+                                                                                      padx=5, pady=5)
+        model = self.controller.intensity_model
+        entries = {}
+        for row, (metric, low, high, weight) in enumerate(model.terms, start=1):
+            tk.Label(dialog, text=self.Y_LABELS[metric], font=("Arial", 10), bg="#f0f0f0").grid(
+                row=row, column=0, padx=5, sticky=tk.W)
+            variables = [tk.StringVar(value=f"{value:g}") for value in (weight, low, high)]
+            for column, variable in enumerate(variables, start=1):
+                tk.Entry(dialog, textvariable=variable, width=8).grid(row=row, column=column, padx=5, pady=2)
+            entries[metric] = variables
+
+        def apply():
+            try:
+                weights = {metric: float(variables[0].get()) for metric, variables in entries.items()}
+                ranges = {metric: (float(variables[1].get()), float(variables[2].get()))
+                          for metric, variables in entries.items()}
+                self.controller.intensity_model = IntensityModel(ranges, weights)
+            except ValueError as e:
+                messagebox.showerror("Error", f"Invalid intensity model: {str(e)}", parent=dialog)
+                return
+            dialog.destroy()
+            if self.y_axis_var.get() == "intensity":
+                self.update_chart()
+
+        def reset():
+            for metric, low, high, weight in DEFAULT_MODEL.terms:
+                for variable, value in zip(entries[metric], (weight, low, high)):
+                    variable.set(f"{value:g}")
+
+        button_frame = tk.Frame(dialog, bg="#f0f0f0")
+        button_frame.grid(row=len(entries) + 1, column=0, columnspan=4, pady=10)
+        tk.Button(button_frame, text="Firmware Defaults", command=reset,
+                  bg="#f0f0f0", font=("Arial", 10)).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="Apply", command=apply,
+                  bg="#4CAF50", fg="white", font=("Arial", 10)).pack(side=tk.LEFT, padx=5)
+
+    def intensity_summary(self, mode):
+        """Statistics of the intensity scores of a mode, live and loaded history"""
+        # Kept up to date per model as records arrive; only a new model starts from scratch
+        intensity = self.controller.intensity
+        model = self.controller.intensity_model
+        history = self.history_records()
+        others = (intensity.stats(history, model),) if history is not None else ()
+        return intensity.stats(self.controller.records, model).combined_summary(mode, "intensity", *others)
+
+    def update_stats(self, mode, y_axis):
+        """Show running statistics for the selected mode and Y-axis"""
+        history = self.history_loader if self.history_records() is not None else None
+        if y_axis == "intensity":
+            summary = self.intensity_summary(mode)
+        elif history is not None:
+            summary = self.controller.stats.combined_summary(mode, y_axis, history.stats)
+        else:
+            summary = self.controller.stats.summary(mode, y_axis)
+        if not summary:
+            return
+
+        self.stats_text.config(state=tk.NORMAL)
+        self.stats_text.delete(1.0, tk.END)
+        self.stats_text.insert(tk.END,
+                               f"Data Points: {summary['count']}\n"
+                               f"Average: {summary['mean']:.2f} (Std Dev: {summary['std']:.2f})\n"
+                               f"Maximum: {summary['max']:g}\n"
+                               f"Minimum: {summary['min']:g}\n"
+                               f"P50 / P90 / P99: {summary['p50']:.1f} / {summary['p90']:.1f} / {summary['p99']:.1f}")
+        self.stats_text.config(state=tk.DISABLED)
+
+
+class LeaderboardPage(tk.Frame):
+    # Milliseconds between leaderboard refreshes while the page is shown
+    REFRESH_INTERVAL = 2000
+    TREND_DAYS = 14
+
+    MODES = {"All Modes": None, "Timer Mode": 0, "Countdown Mode": 1, "Target Count Mode": 2}
+    PERIODS = {"All Time": None, "Today": 1, "Last 7 Days": 7, "Last 30 Days": 30}
+
+    def __init__(self, parent, controller):
+        tk.Frame.__init__(self, parent, bg="#f0f0f0")
+        self.controller = controller
+        self.metric_names = {label: name for name, (label, _) in METRICS.items()}
+
+        # Create navigation bar
+        nav_frame = tk.Frame(self, bg="#e0e0e0", height=40)
+        nav_frame.pack(fill="x")
+
+        home_button = tk.Button(nav_frame, text="Home", command=lambda: controller.show_frame(MainPage),
+                                bg="#e0e0e0", bd=0, font=("Arial", 10))
+        home_button.pack(side=tk.LEFT, padx=10, pady=5)
+
+        serial_button = tk.Button(nav_frame, text="Serial Connection",
+                                  command=lambda: controller.show_frame(SerialPage),
+                                  bg="#e0e0e0", bd=0, font=("Arial", 10))
+        serial_button.pack(side=tk.LEFT, padx=10, pady=5)
+
+        chart_button = tk.Button(nav_frame, text="Chart Analysis", command=lambda: controller.show_frame(ChartPage),
+                                 bg="#e0e0e0", bd=0, font=("Arial", 10))
+        chart_button.pack(side=tk.LEFT, padx=10, pady=5)
+
+        # Create leaderboard controls
+        control_frame = tk.LabelFrame(self, text="Leaderboard Settings", font=("Arial", 12), bg="#f0f0f0")
+        control_frame.pack(fill="x", padx=20, pady=10)
+
+        self.metric_var = tk.StringVar(value=METRICS["jumps"][0])
+        self.mode_var = tk.StringVar(value="All Modes")
+        self.period_var = tk.StringVar(value="All Time")
+        for column, (text, variable, values, width) in enumerate((
+                ("Metric:", self.metric_var, list(self.metric_names), 28),
+                ("Mode:", self.mode_var, list(self.MODES), 16),
+                ("Period:", self.period_var, list(self.PERIODS), 12))):
+            tk.Label(control_frame, text=text, font=("Arial", 10), bg="#f0f0f0").grid(row=0, column=column * 2,
+                                                                                      padx=(10, 2), pady=10)
+            combobox = ttk.Combobox(control_frame, textvariable=variable, values=values, width=width,
+                                    state="readonly")
+            combobox.grid(row=0, column=column * 2 + 1, padx=(0, 10), pady=10)
+            combobox.bind("<<ComboboxSelected>>", lambda event: self.update_tables())
+
+        self.teams_var = tk.BooleanVar(value=False)
+        teams_check = tk.Checkbutton(control_frame, text="Rank Teams", variable=self.teams_var,
+                                     bg="#f0f0f0", font=("Arial", 10), command=self.update_tables)
+        teams_check.grid(row=0, column=6, padx=10, pady=10)
+
+        # Create ranking table
+        ranking_frame = tk.LabelFrame(self, text="Ranking", font=("Arial", 12), bg="#f0f0f0")
+        ranking_frame.pack(fill="both", expand=True, padx=20, pady=10)
+
+        columns = ("Rank", "Name", "Value", "Sessions")
+        self.ranking_table = ttk.Treeview(ranking_frame, columns=columns, show="headings", height=10)
+        for index, col in enumerate(columns):
+            self.ranking_table.heading(col, text=col)
+            self.ranking_table.column(col, width=200 if index == 1 else 90, anchor=tk.W if index == 1 else tk.E)
+        self.ranking_table.pack(fill="both", expand=True, padx=10, pady=10)
+        self.ranking_table.bind("<<TreeviewSelect>>", lambda event: self.update_trend())
+
+        # Create trend table for the selected athlete
+        self.trend_frame = tk.LabelFrame(self, text="Trend", font=("Arial", 12), bg="#f0f0f0")
+        self.trend_frame.pack(fill="x", padx=20, pady=10)
+
+        columns = ("Day", "Value")
+        self.trend_table = ttk.Treeview(self.trend_frame, columns=columns, show="headings", height=7)
+        for index, col in enumerate(columns):
+            self.trend_table.heading(col, text=col)
+            self.trend_table.column(col, width=200 if index == 0 else 90, anchor=tk.W if index == 0 else tk.E)
+        self.trend_table.pack(fill="x", padx=10, pady=10)
+
+        self.update_tables()
+        self.after(self.REFRESH_INTERVAL, self.refresh)
+
+    def selection(self):
+        """Metric, mode and first day (or None) currently selected"""
+        metric = self.metric_names[self.metric_var.get()]
+        mode = self.MODES[self.mode_var.get()]
+        days = self.PERIODS[self.period_var.get()]
+        return metric, mode, today() - days + 1 if days else None
+
+    def refresh(self):
+        """Update the ranking while the page is shown"""
+        try:
+            if self.controller.current_frame is LeaderboardPage:
+                self.update_tables()
+        finally:
+            self.after(self.REFRESH_INTERVAL, self.refresh)
+
+    def update_tables(self):
+        """Rank athletes or teams from the rollups, keeping the selected row"""
+        metric, mode, since = self.selection()
+        selected = self.selected_name()
+        ranking = self.controller.rollups.leaderboard(metric, mode, since, teams=self.teams_var.get(), limit=None)
+
+        self.ranking_table.delete(*self.ranking_table.get_children())
+        for rank, (name, value, sessions) in enumerate(ranking, start=1):
+            item = self.ranking_table.insert("", tk.END, values=(rank, name, f"{value:.1f}", sessions))
+            if name == selected:
+                self.ranking_table.selection_set(item)
+        self.update_trend()
+
+    def selected_name(self):
+        selection = self.ranking_table.selection()
+        return self.ranking_table.item(selection[0], "values")[1] if selection else None
+
+    def update_trend(self):
+        """Show the selected athlete's metric for each of the last TREND_DAYS days"""
+        self.trend_table.delete(*self.trend_table.get_children())
+        name = self.selected_name()
+        if name is None or self.teams_var.get():
+            self.trend_frame.config(text="Trend (select an athlete)")
+            return
+        metric, mode, _ = self.selection()
+        self.trend_frame.config(text=f"Trend: {name}, last {self.TREND_DAYS} days")
+        days, values = self.controller.rollups.trend(name, metric, mode, self.TREND_DAYS)
+        for day, value in zip(reversed(days), reversed(values)):
+            self.trend_table.insert("", tk.END, values=(day_date(day).strftime('%Y-%m-%d %a'),
+                                                        "-" if value is None else f"{value:.1f}"))
+
+
+class DiagnosticsPage(tk.Frame):
+    # Milliseconds between table refreshes while the page is shown
+    REFRESH_INTERVAL = 1000
+
+    PROBE_LABELS = {
+        "serial.read": "Serial read",
+        "serial.process": "Process lines",
+        "serial.events": "Telemetry events",
+        "ingest.process": "Ingest (parse + store + save)",
+        "ingest.parse": "Parse",
+        "ingest.store": "Store",
+        "ingest.save": "Save (queue rows)",
+        "writer.flush": "Session file write",
+        "archive.append": "Archive append",
+        "ui.flush": "UI update",
+        "chart.update": "Chart update",
+        "chart.live": "Chart live refresh",
+        "chart.draw": "Chart full draw",
+        "chart.blit": "Chart blit",
+        "chart.strip": "Live strip chart",
+        "metrics.events": "Live metrics update",
+    }
+    GAUGE_LABELS = {
+        "serial.in_waiting": "Serial input buffer (bytes)",
+        "ui.pending": "UI queue (items)",
+        "writer.pending": "Session file queue (rows)",
+        "ingest.queue": "Ingest queue (lines)",
+        "ingest.dropped": "Dropped on overflow (lines)",
+    }
+
+    def __init__(self, parent, controller):
+        tk.Frame.__init__(self, parent, bg="#f0f0f0")
+        self.controller = controller
+
+        # Create navigation bar
+        nav_frame = tk.Frame(self, bg="#e0e0e0", height=40)
+        nav_frame.pack(fill="x")
+
+        home_button = tk.Button(nav_frame, text="Home", command=lambda: controller.show_frame(MainPage),
+                                bg="#e0e0e0", bd=0, font=("Arial", 10))
+        home_button.pack(side=tk.LEFT, padx=10, pady=5)
+
+        serial_button = tk.Button(nav_frame, text="Serial Connection",
+                                  command=lambda: controller.show_frame(SerialPage),
+                                  bg="#e0e0e0", bd=0, font=("Arial", 10))
+        serial_button.pack(side=tk.LEFT, padx=10, pady=5)
+
+        chart_button = tk.Button(nav_frame, text="Chart Analysis", command=lambda: controller.show_frame(ChartPage),
+                                 bg="#e0e0e0", bd=0, font=("Arial", 10))
+        chart_button.pack(side=tk.LEFT, padx=10, pady=5)
+
+        # Create instrumentation controls
+        control_frame = tk.LabelFrame(self, text="Instrumentation", font=("Arial", 12), bg="#f0f0f0")
+        control_frame.pack(fill="x", padx=20, pady=10)
+
+        self.enabled_var = tk.BooleanVar(value=PERF.enabled)
+        enable_check = tk.Checkbutton(control_frame, text="Enable timing", variable=self.enabled_var,
+                                      bg="#f0f0f0", font=("Arial", 10), command=self.toggle_enabled)
+        enable_check.grid(row=0, column=0, padx=10, pady=10)
+
+        reset_button = tk.Button(control_frame, text="Reset", command=self.reset,
+                                 bg="#f0f0f0", font=("Arial", 10))
+        reset_button.grid(row=0, column=1, padx=10, pady=10)
+
+        dump_button = tk.Button(control_frame, text="Dump to File...", command=self.dump,
+                                bg="#4CAF50", fg="white", font=("Arial", 10))
+        dump_button.grid(row=0, column=2, padx=10, pady=10)
+
+        self.status_var = tk.StringVar(value="")
+        tk.Label(control_frame, textvariable=self.status_var, font=("Arial", 10),
+                 bg="#f0f0f0").grid(row=0, column=3, padx=10, pady=10)
+
+        # Startup milestones and one-off page build times
+        self.startup_var = tk.StringVar(value="")
+        tk.Label(control_frame, textvariable=self.startup_var, font=("Arial", 9), bg="#f0f0f0",
+                 justify=tk.LEFT, wraplength=700).grid(row=1, column=0, columnspan=4, padx=10, sticky=tk.W)
+
+        # Create latency table
+        timing_frame = tk.LabelFrame(self, text="Latency", font=("Arial", 12), bg="#f0f0f0")
+        timing_frame.pack(fill="both", expand=True, padx=20, pady=10)
+
+        columns = ("Stage", "Calls", "Items", "Mean (ms)", "P50 (ms)", "P90 (ms)", "P99 (ms)", "Max (ms)")
+        self.timing_table = ttk.Treeview(timing_frame, columns=columns, show="headings", height=12)
+        for index, col in enumerate(columns):
+            self.timing_table.heading(col, text=col)
+            self.timing_table.column(col, width=200 if index == 0 else 70, anchor=tk.W if index == 0 else tk.E)
+        self.timing_table.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # Create queue depth table
+        queue_frame = tk.LabelFrame(self, text="Queue Depths", font=("Arial", 12), bg="#f0f0f0")
+        queue_frame.pack(fill="x", padx=20, pady=10)
+
+        columns = ("Queue", "Current", "Peak")
+        self.queue_table = ttk.Treeview(queue_frame, columns=columns, show="headings", height=5)
+        for index, col in enumerate(columns):
+            self.queue_table.heading(col, text=col)
+            self.queue_table.column(col, width=200 if index == 0 else 70, anchor=tk.W if index == 0 else tk.E)
+        self.queue_table.pack(fill="x", padx=10, pady=10)
+
+        self.after(self.REFRESH_INTERVAL, self.refresh)
+
+    def toggle_enabled(self):
+        """Switch timing on or off"""
+        PERF.enabled = self.enabled_var.get()
+        self.update_tables()
+
+    def reset(self):
+        """Clear all counters"""
+        PERF.reset()
+        self.update_tables()
+
+    def dump(self):
+        """Save a snapshot of all counters as JSON"""
+        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")],
+                                            initialfile=f"perf_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        if not path:
+            return
+        try:
+            PERF.dump(path)
+            self.status_var.set(f"Saved to {path}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Cannot save diagnostics: {str(e)}")
+
+    def refresh(self):
+        """Update the tables while the page is shown"""
+        try:
+            if self.controller.current_frame is DiagnosticsPage:
+                self.update_tables()
+        finally:
+            self.after(self.REFRESH_INTERVAL, self.refresh)
+
+    def update_tables(self):
+        """Show the current counters"""
+        snapshot = PERF.snapshot()
+
+        def ms(value):
+            return f"{value:.3f}" if value is not None else "-"
+
+        self.timing_table.delete(*self.timing_table.get_children())
+        for name, label in self.PROBE_LABELS.items():
+            probe = snapshot["probes"].get(name)
+            if probe is None or not probe["calls"]:
+                continue
+            self.timing_table.insert("", tk.END, values=(label, probe["calls"], probe["items"],
+                                                         ms(probe["mean_ms"]), ms(probe["p50_ms"]),
+                                                         ms(probe["p90_ms"]), ms(probe["p99_ms"]),
+                                                         ms(probe["max_ms"])))
+
+        self.queue_table.delete(*self.queue_table.get_children())
+        for name, label in self.GAUGE_LABELS.items():
+            gauge = snapshot["gauges"].get(name)
+            if gauge is not None:
+                self.queue_table.insert("", tk.END, values=(label, gauge["last"], gauge["max"]))
+
+        state = "on" if snapshot["enabled"] else "off"
+        self.status_var.set(f"Timing {state}, {snapshot['uptime_s']:.0f}s since reset")
+
+        startup = snapshot["startup"]
+        steps = [f"{name} {value:.0f} ms" for name, value in startup["marks_ms"].items()]
+        steps += [f"{name} {value:.0f} ms" for name, value in startup["durations_ms"].items()]
+        self.startup_var.set("Startup: " + ", ".join(steps))
 
 
 if __name__ == "__main__":
-    app = SmartRopeApp()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Smart Jump Rope Data Visualization Tool")
+    parser.add_argument("--startup-log", help="Append startup timings to this file (JSON lines)")
+    parser.add_argument("--exit-after-paint", action="store_true",
+                        help="Quit as soon as the main page is shown, for timing runs")
+    args = parser.parse_args()
+
+    app = SmartRopeApp(startup_log=args.startup_log, exit_after_paint=args.exit_after_paint)
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,248 @@
+"""End-to-end ingest benchmark over a virtual serial port.
+
+Usage:
+    python benchmark.py                                  # 20000 records, unthrottled
+    python benchmark.py --records 5000 --rate 1000 --burst 10
+    python benchmark.py --json baseline.json             # save the results for comparison
+
+Synthetic records are written to a pty (or a pyserial loop:// port) by a
+Replayer and read back along the same path as the GUI: on the reader
+thread, chunked reads, FrameDecoder and IngestQueue.put() (logging to a
+write-ahead log); on a QueueConsumer thread, parsing, storage, the work
+SerialPage does per record for the display, and a checkpoint (session
+file and archive written, log marked) every checkpoint_interval seconds.
+Tk itself is left out. Each stage is timed per call; the report shows
+throughput, per-stage latency percentiles, CPU time and resident memory,
+end-to-end latency from the moment a line was written to the moment it
+was stored, and the queue's peak depth and drop counts.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from ingest import IngestPipeline, format_record
+from ingest_queue import OVERFLOW_POLICIES, IngestQueue, QueueConsumer, WriteAheadLog
+from replay import PtyPort, Replayer, open_virtual_port, synthetic_lines
+from session_archive import SessionArchive
+from telemetry import FrameDecoder
+
+STAGES = ("read", "frame", "enqueue", "parse", "store", "save", "ui", "checkpoint")
+PERCENTILES = (50, 90, 99)
+
+
+def rss_bytes():
+    """Resident set size of this process"""
+    try:
+        with open("/proc/self/statm", 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+
+        # Peak rather than current on platforms without /proc (kilobytes on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StageTimer:
+    """Per-call wall time, CPU time and resident memory growth of one stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.cpu = 0.0
+        self.items = 0
+        self.rss_growth = 0
+
+    def time(self, fn, *args, items=0):
+        rss = rss_bytes()
+        cpu = time.thread_time()
+        start = time.perf_counter()
+        result = fn(*args)
+        self.latencies.append(time.perf_counter() - start)
+        self.cpu += time.thread_time() - cpu
+        self.rss_growth += rss_bytes() - rss
+        self.items += items
+        return result
+
+    def summary(self):
+        latencies = np.array(self.latencies) * 1000.0
+        result = {"calls": len(latencies), "items": self.items, "cpu_s": round(self.cpu, 4),
+                  "rss_growth_kb": self.rss_growth // 1024}
+        for p in PERCENTILES:
+            result[f"p{p}_ms"] = round(float(np.percentile(latencies, p)), 4) if len(latencies) else None
+        return result
+
+
+def run_benchmark(records=20000, rate=0.0, burst=50, transport="auto", seed=0, timeout=60.0,
+                  queue_lines=20000, overflow="drop_oldest", checkpoint_interval=1.0):
+    """Replay records through a virtual port into the queued ingest path; returns the results as a dict"""
+    port = open_virtual_port(transport)
+    if isinstance(port, PtyPort):
+        import serial
+
+        serial_port = serial.Serial(port.name, timeout=0.1)
+    else:
+        serial_port = port.serial_port
+
+    # Session file, archive and log only live as long as the run
+    with tempfile.TemporaryDirectory(prefix="jumprope_bench_") as data_dir:
+        pipeline = IngestPipeline(data_dir=data_dir, archive=SessionArchive(os.path.join(data_dir, "archive")),
+                                  defer_writes=True)
+        wal = WriteAheadLog(os.path.join(data_dir, "ingest.wal"))
+        queue = IngestQueue(queue_lines, overflow, wal=wal, name="bench")
+        stages = {name: StageTimer(name) for name in STAGES}
+        replayer = Replayer(port, synthetic_lines(records, seed, sequence=True),
+                            rate=rate, burst=burst, record_times=True)
+        framer = FrameDecoder()
+        end_to_end = []
+        received = 0
+        read_lines = 0
+        table_rows = 10  # Rows SerialPage's table shows
+
+        def read():
+            waiting = serial_port.in_waiting
+            return serial_port.read(waiting if waiting else 1)
+
+        def ui(batch):
+            # What SerialPage does per batch, minus Tk: format each record and fetch the visible table rows
+            text = ''.join(format_record(data) for data in batch.records())
+            total = len(pipeline.records)
+            rows = [pipeline.records.record(index) for index in range(max(total - table_rows, 0), total)]
+            return text, rows
+
+        def handle(lines, timestamp, device):
+            # Runs on the consumer thread, like SmartRopeApp.process_lines
+            nonlocal received
+            batch = stages["parse"].time(pipeline.parse, lines, timestamp, device, items=len(lines))
+            stages["store"].time(pipeline.store, batch, items=len(batch))
+            stored = time.perf_counter()
+            stages["save"].time(pipeline.save, batch, items=len(batch))
+            stages["ui"].time(ui, batch, items=len(batch))
+            pipeline.malformed_count += len(batch.malformed)
+
+            sequence = batch["finalJumpCount"].tolist()
+            end_to_end.extend(stored - replayer.send_times[index] for index in sequence)
+            received += len(lines)
+
+        def checkpoint():
+            stages["checkpoint"].time(pipeline.flush, items=pipeline.writer.stats()["pending"])
+
+        consumer = QueueConsumer(queue, handle, on_checkpoint=checkpoint,
+                                 checkpoint_interval=checkpoint_interval, name="BenchConsumer")
+        rss_start = rss_bytes()
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        consumer.start()
+        replayer.start()
+        try:
+            while read_lines < records and time.perf_counter() - start < timeout:
+                data = stages["read"].time(read)
+                if not data:
+                    continue
+                stages["read"].items += len(data)  # Bytes for read and frame, lines or records for the rest
+                lines = stages["frame"].time(framer.feed, data, items=len(data))
+                if not lines:
+                    continue
+                stages["enqueue"].time(queue.put, "bench", time.time(), lines, items=len(lines))
+                read_lines += len(lines)
+            read_elapsed = time.perf_counter() - start
+            # Handle what is still queued and take the final checkpoint
+            drain_start = time.perf_counter()
+            consumer.stop(timeout=max(timeout - read_elapsed, 1.0))
+            drain_time = time.perf_counter() - drain_start
+            elapsed = time.perf_counter() - start
+        finally:
+            replayer.stop()
+            consumer.stop()
+            pipeline.close()
+            wal.close()
+            if isinstance(port, PtyPort):
+                serial_port.close()
+            port.close()
+
+        latencies = np.array(end_to_end) * 1000.0
+        writer = pipeline.writer.stats()
+        queue_stats = queue.stats()
+        wal_stats = wal.stats()
+        return {
+            "records": records,
+            "received": received,
+            "malformed": pipeline.malformed_count,
+            "rate": rate,
+            "burst": burst,
+            "transport": "pty" if isinstance(port, PtyPort) else "loop",
+            "elapsed_s": round(elapsed, 4),
+            "lines_per_s": round(received / elapsed, 1) if elapsed else None,
+            "cpu_s": round(time.process_time() - cpu_start, 4),
+            "rss_start_mb": round(rss_start / 2 ** 20, 2),
+            "rss_end_mb": round(rss_bytes() / 2 ** 20, 2),
+            "drain_ms": round(drain_time * 1000.0, 3),
+            "writer": {key: writer[key] for key in ("rows_written", "flush_count", "max_flush_ms", "avg_flush_ms")},
+            "queue": {key: queue_stats[key] for key in ("policy", "max_lines", "peak_lines", "accepted_lines",
+                                                        "dropped_lines", "dropped_batches")},
+            "wal": {key: wal_stats[key] for key in ("bytes", "seq", "checkpointed", "compactions", "errors")},
+            "end_to_end": {f"p{p}_ms": round(float(np.percentile(latencies, p)), 4) if len(latencies) else None
+                           for p in PERCENTILES},
+            "stages": {name: stage.summary() for name, stage in stages.items()},
+        }
+
+
+def print_report(result):
+    print(f"{result['received']}/{result['records']} records over {result['transport']} "
+          f"(rate {result['rate'] or 'unthrottled'}, burst {result['burst']})")
+    print(f"Throughput: {result['lines_per_s']} lines/s in {result['elapsed_s']} s, "
+          f"CPU {result['cpu_s']} s, RSS {result['rss_start_mb']} -> {result['rss_end_mb']} MB")
+    e2e = result["end_to_end"]
+    print(f"End to end (written -> stored): p50 {e2e['p50_ms']} ms, p90 {e2e['p90_ms']} ms, p99 {e2e['p99_ms']} ms")
+    print(f"{'Stage':<12}{'Calls':>8}{'Items':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'CPU s':>9}{'RSS +KB':>9}")
+    for name, stage in result["stages"].items():
+        print(f"{name:<12}{stage['calls']:>8}{stage['items']:>9}"
+              f"{stage['p50_ms'] if stage['p50_ms'] is not None else '-':>10}"
+              f"{stage['p90_ms'] if stage['p90_ms'] is not None else '-':>10}"
+              f"{stage['p99_ms'] if stage['p99_ms'] is not None else '-':>10}"
+              f"{stage['cpu_s']:>9}{stage['rss_growth_kb']:>9}")
+    writer = result["writer"]
+    print(f"Session file: {writer['rows_written']} rows in {writer['flush_count']} checkpoints, "
+          f"max {writer['max_flush_ms']:.2f} ms, drain after reading {result['drain_ms']} ms")
+    queue = result["queue"]
+    print(f"Queue ({queue['policy']}): peak {queue['peak_lines']}/{queue['max_lines']} lines, "
+          f"dropped {queue['dropped_lines']} lines in {queue['dropped_batches']} batches")
+    wal = result["wal"]
+    print(f"Write-ahead log: {wal['bytes']} bytes, {wal['checkpointed']}/{wal['seq']} batches checkpointed, "
+          f"{wal['compactions']} compactions, {wal['errors']} write errors")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the serial ingest path end to end")
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--rate", type=float, default=0.0, help="Lines per second (0 = unthrottled)")
+    parser.add_argument("--burst", type=int, default=50, help="Lines per write")
+    parser.add_argument("--transport", choices=("auto", "pty", "loop"), default="auto")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Give up after this many seconds")
+    parser.add_argument("--queue-lines", type=int, default=20000, help="Lines the ingest queue holds")
+    parser.add_argument("--overflow", choices=OVERFLOW_POLICIES, default="drop_oldest",
+                        help="What to drop when the ingest queue is full")
+    parser.add_argument("--checkpoint-interval", type=float, default=1.0, help="Seconds between checkpoints")
+    parser.add_argument("--json", help="Also write the results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = run_benchmark(args.records, args.rate, args.burst, args.transport, args.seed, args.timeout,
+                           args.queue_lines, args.overflow, args.checkpoint_interval)
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
+    return 0 if result["received"] == result["records"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import numpy as np
+
+
+def minmax_decimate(x, y, buckets):
+    """Keep the minimum and maximum point of each of buckets equal-size slices.
+
+    Preserves peaks exactly, which is what matters when the result is drawn
+    at roughly one bucket per two pixels. Returns (x, y) unchanged when
+    there are already few enough points.
+    """
+    n = len(x)
+    if buckets < 1 or n <= 2 * buckets:
+        return x, y
+
+    size = -(-n // buckets)  # Ceiling division
+    full = (n // size) * size
+    blocks = y[:full].reshape(-1, size)
+    offsets = np.arange(0, full, size)
+    lows = offsets + blocks.argmin(axis=1)
+    highs = offsets + blocks.argmax(axis=1)
+    picks = [np.sort(np.stack((lows, highs), axis=1), axis=1).ravel()]
+
+    if full < n:
+        tail = y[full:]
+        picks.append(np.sort([full + int(tail.argmin()), full + int(tail.argmax())]))
+
+    index = np.concatenate([[0]] + picks + [[n - 1]])
+    index = index[np.concatenate(([True], np.diff(index) > 0))]
+    return x[index], y[index]
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling to threshold points"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    every = (n - 2) / (threshold - 2)
+    index = np.empty(threshold, dtype=np.int64)
+    index[0] = 0
+    index[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        # Pick the point forming the largest triangle with the previous pick and the next bucket's mean
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        index[i + 1] = a
+    return x[index], y[index]
+
+
+def visible_slice(x, low, high):
+    """Index range of sorted x covering [low, high], plus one neighbour on each side"""
+    start = max(int(np.searchsorted(x, low, side='left')) - 1, 0)
+    end = min(int(np.searchsorted(x, high, side='right')) + 1, len(x))
+    return start, end
@@ -0,0 +1,146 @@
+import glob
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ingest import DATA_DIR
+from record_parser import COLUMNS, load_csv_file
+from record_store import RecordStore
+from running_stats import StatsEngine
+
+CACHE_FILE = ".history_cache.npz"
+
+
+class HistoryLoader:
+    """Load past JumpRopeData_*.csv session files in the background.
+
+    Files are parsed by a thread pool and published to self.records (and
+    self.stats) oldest first as soon as each one is ready, so a chart can
+    show partial history while loading continues. Parsed columns are
+    cached in one file keyed by each CSV's path, mtime and size; on a
+    warm start unchanged files come straight from the cache and only new
+    or modified files are parsed.
+    """
+
+    # Seconds between publishing loaded files to the store
+    PUBLISH_INTERVAL = 0.1
+
+    def __init__(self, data_dir=DATA_DIR, devices=None, exclude=(), workers=4, cache_path=None):
+        self.data_dir = data_dir
+        self.exclude = {os.path.abspath(path) for path in exclude}  # e.g. the file being written right now
+        self.workers = workers
+        self.cache_path = cache_path or os.path.join(data_dir, CACHE_FILE)
+        self.records = RecordStore(devices=devices)
+        self.stats = StatsEngine()
+
+        self.files_total = 0
+        self.files_loaded = 0
+        self.files_parsed = 0  # Files that were not in the cache
+        self.load_time = None
+        self.error = None
+        self.done = threading.Event()
+        self._thread = None
+
+    def discover(self):
+        """Session files in the data directory, oldest first"""
+        paths = sorted(glob.glob(os.path.join(self.data_dir, "JumpRopeData_*.csv")))
+        return [path for path in paths if os.path.abspath(path) not in self.exclude]
+
+    def start(self):
+        """Start loading on a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="HistoryLoader")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def load(self):
+        """Load synchronously"""
+        self._run()
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            paths = self.discover()
+            self.files_total = len(paths)
+            cache = self._read_cache()
+            entries = {}
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                # Only files missing from the cache (or changed since) are parsed
+                jobs = []
+                for path in paths:
+                    stat = os.stat(path)
+                    key = (stat.st_mtime_ns, stat.st_size)
+                    cached = cache.get(path)
+                    if cached is not None and cached[0] == key:
+                        jobs.append((path, key, cached[1], None))
+                    else:
+                        jobs.append((path, key, None, pool.submit(load_csv_file, path, self.records.devices)))
+                self.files_parsed = sum(1 for job in jobs if job[3] is not None)
+
+                # Publish oldest first, in batches so the chart sees progress without per-file overhead
+                pending = []
+                published = time.perf_counter()
+                for index, (path, key, columns, future) in enumerate(jobs):
+                    if future is not None:
+                        columns = future.result().columns
+                    entries[path] = (key, columns)
+                    pending.append(columns)
+                    last = index == len(jobs) - 1
+                    if last or time.perf_counter() - published >= self.PUBLISH_INTERVAL:
+                        self._publish(pending)
+                        self.files_loaded = index + 1
+                        pending = []
+                        published = time.perf_counter()
+            if self.files_parsed or len(entries) != len(cache):
+                self._write_cache(entries)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.load_time = time.perf_counter() - start
+            self.done.set()
+
+    def _publish(self, pending):
+        """Append a run of loaded files to the store and statistics"""
+        columns = {name: np.concatenate([item[name] for item in pending]) for name in COLUMNS}
+        self.records.append_columns(columns)
+        self.stats.add_columns(columns)
+
+    def _read_cache(self):
+        """Path -> ((mtime_ns, size), columns) from the cache file"""
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as data:
+                manifest = json.loads(str(data["manifest"]))
+                arrays = {name: data[name] for name in COLUMNS}
+        except Exception:
+            return {}
+
+        # Device ids in the cache refer to the names saved with it
+        mapping = np.array([self.records.devices.id(name) for name in manifest["devices"]], dtype=np.int16)
+        arrays["device"] = mapping[arrays["device"].astype(np.int64)]
+
+        cache = {}
+        for path, mtime_ns, size, begin, end in manifest["files"]:
+            cache[path] = ((mtime_ns, size), {name: arrays[name][begin:end] for name in COLUMNS})
+        return cache
+
+    def _write_cache(self, entries):
+        """Save all loaded files as one cache file"""
+        files, position = [], 0
+        for path, ((mtime_ns, size), columns) in entries.items():
+            count = len(columns["mode"])
+            files.append([path, mtime_ns, size, position, position + count])
+            position += count
+        manifest = {"files": files, "devices": self.records.devices.names()}
+        arrays = {name: np.concatenate([columns[name] for _, columns in entries.values()])
+                  if entries else np.empty(0) for name in COLUMNS}
+
+        temp_path = self.cache_path + ".tmp"
+        with open(temp_path, 'wb') as file:
+            np.savez(file, manifest=np.array(json.dumps(manifest)), **arrays)
+        os.replace(temp_path, self.cache_path)
@@ -0,0 +1,307 @@
+import functools
+import os
+import threading
+import time
+from datetime import datetime
+
+from ingest_queue import IngestQueue, QueueConsumer
+from perf import PERF
+from record_parser import parse_lines
+from record_store import RecordStore
+from running_stats import StatsEngine
+from serial_reader import read_chunks
+from session_writer import SessionWriter
+from telemetry import FrameDecoder
+
+DATA_DIR = "JumpRopeData"
+ARCHIVE_DIR = os.path.join(DATA_DIR, "archive")
+ROLLUP_FILE = os.path.join(DATA_DIR, "rollups.json")
+ROSTER_FILE = os.path.join(DATA_DIR, "roster.json")
+WAL_FILE = os.path.join(DATA_DIR, "ingest.wal")
+CSV_HEADER = ["Mode", "Duration (s)", "Avg HR", "Max HR", "Frequency", "Jumps", "Record Time", "Device"]
+
+
+def new_session_path(data_dir=DATA_DIR):
+    """Path of a new timestamped session file in data_dir"""
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+    return os.path.join(data_dir, f"JumpRopeData_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+
+
+def session_rows(batch, devices):
+    """CSV rows of a parsed batch in session file column order"""
+    return [[data['mode'],
+             data['exerciseDuration'],
+             data['avgHeartRate'],
+             data['maxHeartRate'],
+             data['finalFrequency'],
+             data['finalJumpCount'],
+             data['recordTime'],
+             devices.name(data['device'])] for data in batch.records()]
+
+
+def format_record(data):
+    """One human-readable line for the received-data log"""
+    return (f"Mode: {data['mode']}, "
+            f"Duration: {data['exerciseDuration']}s, "
+            f"Avg HR: {data['avgHeartRate']}BPM, "
+            f"Max HR: {data['maxHeartRate']}BPM, "
+            f"Frequency: {data['finalFrequency']:.1f} jumps/min, "
+            f"Jumps: {data['finalJumpCount']}\n")
+
+
+class IngestPipeline:
+    """Parse device lines, keep them in memory and append them to the session file.
+
+    This is the whole ingest path without any GUI: SmartRopeApp and the
+    headless daemon both hand it raw lines. Listeners are called with each
+    parsed batch after it has been stored. When an archive (SessionArchive)
+    is given, records are also appended to it, and a RollupStore given
+    along with it is caught up from the archive after every flush, so its
+    aggregates only ever count records the archive has persisted (saved
+    on close; after a crash they catch up the same way). on_error, if
+    given, is called with the exception when a background write of the
+    session file fails; the rows are kept and retried.
+
+    With defer_writes nothing reaches the session file or the archive
+    until flush(): the writer has no flush thread of its own and archive
+    appends are held back too. A QueueConsumer that flushes the pipeline
+    at each checkpoint then never finds records on disk that its
+    write-ahead log will replay after a crash.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, records=None, stats=None,
+                 flush_rows=256, flush_interval=0.5, data_file=None, archive=None, rollups=None,
+                 on_error=None, defer_writes=False):
+        self.records = records if records is not None else RecordStore()
+        self.stats = stats if stats is not None else StatsEngine()
+        self.archive = archive
+        self.rollups = rollups
+        self.data_file = data_file or new_session_path(data_dir)
+        self.defer_writes = defer_writes
+        if defer_writes:
+            flush_rows = flush_interval = None
+        self.writer = SessionWriter(self.data_file, header=CSV_HEADER,
+                                    flush_rows=flush_rows, flush_interval=flush_interval, on_error=on_error)
+        self.listeners = []
+        self._archive_pending = []  # Column blocks held back for the archive until flush()
+        self.malformed_count = 0
+        self._closed = False
+        self._lock = threading.Lock()  # Keeps batches from several readers in order
+        PERF.gauge("writer.pending", lambda: self.writer.stats()["pending"])
+
+    def add_listener(self, listener):
+        """Call listener(batch) for every parsed batch"""
+        self.listeners.append(listener)
+
+    @PERF.timed("ingest.process", items=lambda self, lines, *args, **kwargs: len(lines))
+    def process_lines(self, lines, timestamp=None, device=None):
+        """Parse, store and save a block of lines from one device; returns the parsed batch"""
+        batch = self.parse(lines, timestamp, device)
+        with self._lock:
+            self.store(batch)
+            self.save(batch)
+            self.malformed_count += len(batch.malformed)
+        for listener in self.listeners:
+            listener(batch)
+        return batch
+
+    @PERF.timed("ingest.parse", items=lambda self, lines, *args: len(lines))
+    def parse(self, lines, timestamp=None, device=None):
+        """Parse a block of lines from one device"""
+        return parse_lines(lines, timestamp, self.records.devices.id(device))
+
+    @PERF.timed("ingest.store", items=lambda self, batch: len(batch))
+    def store(self, batch):
+        """Add a parsed batch to the in-memory store and statistics"""
+        self.records.append_columns(batch.columns)
+        self.stats.add_columns(batch.columns)
+        if self.rollups is not None and self.archive is None:
+            self.rollups.add_columns(batch.columns, self.records.devices)
+
+    @PERF.timed("ingest.save", items=lambda self, batch: len(batch))
+    def save(self, batch):
+        """Queue a parsed batch for the session file"""
+        if len(batch):
+            self.writer.write_rows(session_rows(batch, self.records.devices))
+            if self.archive is not None:
+                if self.defer_writes:
+                    self._archive_pending.append(batch.columns)
+                else:
+                    self.archive.append_columns(batch.columns, self.records.devices)
+
+    def flush(self):
+        """Write buffered rows to disk"""
+        self.writer.flush()
+        if self.archive is not None:
+            with self._lock:
+                pending, self._archive_pending = self._archive_pending, []
+            for columns in pending:
+                self.archive.append_columns(columns, self.records.devices)
+            self.archive.flush()
+            if self.rollups is not None:
+                self.rollups.sync(self.archive)
+
+    def close(self):
+        """Flush and close the session file; closing again does nothing"""
+        if self._closed:
+            return
+        self._closed = True
+        self.writer.close()
+        if self.archive is not None:
+            self.flush()
+            self.archive.close()
+        if self.rollups is not None:
+            self.rollups.save()
+
+
+class SerialIngest:
+    """Read one serial port on a background thread and feed complete lines to on_lines.
+
+    Telemetry frames in the stream are decoded and passed to on_events
+    (if given) instead of being mistaken for text. If the port fails
+    while reading it is closed and reopened every retry_interval seconds,
+    without affecting any other reader.
+    """
+
+    def __init__(self, port, baudrate, on_lines, on_error=None, timeout=0.1, chunk_size=4096,
+                 retry_interval=2.0, on_events=None):
+        self.port = port
+        self.baudrate = baudrate
+        self.on_lines = on_lines
+        self.on_events = on_events
+        self.on_error = on_error
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.retry_interval = retry_interval
+        self.serial_port = None
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.lines_read = 0
+        self.errors = 0
+
+    def start(self):
+        """Open the port and start reading"""
+        self._open()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name=f"SerialIngest-{self.port}")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Stop reading and close the port"""
+        self.stop_event.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=1.0)
+        self._close()
+
+    @property
+    def connected(self):
+        return bool(self.serial_port and self.serial_port.is_open)
+
+    def _open(self):
+        import serial
+
+        self.serial_port = serial.Serial(self.port, self.baudrate, timeout=self.timeout)
+
+    def _close(self):
+        try:
+            if self.serial_port and self.serial_port.is_open:
+                self.serial_port.close()
+        except Exception:
+            pass
+
+    def _deliver(self, lines):
+        self.lines_read += len(lines)
+        self.on_lines(lines)
+
+    def _run(self):
+        framer = FrameDecoder(on_events=self.on_events)
+        while not self.stop_event.is_set():
+            try:
+                if not self.connected:
+                    self._open()
+                read_chunks(self.serial_port, self.stop_event, self._deliver,
+                            framer=framer, chunk_size=self.chunk_size)
+            except Exception as e:
+                self.errors += 1
+                if self.on_error:
+                    self.on_error(self.port, e)
+                self._close()
+                framer.reset()
+                self.stop_event.wait(self.retry_interval)
+
+
+def available_ports():
+    """Device names of all serial ports on this host"""
+    import serial.tools.list_ports
+
+    return [port.device for port in serial.tools.list_ports.comports()]
+
+
+class IngestManager:
+    """Read several serial ports at once into one shared pipeline.
+
+    Every port gets its own SerialIngest thread that only frames lines and
+    puts them on a shared IngestQueue, tagged with the port name and
+    arrival time; putting never blocks, and overflow is handled by the
+    queue's policy and counted per port. A single QueueConsumer thread
+    drains the queue and hands the lines to the pipeline, so parsing,
+    storage and the session file see one ordered stream and a slow or
+    failing port never blocks the others. With a write-ahead log (wal),
+    batches a previous run queued but never saved are replayed by start();
+    the pipeline should then defer its writes to the checkpoints.
+    """
+
+    def __init__(self, pipeline, ports=None, baudrate=115200, on_error=None, max_batch_lines=4096,
+                 max_queue_lines=20000, overflow="drop_oldest", wal=None, checkpoint_interval=1.0):
+        self.pipeline = pipeline
+        self.ports = list(ports) if ports else available_ports()
+        self.baudrate = baudrate
+        self.on_error = on_error
+        self.queue = IngestQueue(max_queue_lines, overflow, wal=wal)
+        self.consumer = QueueConsumer(self.queue, self._process, on_checkpoint=pipeline.flush, on_error=on_error,
+                                      checkpoint_interval=checkpoint_interval, max_batch_lines=max_batch_lines,
+                                      name="IngestManager")
+        self.readers = {}
+        self.failed = {}  # Port -> error for ports that could not be opened
+        self.recovered_lines = 0
+
+    def start(self):
+        """Replay the log, open every port and start the readers and the consumer"""
+        if self.queue.wal is not None:
+            self.recovered_lines = self.consumer.replay(self.queue.wal.recover())
+
+        for port in self.ports:
+            reader = SerialIngest(port, self.baudrate, functools.partial(self._enqueue, port),
+                                  on_error=self.on_error)
+            try:
+                reader.start()
+                self.readers[port] = reader
+            except Exception as e:
+                self.failed[port] = e
+                if self.on_error:
+                    self.on_error(port, e)
+
+        self.consumer.start()
+        return list(self.readers)
+
+    def stop(self):
+        """Stop all readers, process what is still queued and flush the pipeline"""
+        for reader in self.readers.values():
+            reader.stop()
+        self.consumer.stop()
+        self.pipeline.flush()
+
+    def device_stats(self):
+        """Lines read, lines dropped on overflow, errors and connection state per port"""
+        dropped = self.queue.stats()["dropped_by_device"]
+        return {port: {"lines": reader.lines_read, "dropped": dropped.get(port, 0), "errors": reader.errors,
+                       "connected": reader.connected}
+                for port, reader in self.readers.items()}
+
+    def _enqueue(self, port, lines):
+        self.queue.put(port, time.time(), lines)
+
+    def _process(self, lines, timestamp, device):
+        self.pipeline.process_lines(lines, timestamp, device=device)
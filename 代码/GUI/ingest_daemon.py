@@ -0,0 +1,120 @@
+"""Headless ingest: log jump rope records from serial ports without the GUI.
+
+Usage:
+    python ingest_daemon.py --port COM3 --port COM4 --baudrate 115200
+    python ingest_daemon.py            # every serial port on the host
+
+Every port is read concurrently; records are tagged with their port,
+appended to one session file in the data directory (the same format the
+GUI writes) and to the binary session archive, rolled up per athlete for
+the leaderboard (see rollups.py), and echoed to stdout as CSV. Readers
+hand lines to a bounded queue backed by a write-ahead log (see
+ingest_queue.py); lines still queued when the daemon was killed are
+replayed on the next start. Does not import tkinter or matplotlib. Set
+JUMPROPE_PERF_DUMP=<file> to save hot-path timings (see perf.py) to that
+file on exit.
+"""
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+
+from ingest import DATA_DIR, IngestManager, IngestPipeline, session_rows
+from ingest_queue import OVERFLOW_POLICIES, WriteAheadLog
+from rollups import Roster, RollupStore
+from session_archive import SessionArchive
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Log Smart Jump Rope records from serial ports without the GUI")
+    parser.add_argument("--port", action="append",
+                        help="Serial port to read; repeat for several devices (default: all ports)")
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Directory for session CSV files")
+    parser.add_argument("--flush-rows", type=int, default=256,
+                        help="Flush the session file after this many rows (with --no-wal)")
+    parser.add_argument("--flush-interval", type=float, default=0.5,
+                        help="Flush the session file after this many seconds (with --no-wal)")
+    parser.add_argument("--archive", help="Binary archive directory (default: <data-dir>/archive)")
+    parser.add_argument("--no-archive", action="store_true", help="Only write the session CSV")
+    parser.add_argument("--quiet", action="store_true", help="Do not echo records to stdout")
+    parser.add_argument("--queue-lines", type=int, default=20000,
+                        help="Lines the ingest queue holds")
+    parser.add_argument("--overflow", choices=OVERFLOW_POLICIES, default="drop_oldest",
+                        help="What to drop when the ingest queue is full")
+    parser.add_argument("--wal", help="Write-ahead log file (default: <data-dir>/ingest.wal)")
+    parser.add_argument("--no-wal", action="store_true", help="Do not log queued lines")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    stop = threading.Event()
+    stdout_lock = threading.Lock()
+
+    archive = None
+    rollups = None
+    if not args.no_archive:
+        archive = SessionArchive(args.archive or os.path.join(args.data_dir, "archive"))
+        # Rollups count archived records, so they are only kept alongside the archive
+        rollups = RollupStore(os.path.join(args.data_dir, "rollups.json"),
+                              Roster(os.path.join(args.data_dir, "roster.json")))
+        rollups.sync(archive)
+    # With a write-ahead log the files are only written at its checkpoints, so a replay never repeats rows
+    pipeline = IngestPipeline(data_dir=args.data_dir, flush_rows=args.flush_rows,
+                              flush_interval=args.flush_interval, archive=archive, rollups=rollups,
+                              defer_writes=not args.no_wal)
+
+    def echo(batch):
+        rows = session_rows(batch, pipeline.records.devices)
+        text = ''.join(','.join(str(value) for value in row) + '\n' for row in rows)
+        text += ''.join(f"# format error: {line}\n" for line in batch.malformed)
+        if text:
+            with stdout_lock:
+                sys.stdout.write(text)
+                sys.stdout.flush()
+
+    def report_error(port, error):
+        print(f"Error reading {port}: {error}", file=sys.stderr)
+
+    if not args.quiet:
+        pipeline.add_listener(echo)
+
+    wal = None if args.no_wal else WriteAheadLog(args.wal or os.path.join(args.data_dir, "ingest.wal"))
+    manager = IngestManager(pipeline, ports=args.port, baudrate=args.baudrate, on_error=report_error,
+                            max_queue_lines=args.queue_lines, overflow=args.overflow, wal=wal)
+    started = manager.start()
+    if manager.recovered_lines:
+        print(f"Recovered {manager.recovered_lines} lines from {wal.path}", file=sys.stderr)
+    if not started:
+        print("No serial port could be opened", file=sys.stderr)
+        manager.stop()
+        pipeline.close()
+        if wal is not None:
+            wal.close()
+        return 1
+
+    print(f"Logging {', '.join(manager.readers)} to {pipeline.data_file}", file=sys.stderr)
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        while not stop.is_set():
+            time.sleep(0.2)
+    finally:
+        manager.stop()
+        pipeline.close()
+        if wal is not None:
+            wal.close()
+        print(f"Saved {pipeline.writer.rows_written} records to {pipeline.data_file}", file=sys.stderr)
+        queue_stats = manager.queue.stats()
+        if queue_stats["dropped_lines"]:
+            print(f"Dropped {queue_stats['dropped_lines']} lines on queue overflow "
+                  f"({queue_stats['policy']}): {queue_stats['dropped_by_device']}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,455 @@
+"""Bounded hand-off between serial readers and the ingest consumer.
+
+A reader thread only frames lines and calls IngestQueue.put(), which
+never blocks and never touches the disk: the lines are handed to the
+write-ahead log's writer thread and appended to an in-memory queue
+holding at most max_lines lines. When the queue is full the overflow
+policy decides what is lost ("drop_oldest" evicts the oldest queued
+batches, "drop_newest" rejects the incoming one), and every dropped
+line is counted per device. Past the high-water mark the
+queue reports itself backlogged so consumers can shed optional work
+(such as the per-record log) before anything has to be dropped.
+
+QueueConsumer drains the queue on its own thread in large per-device
+batches and hands them to the parse/store/save path. At most every
+checkpoint_interval seconds it makes the stored records durable (the
+on_checkpoint callback, e.g. IngestPipeline.flush) and then checkpoints
+the log, so after a crash only batches that were queued but never made
+durable are replayed on restart. For that to hold, the handler must not
+write anything to disk between checkpoints (IngestPipeline with
+defer_writes), or a replay would write those records a second time.
+
+Log entries are
+
+    type (1 byte) | seq (4) | payload length (4) | timestamp (8) | payload | crc32 (4)
+
+all little-endian, with a CRC-32 over everything before it. A batch
+payload is the device name, a NUL byte and the lines joined with '\\n';
+a checkpoint entry (no payload) marks every batch up to seq as durable,
+and a skip entry (no payload) marks the batch seq as dropped on overflow,
+so a replay never brings back what the queue had already thrown away.
+A torn entry at the end of the file is cut off when the log is opened,
+and checkpointed entries are dropped when the log is compacted.
+"""
+import binascii
+import os
+import shutil
+import struct
+import threading
+import time
+from collections import deque, namedtuple
+
+from perf import PERF
+
+ENTRY = struct.Struct('<BIId')  # type, seq, payload length, timestamp
+CRC = struct.Struct('<I')
+ENTRY_BATCH = 1
+ENTRY_CHECKPOINT = 2
+ENTRY_SKIP = 3
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest")
+
+QueuedBatch = namedtuple("QueuedBatch", "seq timestamp device lines")
+
+
+class WriteAheadLog:
+    """Append-only log of queued line batches, replayed after a crash.
+
+    append() only numbers the batch and hands it to the log's own writer
+    thread, so a serial reader never waits for the disk; the writer puts
+    everything pending into the file in one write. sync() (called at
+    every checkpoint) forces the file to disk. When the file grows past
+    max_bytes and at least half of it is checkpointed, checkpoint()
+    compacts it: the batches that still need replaying are copied to a
+    new file behind the checkpoint entry, which replaces the old one.
+    """
+
+    def __init__(self, path, max_bytes=4 * 2 ** 20, retry_interval=1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.retry_interval = retry_interval
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._lock = threading.Lock()  # Guards the file, size and _offsets
+        self._ready = threading.Condition(threading.Lock())  # Guards seq, _queued and written
+        self.seq = 0  # Last sequence number assigned
+        self.written = 0  # Last sequence number in the file
+        self.checkpointed = 0  # Last sequence number known to be durable downstream
+        self._offsets = deque()  # (seq, file offset) of logged batches not checkpointed yet
+        self.pending = self._scan()  # Batches a previous run logged but never checkpointed
+        self.written = self.seq
+        self._file = open(path, 'ab', buffering=0)
+        self.size = self._file.tell()
+        self.compactions = 0
+        self.errors = 0
+        self.last_error = None
+
+        self._queued = deque()  # Batches appended but not written yet
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="WriteAheadLog")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _scan(self):
+        """Read the log, cut off a torn tail and return the unfinished batches"""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'rb') as file:
+            data = file.read()
+
+        batches = []
+        skipped = set()
+        position = 0
+        while position + ENTRY.size + CRC.size <= len(data):
+            kind, seq, length, timestamp = ENTRY.unpack_from(data, position)
+            end = position + ENTRY.size + length
+            if end + CRC.size > len(data):
+                break
+            (expected,) = CRC.unpack_from(data, end)
+            if binascii.crc32(memoryview(data)[position:end]) != expected:
+                break
+            if kind == ENTRY_BATCH:
+                device, _, text = data[position + ENTRY.size:end].partition(b'\0')
+                batches.append(QueuedBatch(seq, timestamp, device.decode('utf-8') or None,
+                                           text.decode('utf-8').split('\n') if text else []))
+                self._offsets.append((seq, position))
+            elif kind == ENTRY_CHECKPOINT:
+                self.checkpointed = max(self.checkpointed, seq)
+            elif kind == ENTRY_SKIP:
+                skipped.add(seq)
+            self.seq = max(self.seq, seq)
+            position = end + CRC.size
+
+        if position < len(data):
+            with open(self.path, 'r+b') as file:
+                file.truncate(position)
+        self._release()
+        return [batch for batch in batches if batch.seq > self.checkpointed and batch.seq not in skipped]
+
+    @staticmethod
+    def _entry(kind, seq, timestamp, payload=b''):
+        entry = ENTRY.pack(kind, seq, len(payload), timestamp) + payload
+        return entry + CRC.pack(binascii.crc32(entry))
+
+    def append(self, timestamp, device, lines):
+        """Queue a batch of lines for the log without waiting for the disk; returns its sequence number"""
+        with self._ready:
+            if self._closing:
+                raise ValueError("WriteAheadLog is closed")
+            self.seq += 1
+            self._queued.append(QueuedBatch(self.seq, timestamp, device, lines))
+            self._ready.notify_all()
+            return self.seq
+
+    def skip(self, seq):
+        """Mark the batch seq as dropped, so it is never replayed"""
+        with self._ready:
+            for index, batch in enumerate(self._queued):
+                if batch.seq == seq and batch.lines is not None:
+                    # Not written yet; it never needs to be
+                    del self._queued[index]
+                    return
+            if self._closing:
+                raise ValueError("WriteAheadLog is closed")
+            self._queued.append(QueuedBatch(seq, time.time(), None, None))  # lines None: a skip entry
+            self._ready.notify_all()
+
+    def _run(self):
+        """Writer thread: put queued batches into the file, oldest first"""
+        while True:
+            with self._ready:
+                while not self._queued and not self._closing:
+                    self._ready.wait()
+                if not self._queued:
+                    return
+                batches = list(self._queued)
+                self._queued.clear()
+            try:
+                self._write_batches(batches)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = e
+                with self._ready:
+                    # Keep the batches, ahead of any queued meanwhile, for the next attempt
+                    self._queued.extendleft(reversed(batches))
+                    if self._closing:
+                        return
+                    self._ready.wait(self.retry_interval)
+                continue
+            with self._ready:
+                self.written = max(self.written, max(batch.seq for batch in batches))
+                self._ready.notify_all()
+
+    def _write_batches(self, batches):
+        with self._lock:
+            # Batches checkpointed before they reached the file need no replay
+            batches = [batch for batch in batches if batch.seq > self.checkpointed]
+            entries = []
+            offsets = []
+            offset = self.size
+            for batch in batches:
+                if batch.lines is None:
+                    entry = self._entry(ENTRY_SKIP, batch.seq, batch.timestamp)
+                else:
+                    payload = (batch.device or '').encode('utf-8') + b'\0' + '\n'.join(batch.lines).encode('utf-8')
+                    entry = self._entry(ENTRY_BATCH, batch.seq, batch.timestamp, payload)
+                    offsets.append((batch.seq, offset))
+                entries.append(entry)
+                offset += len(entry)
+            if entries:
+                self._file.write(b''.join(entries))
+                self._offsets.extend(offsets)
+                self.size = offset
+
+    def flush(self, timeout=None):
+        """Wait until everything appended so far is in the file; returns False on timeout"""
+        with self._ready:
+            seq = self.seq
+            return self._ready.wait_for(lambda: self.written >= seq or not self._thread.is_alive(), timeout)
+
+    def checkpoint(self, seq):
+        """Mark every batch up to seq as durable downstream"""
+        with self._lock:
+            if seq <= self.checkpointed:
+                return
+            self.checkpointed = seq
+            self._release()
+            entry = self._entry(ENTRY_CHECKPOINT, seq, time.time())
+            # Everything before the first batch still to be replayed can go
+            keep = self._offsets[0][1] if self._offsets else self.size
+            if self.size > self.max_bytes and keep * 2 >= self.size:
+                self._compact(keep, entry)
+            else:
+                self._file.write(entry)
+                self.size += len(entry)
+            os.fsync(self._file.fileno())
+
+    def _release(self):
+        """Forget the offsets of checkpointed batches"""
+        while self._offsets and self._offsets[0][0] <= self.checkpointed:
+            self._offsets.popleft()
+
+    def _compact(self, keep, entry):
+        """Replace the file with the checkpoint entry followed by everything from offset keep"""
+        with open(self.path, 'rb') as source, open(self.path + ".tmp", 'wb') as target:
+            target.write(entry)
+            source.seek(keep)
+            shutil.copyfileobj(source, target)
+            target.flush()
+            os.fsync(target.fileno())
+        self._file.close()
+        os.replace(self.path + ".tmp", self.path)
+        self._file = open(self.path, 'ab', buffering=0)
+        shift = len(entry) - keep
+        self._offsets = deque((seq, offset + shift) for seq, offset in self._offsets)
+        self.size = self._file.tell()
+        self.compactions += 1
+
+    def recover(self):
+        """Batches left over from the previous run, oldest first; each is returned only once"""
+        pending, self.pending = self.pending, []
+        return pending
+
+    def sync(self):
+        with self._lock:
+            os.fsync(self._file.fileno())
+
+    def stats(self):
+        """Log size, sequence numbers and writer state"""
+        with self._ready:
+            queued = len(self._queued)
+        with self._lock:
+            return {"bytes": self.size, "seq": self.seq, "written": self.written,
+                    "checkpointed": self.checkpointed, "queued_batches": queued,
+                    "compactions": self.compactions, "errors": self.errors}
+
+    def close(self):
+        """Write what is still queued, stop the writer thread and close the file"""
+        with self._ready:
+            self._closing = True
+            self._ready.notify_all()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5.0)
+        with self._lock:
+            self._file.close()
+
+
+class IngestQueue:
+    """Bounded, non-blocking queue of line batches with an overflow policy and drop accounting"""
+
+    def __init__(self, max_lines=20000, policy="drop_oldest", high_water=0.5, wal=None, name="ingest"):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.max_lines = max_lines
+        self.policy = policy
+        self.high_water = int(max_lines * high_water)
+        self.wal = wal
+        self._items = deque()
+        self._lines = 0  # Lines currently queued
+        self._ready = threading.Condition(threading.Lock())
+        self.accepted_lines = 0
+        self.dropped_lines = 0
+        self.dropped_batches = 0
+        self.dropped_by_device = {}
+        self.peak_lines = 0
+        PERF.gauge(f"{name}.queue", lambda: self._lines)
+        PERF.gauge(f"{name}.dropped", lambda: self.dropped_lines)
+
+    def __len__(self):
+        return self._lines
+
+    @property
+    def backlogged(self):
+        """True past the high-water mark, when consumers should shed optional work"""
+        return self._lines >= self.high_water
+
+    def put(self, device, timestamp, lines):
+        """Queue a batch of lines without ever blocking; returns False if it was dropped"""
+        count = len(lines)
+        if not count:
+            return True
+        with self._ready:
+            if self.policy == "drop_newest" and self._lines + count > self.max_lines:
+                self._drop(device, count)
+                return False
+            seq = self.wal.append(timestamp, device, lines) if self.wal is not None else 0
+            self._items.append(QueuedBatch(seq, timestamp, device, lines))
+            self._lines += count
+            self.accepted_lines += count
+            # drop_oldest; a single batch larger than the whole queue is still kept
+            while self._lines > self.max_lines and len(self._items) > 1:
+                dropped = self._items.popleft()
+                self._lines -= len(dropped.lines)
+                self._drop(dropped.device, len(dropped.lines))
+                if self.wal is not None:
+                    self.wal.skip(dropped.seq)
+            if self._lines > self.peak_lines:
+                self.peak_lines = self._lines
+            self._ready.notify()
+        return True
+
+    def _drop(self, device, count):
+        self.dropped_lines += count
+        self.dropped_batches += 1
+        self.dropped_by_device[device] = self.dropped_by_device.get(device, 0) + count
+
+    def get_batches(self, max_lines=4096, timeout=0.1):
+        """Wait up to timeout for batches; returns as many as fit in max_lines lines (at least one)"""
+        with self._ready:
+            if not self._items:
+                self._ready.wait(timeout)
+            batches = []
+            count = 0
+            while self._items and (not batches or count + len(self._items[0].lines) <= max_lines):
+                batch = self._items.popleft()
+                batches.append(batch)
+                count += len(batch.lines)
+            self._lines -= count
+        return batches
+
+    def stats(self):
+        """Queue depth, peak and drop counts"""
+        with self._ready:
+            return {"policy": self.policy, "lines": self._lines, "batches": len(self._items),
+                    "peak_lines": self.peak_lines, "max_lines": self.max_lines,
+                    "accepted_lines": self.accepted_lines, "dropped_lines": self.dropped_lines,
+                    "dropped_batches": self.dropped_batches, "dropped_by_device": dict(self.dropped_by_device)}
+
+
+class QueueConsumer:
+    """Drain an IngestQueue on a background thread and checkpoint its log.
+
+    handler(lines, timestamp, device) is called with the queued lines of
+    one device at a time, several queued batches merged into one call.
+    on_checkpoint() must make everything handled so far durable; it runs
+    at most every checkpoint_interval seconds while batches are being
+    handled, when request_checkpoint() asks for it, and once more on
+    stop(). It always runs on the consumer thread, between handler calls.
+    """
+
+    def __init__(self, queue, handler, on_checkpoint=None, on_error=None,
+                 checkpoint_interval=1.0, max_batch_lines=4096, name="IngestConsumer"):
+        self.queue = queue
+        self.handler = handler
+        self.on_checkpoint = on_checkpoint
+        self.on_error = on_error
+        self.checkpoint_interval = checkpoint_interval
+        self.max_batch_lines = max_batch_lines
+        self.name = name
+        self.handled_seq = 0  # Log sequence number of the last batch handled
+        self.handled = 0  # Calls of _handle so far
+        self._durable = 0  # Value of handled at the last checkpoint
+        self._checkpointed = time.monotonic()
+        self._stop = threading.Event()
+        self._requested = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Handle what is still queued, checkpoint and stop"""
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+
+    def request_checkpoint(self):
+        """Checkpoint as soon as the batches being handled are done, e.g. on disconnect"""
+        self._requested.set()
+
+    def replay(self, batches):
+        """Handle batches recovered from the log (before start()) and checkpoint them"""
+        for batch in batches:
+            self._handle([batch])
+        if batches:
+            self.checkpoint()
+        return sum(len(batch.lines) for batch in batches)
+
+    def _run(self):
+        while True:
+            stopping = self._stop.is_set()
+            batches = self.queue.get_batches(self.max_batch_lines)
+            if batches:
+                self._handle(batches)
+            if stopping and not batches:
+                break
+            if self.handled != self._durable and (self._requested.is_set() or
+                                                  time.monotonic() - self._checkpointed >= self.checkpoint_interval):
+                self.checkpoint()
+        if self.handled != self._durable:
+            self.checkpoint()
+
+    def _handle(self, batches):
+        # Merge per device, keeping the arrival time of each device's first batch
+        pending = {}
+        for batch in batches:
+            group = pending.setdefault(batch.device, [batch.timestamp, []])
+            group[1].extend(batch.lines)
+        for device, (timestamp, lines) in pending.items():
+            try:
+                self.handler(lines, timestamp, device)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(device, e)
+        self.handled_seq = max(self.handled_seq, batches[-1].seq)
+        self.handled += 1
+
+    def checkpoint(self):
+        """Make handled batches durable, then record that in the log"""
+        self._checkpointed = time.monotonic()
+        self._requested.clear()
+        handled, seq = self.handled, self.handled_seq
+        try:
+            if self.on_checkpoint is not None:
+                self.on_checkpoint()
+            if self.queue.wal is not None and seq:
+                self.queue.wal.checkpoint(seq)
+            self._durable = handled  # Retried after checkpoint_interval if anything failed
+        except Exception as e:
+            if self.on_error:
+                self.on_error(None, e)
@@ -0,0 +1,203 @@
+"""Exercise intensity scores (1-10) computed on the desktop.
+
+Mirrors calculateIntensityLevel() in the firmware, which only shows the
+score on the rope's display: every metric is clamped to a range and
+normalized to 0..1, the weighted sum is scaled to 1..10 and rounded. The
+arithmetic is done in float32 like on the device, so with the default
+model the scores match what the rope displayed.
+
+Usage:
+    python intensity.py                                        # score the whole archive
+    python intensity.py --weight finalFrequency=0.4 --weight finalJumpCount=0.0
+    python intensity.py --range avgHeartRate=60:200
+"""
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+from running_stats import StatsEngine
+
+# calculateIntensityLevel(): normalization range and weight of each metric
+DEFAULT_RANGES = (
+    ("avgHeartRate", 50, 255),
+    ("maxHeartRate", 50, 255),
+    ("finalFrequency", 30, 500),
+    ("finalJumpCount", 0, 10000),
+    ("exerciseDuration", 0, 6000),
+)
+DEFAULT_WEIGHT = 0.2
+LEVELS = (1, 10)
+
+
+class IntensityModel:
+    """Normalization ranges and weights of the intensity score; immutable and hashable"""
+
+    def __init__(self, ranges=None, weights=None):
+        ranges = dict(ranges or {})
+        weights = dict(weights or {})
+        unknown = (set(ranges) | set(weights)) - {metric for metric, _, _ in DEFAULT_RANGES}
+        if unknown:
+            raise ValueError(f"Unknown intensity metrics: {', '.join(sorted(unknown))}")
+
+        terms = []
+        for metric, low, high in DEFAULT_RANGES:
+            low, high = ranges.get(metric, (low, high))
+            terms.append((metric, low, high, float(weights.get(metric, DEFAULT_WEIGHT))))
+        self.terms = tuple(terms)  # (metric, low, high, weight) in firmware order
+
+    @property
+    def key(self):
+        return self.terms
+
+    def __eq__(self, other):
+        return isinstance(other, IntensityModel) and self.terms == other.terms
+
+    def __hash__(self):
+        return hash(self.terms)
+
+    def __repr__(self):
+        return f"IntensityModel({', '.join(f'{m}={w:g}@{lo}:{hi}' for m, lo, hi, w in self.terms)})"
+
+    def ranges(self):
+        return {metric: (low, high) for metric, low, high, _ in self.terms}
+
+    def weights(self):
+        return {metric: weight for metric, _, _, weight in self.terms}
+
+    def score(self, columns):
+        """Intensity level of every record in columns (dict of arrays) as int8"""
+        total = None
+        for metric, low, high, weight in self.terms:
+            values = np.asarray(columns[metric])
+            if high > low:
+                # constrain(), then (float)(value - low) / (high - low), all in float32
+                clamped = np.clip(values, low, high).astype(np.float32)
+                normalized = (clamped - np.float32(low)) / np.float32(high - low)
+            else:
+                normalized = np.zeros(len(values), dtype=np.float32)
+            term = normalized * np.float32(weight)
+            total = term if total is None else total + term
+        if total is None:
+            return np.empty(0, dtype=np.int8)
+
+        # (int)(totalScore * 10 + 0.5): the product is float, the 0.5 literal makes the sum double
+        scaled = (total * np.float32(10)).astype(np.float64) + 0.5
+        return np.clip(scaled.astype(np.int64), *LEVELS).astype(np.int8)
+
+
+DEFAULT_MODEL = IntensityModel()
+
+
+class _Scores:
+    """Scores of one store under one model and their statistics per mode; grows as the store does"""
+
+    __slots__ = ("values", "count", "stats")
+
+    def __init__(self):
+        self.values = np.empty(0, dtype=np.int8)
+        self.count = 0
+        self.stats = StatsEngine(metrics=("intensity",))
+
+
+class IntensityScorer:
+    """Intensity scores of record stores, cached per (store, model).
+
+    Stores only ever grow, so a cached score column is extended with the
+    scores of new records instead of being recomputed, and the running
+    statistics of the scores (stats()) are fed the same new scores. Up to
+    max_models parameter sets are kept per store, most recently used
+    first, so switching back to an earlier weighting is free.
+    """
+
+    def __init__(self, max_models=8):
+        self.max_models = max_models
+        self._cache = weakref.WeakKeyDictionary()  # Store -> OrderedDict(model -> _Scores)
+        self._lock = threading.Lock()
+
+    def scores(self, store, model=DEFAULT_MODEL):
+        """Score of every record in store, in store order"""
+        return self._update(store, model).values[:len(store)]
+
+    def stats(self, store, model=DEFAULT_MODEL):
+        """StatsEngine with the "intensity" statistics per mode of every record in store"""
+        return self._update(store, model).stats
+
+    def _update(self, store, model):
+        """Cache entry of (store, model), extended to the records store has now"""
+        with self._lock:
+            models = self._cache.get(store)
+            if models is None:
+                models = self._cache[store] = OrderedDict()
+            entry = models.get(model)
+            if entry is None:
+                entry = models[model] = _Scores()
+                while len(models) > self.max_models:
+                    models.popitem(last=False)
+            models.move_to_end(model)
+
+            count = len(store)
+            if entry.count < count:
+                new = model.score({metric: store.column(metric)[entry.count:count]
+                                   for metric, _, _, _ in model.terms})
+                if len(entry.values) < count:
+                    grown = np.empty(max(count, len(entry.values) * 2, 1024), dtype=np.int8)
+                    grown[:entry.count] = entry.values[:entry.count]
+                    entry.values = grown
+                entry.values[entry.count:count] = new
+                entry.stats.add_columns({"mode": store.column("mode")[entry.count:count], "intensity": new})
+                entry.count = count
+            return entry
+
+    def mode_column(self, store, mode, model=DEFAULT_MODEL, start=0, end=None):
+        """Scores of the records of mode (optionally the start:end range of them), like RecordStore.mode_column"""
+        scores = self.scores(store, model)
+        index = store.mode_indices(mode)[start:end]
+        return scores.take(index[index < len(scores)])
+
+    def clear(self):
+        with self._lock:
+            self._cache = weakref.WeakKeyDictionary()
+
+
+def parse_args(argv=None):
+    import argparse
+
+    from ingest import ARCHIVE_DIR
+
+    parser = argparse.ArgumentParser(description="Score archived sessions with the intensity model")
+    parser.add_argument("--archive", default=ARCHIVE_DIR)
+    parser.add_argument("--weight", action="append", default=[], metavar="METRIC=WEIGHT")
+    parser.add_argument("--range", action="append", default=[], metavar="METRIC=LOW:HIGH")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Re-score every archived record and print the distribution of levels"""
+    from session_archive import SessionArchive
+
+    args = parse_args(argv)
+    weights = {metric: float(value) for metric, value in (item.split("=", 1) for item in args.weight)}
+    ranges = {metric: tuple(float(part) for part in value.split(":", 1))
+              for metric, value in (item.split("=", 1) for item in args.range)}
+    model = IntensityModel(ranges, weights)
+
+    archive = SessionArchive(args.archive)
+    try:
+        start = time.perf_counter()
+        scores = model.score({metric: archive.column(metric) for metric, _, _, _ in model.terms})
+        elapsed = time.perf_counter() - start
+    finally:
+        archive.close()
+
+    print(f"{model}")
+    print(f"Scored {len(scores)} records in {elapsed * 1000:.1f} ms")
+    counts = np.bincount(scores.astype(np.int64), minlength=LEVELS[1] + 1)
+    for level in range(LEVELS[0], LEVELS[1] + 1):
+        print(f"Level {level:>2}: {counts[level]}")
+
+
+if __name__ == "__main__":
+    main()
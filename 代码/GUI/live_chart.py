@@ -0,0 +1,313 @@
+import numpy as np
+
+from decimation import minmax_decimate, lttb, visible_slice
+from perf import PERF
+
+
+class IncrementalPlot:
+    """Line plot with persistent artists that appends points and redraws with blitting.
+
+    A full canvas draw only happens when the series changes (new mode or
+    Y-axis), when new points fall outside the current axis limits, or when
+    the canvas is resized. Otherwise the saved background is restored and
+    only the line and the newest annotations are drawn on top of it.
+
+    Only the part of the series inside the current X limits is handed to
+    the line, decimated to about one point per pixel of axes width, and
+    point labels are drawn only while few points are visible. Panning or
+    zooming (e.g. with the navigation toolbar) recomputes that view, so
+    drawing cost follows the screen size rather than the data size.
+    """
+
+    def __init__(self, figure, canvas, headroom=0.25, max_fresh_artists=50,
+                 annotate_limit=60, lod=True, method="minmax"):
+        self.figure = figure
+        self.canvas = canvas
+        self.axes = figure.add_subplot(111)
+        self.headroom = headroom  # Extra axis range added when points run off the chart
+        self.max_fresh_artists = max_fresh_artists  # Fold blitted labels into the background after this many
+        self.annotate_limit = annotate_limit  # Label points only when at most this many are visible
+        self.lod = lod  # Decimate the visible range to the canvas width
+        self.method = method  # "minmax" or "lttb"
+
+        self.line, = self.axes.plot([], [], 'o-', color='#2196F3', animated=True)
+        self.message = self.axes.text(0.5, 0.5, '',
+                                      horizontalalignment='center',
+                                      verticalalignment='center',
+                                      transform=self.axes.transAxes,
+                                      fontsize=14,
+                                      color='red',
+                                      alpha=0.7)
+        self.axes.grid(True, linestyle='--', alpha=0.7)
+
+        self._x = np.empty(0)
+        self._y = np.empty(0)
+        self._annotations = []
+        self._fresh = []  # Animated annotations not yet part of the background
+        self._labelled = False  # Whether the current view carries point labels
+        self._background = None
+        self._setting_limits = False
+        self.visible_points = 0
+        self.drawn_points = 0
+        self.full_draws = 0
+        self.blits = 0
+
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+        self.canvas.mpl_connect('resize_event', self._on_resize)
+        self.axes.callbacks.connect('xlim_changed', self._on_xlim_changed)
+
+    def __len__(self):
+        return len(self._x)
+
+    def set_series(self, x, y, title, xlabel, ylabel):
+        """Replace the plotted series and redraw everything"""
+        self._x = np.asarray(x, dtype=np.float64)
+        self._y = np.asarray(y, dtype=np.float64)
+
+        self.message.set_text('')
+        self.axes.axis('on')
+        self.axes.set_title(title, fontsize=14)
+        self.axes.set_xlabel(xlabel, fontsize=12)
+        self.axes.set_ylabel(ylabel, fontsize=12)
+
+        self._fit_limits()
+        self.update_view()
+        self.redraw(layout=True)
+
+    def extend(self, x, y):
+        """Append points to the plotted series"""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if not len(x):
+            return
+        following = not len(self._x) or self._x[-1] <= self.axes.get_xlim()[1]
+        self._x = np.concatenate((self._x, x))
+        self._y = np.concatenate((self._y, y))
+
+        if not following:
+            # The user is looking at older data; keep the view where it is
+            return
+
+        if not self._within_limits(x, y):
+            self._grow_limits()
+            self.update_view()
+            self.redraw()
+            return
+
+        was_labelled = self._labelled
+        start = len(self._x) - len(x)
+        self._update_line()
+        if was_labelled != self._labelled:
+            self._update_labels()
+            self.redraw()
+        elif self._labelled and len(self._fresh) + len(x) <= self.max_fresh_artists:
+            self._fresh.extend(self._add_annotations(self._x[start:], self._y[start:], animated=True))
+            self.blit()
+        elif self._labelled:
+            self._add_annotations(self._x[start:], self._y[start:], animated=False)
+            self.redraw()
+        else:
+            self.blit()
+
+    def show_message(self, text, title="Data Chart"):
+        """Clear the series and show a centred message"""
+        self._x = np.empty(0)
+        self._y = np.empty(0)
+        self.line.set_data(self._x, self._y)
+        self._clear_annotations()
+        self._labelled = False
+        self.message.set_text(text)
+        self.axes.set_title(title, fontsize=14)
+        self.axes.axis('off')
+        self.redraw(layout=True)
+
+    def reset_view(self):
+        """Zoom back out to the whole series"""
+        if len(self._x):
+            self._fit_limits()
+            self.update_view()
+            self.redraw()
+
+    def update_view(self):
+        """Recompute the decimated line and labels for the current X limits"""
+        self._update_line()
+        self._update_labels()
+
+    @PERF.timed("chart.draw")
+    def redraw(self, layout=False):
+        """Full draw of the canvas; the background is recaptured in _on_draw"""
+        for artist in self._fresh:
+            artist.set_animated(False)
+        self._fresh = []
+        if layout:
+            self.figure.tight_layout()
+        self.canvas.draw()
+        self.full_draws += 1
+
+    @PERF.timed("chart.blit")
+    def blit(self):
+        """Redraw only the animated artists on top of the saved background"""
+        if self._background is None:
+            self.redraw()
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_animated()
+        self.canvas.blit(self.figure.bbox)
+        self.blits += 1
+
+    def _on_draw(self, event):
+        """Save the freshly drawn background and put the animated artists back"""
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_animated()
+
+    def _on_resize(self, event):
+        # The decimation target depends on the axes width in pixels
+        if len(self._x):
+            self.update_view()
+
+    def _on_xlim_changed(self, axes):
+        # Pan/zoom from the toolbar; the toolbar draws the canvas afterwards
+        if not self._setting_limits and len(self._x):
+            self.update_view()
+
+    def _draw_animated(self):
+        self.figure.draw_artist(self.line)
+        for artist in self._fresh:
+            self.figure.draw_artist(artist)
+
+    def _update_line(self):
+        """Give the line only the visible points, decimated to the axes width"""
+        start, end = visible_slice(self._x, *self.axes.get_xlim())
+        x = self._x[start:end]
+        y = self._y[start:end]
+        self.visible_points = len(x)
+
+        width = max(int(self.axes.bbox.width), 1)
+        if self.lod and len(x) > width:
+            if self.method == "lttb":
+                x, y = lttb(x, y, width)
+            else:
+                x, y = minmax_decimate(x, y, width // 2)
+        self.drawn_points = len(x)
+        self.line.set_data(x, y)
+
+        # Markers only help while points are far enough apart to see
+        self.line.set_marker('o' if self.visible_points <= width // 4 else '')
+        self._labelled = self.visible_points <= self.annotate_limit
+
+    def _update_labels(self):
+        """Label the visible points, or drop the labels if there are too many"""
+        self._clear_annotations()
+        if self._labelled:
+            start, end = visible_slice(self._x, *self.axes.get_xlim())
+            self._add_annotations(self._x[start:end], self._y[start:end], animated=False)
+
+    def _add_annotations(self, x, y, animated):
+        """Label each point with its value"""
+        added = []
+        for xv, yv in zip(x.tolist(), y.tolist()):
+            label = f'{int(yv)}' if yv == int(yv) else f'{yv}'
+            added.append(self.axes.annotate(label, (xv, yv), textcoords="offset points",
+                                            xytext=(0, 10), ha='center', animated=animated))
+        self._annotations.extend(added)
+        return added
+
+    def _clear_annotations(self):
+        for artist in self._annotations:
+            artist.remove()
+        self._annotations = []
+        self._fresh = []
+
+    def _within_limits(self, x, y):
+        x_low, x_high = self.axes.get_xlim()
+        y_low, y_high = self.axes.get_ylim()
+        return (x.min() >= x_low and x.max() <= x_high and
+                y.min() >= y_low and y.max() <= y_high)
+
+    def _set_limits(self, x_limits, y_limits):
+        self._setting_limits = True
+        try:
+            self.axes.set_xlim(*x_limits)
+            self.axes.set_ylim(*y_limits)
+        finally:
+            self._setting_limits = False
+
+    def _fit_limits(self):
+        """Set axis limits to the data plus a small margin"""
+        self._set_limits(self._padded(self._x, 0.05), self._padded(self._y, 0.1))
+
+    def _grow_limits(self):
+        """Extend the axis limits with headroom so following points can be blitted"""
+        x_low, x_high = self._padded(self._x, 0.05)
+        y_low, y_high = self._padded(self._y, 0.1)
+        y_span = (y_high - y_low) * self.headroom / 2
+
+        view_low, view_high = self.axes.get_xlim()
+        if view_low > self._x[0]:
+            # Zoomed in on the live end: scroll along and keep the zoom width
+            width = view_high - view_low
+            x_limits = (self._x[-1] - width * (1 - self.headroom), self._x[-1] + width * self.headroom)
+        else:
+            x_limits = (x_low, x_high + (x_high - x_low) * self.headroom)
+        self._set_limits(x_limits, (y_low - y_span, y_high + y_span))
+
+    @staticmethod
+    def _padded(values, margin):
+        low, high = float(values.min()), float(values.max())
+        pad = (high - low) * margin or max(abs(high) * margin, 1.0)
+        return low - pad, high + pad
+
+
+class StripChart:
+    """Scrolling cadence and heart rate traces of the session in progress.
+
+    Shows the last span seconds of samples; the frequency band the rope
+    vibrates outside of is shaded. Only the line data, limits and band
+    change between frames, and the canvas is redrawn with draw_idle.
+    """
+
+    def __init__(self, figure, canvas, span=60.0):
+        self.figure = figure
+        self.canvas = canvas
+        self.span = span
+        self.axes = figure.add_subplot(111)
+        self.heart_axes = self.axes.twinx()
+        self.cadence_line, = self.axes.plot([], [], color='#2196F3', label='Cadence')
+        self.heart_line, = self.heart_axes.plot([], [], color='#f44336', label='Heart rate')
+        self.axes.set_xlabel("Session time (s)")
+        self.axes.set_ylabel("Jumps/min", color='#2196F3')
+        self.heart_axes.set_ylabel("BPM", color='#f44336')
+        self.axes.grid(True, linestyle='--', alpha=0.5)
+        figure.subplots_adjust(left=0.08, right=0.92, bottom=0.25, top=0.95)
+        self._band = None
+        self._band_limits = None
+
+    @PERF.timed("chart.strip")
+    def update(self, t, cadence, heart_rate, min_freq, max_freq):
+        """Show the latest samples; t in seconds"""
+        if not len(t):
+            self.cadence_line.set_data([], [])
+            self.heart_line.set_data([], [])
+            self.canvas.draw_idle()
+            return
+
+        end = float(t[-1])
+        start = max(end - self.span, 0.0)
+        first = int(np.searchsorted(t, start))
+        self.cadence_line.set_data(t[first:], cadence[first:])
+        self.heart_line.set_data(t[first:], heart_rate[first:])
+        self.axes.set_xlim(start, max(end, start + self.span))
+
+        cadence_top = max(float(np.max(cadence[first:], initial=0.0)), max_freq) * 1.15
+        self.axes.set_ylim(0, cadence_top)
+        visible_heart = heart_rate[first:]
+        visible_heart = visible_heart[~np.isnan(visible_heart)]
+        if len(visible_heart):
+            self.heart_axes.set_ylim(min(float(visible_heart.min()), 60) - 5, max(float(visible_heart.max()), 180) + 5)
+
+        if self._band_limits != (min_freq, max_freq):
+            if self._band is not None:
+                self._band.remove()
+            self._band = self.axes.axhspan(min_freq, max_freq, color='#4CAF50', alpha=0.12)
+            self._band_limits = (min_freq, max_freq)
+        self.canvas.draw_idle()
@@ -0,0 +1,220 @@
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+from perf import PERF
+from telemetry import HeartRate, Jump, SessionEnd, SessionStart
+
+BANDS = ("none", "below", "in", "above")
+
+
+class RingBuffer:
+    """Fixed-capacity numeric buffer; appending overwrites the oldest value"""
+
+    def __init__(self, capacity, dtype=np.float64):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=dtype)
+        self._start = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, value):
+        end = self._start + self._count
+        self._data[end % self.capacity] = value
+        if self._count < self.capacity:
+            self._count += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+
+    def values(self):
+        """Contents oldest first, as a new array"""
+        end = self._start + self._count
+        if end <= self.capacity:
+            return self._data[self._start:end].copy()
+        return np.concatenate((self._data[self._start:], self._data[:end - self.capacity]))
+
+    def clear(self):
+        self._start = 0
+        self._count = 0
+
+
+class LiveMetrics:
+    """Rolling metrics of the session in progress on one rope, updated per telemetry event.
+
+    Cadence is the number of valid jumps in the last window_ms of device
+    time; heart rate is the latest sample plus its mean over the same
+    window. Like checkFrequencyAndVibrate(), the rope counts as out of
+    band while its frequency is above zero and outside min_freq..max_freq;
+    the time spent below and above the band is accumulated. band_rule
+    "firmware" judges the band on the firmware's own frequency
+    (cumulative jumps over whole seconds, after the first 5 s, as in
+    updateFrequency()), so the totals track when the rope vibrated;
+    "window" uses the sliding-window cadence instead. Every event costs
+    O(1) amortized time. Samples for a strip chart are kept in ring
+    buffers, at most one per sample_ms.
+    """
+
+    def __init__(self, window_ms=10000, sample_ms=250, history=2400, band_rule="firmware",
+                 min_freq=60, max_freq=200):
+        self.window_ms = window_ms
+        self.sample_ms = sample_ms
+        self.band_rule = band_rule
+        self.default_band = (min_freq, max_freq)
+        self.sample_times = RingBuffer(history)
+        self.sample_cadence = RingBuffer(history)
+        self.sample_heart_rate = RingBuffer(history)
+        self.version = 0  # Incremented for every batch of events
+        self._lock = threading.Lock()
+        self.sessions = 0
+        self._start_session(0, None, *self.default_band)
+        self.active = False
+
+    def _start_session(self, t_ms, mode, min_freq, max_freq):
+        self.active = True
+        self.mode = mode
+        self.min_freq = min_freq
+        self.max_freq = max_freq
+        self.t_ms = t_ms
+        self.jumps = 0
+        self.jump_times = deque()
+        self.last_jump_ms = None
+        self.instant_cadence = 0.0
+        self.firmware_frequency = 0.0
+        self.heart_rate = None
+        self.heart_rates = deque()
+        self.heart_rate_sum = 0
+        self.max_heart_rate = None
+        self.band = "none"
+        self.band_ms = dict.fromkeys(BANDS, 0)
+        self._last_sample_ms = None
+        for buffer in (self.sample_times, self.sample_cadence, self.sample_heart_rate):
+            buffer.clear()
+
+    @PERF.timed("metrics.events", items=lambda self, events: len(events))
+    def add_events(self, events):
+        """Apply a batch of telemetry events in order"""
+        with self._lock:
+            for event in events:
+                kind = type(event)
+                if kind is SessionStart:
+                    self._start_session(event.t_ms, event.mode, event.min_freq, event.max_freq)
+                    self.sessions += 1
+                    continue
+                if not self.active:
+                    continue
+                self._advance(event.t_ms)
+                if kind is Jump:
+                    if event.valid:
+                        self._add_jump(event)
+                elif kind is HeartRate:
+                    self._add_heart_rate(event)
+                elif kind is SessionEnd:
+                    self.active = False
+                self._update_band()
+                self._sample()
+            self.version += 1
+
+    def _advance(self, t_ms):
+        """Move the clock to t_ms, crediting the elapsed time to the current band"""
+        if t_ms > self.t_ms:
+            self.band_ms[self.band] += t_ms - self.t_ms
+            self.t_ms = t_ms
+        cutoff = self.t_ms - self.window_ms
+        times = self.jump_times
+        while times and times[0] <= cutoff:
+            times.popleft()
+        rates = self.heart_rates
+        while rates and rates[0][0] <= cutoff:
+            self.heart_rate_sum -= rates.popleft()[1]
+
+    def _add_jump(self, event):
+        self.jumps = event.count
+        self.jump_times.append(event.t_ms)
+        if self.last_jump_ms is not None and event.t_ms > self.last_jump_ms:
+            self.instant_cadence = 60000.0 / (event.t_ms - self.last_jump_ms)
+        self.last_jump_ms = event.t_ms
+
+    def _add_heart_rate(self, event):
+        self.heart_rate = event.bpm
+        self.heart_rates.append((event.t_ms, event.bpm))
+        self.heart_rate_sum += event.bpm
+        if self.max_heart_rate is None or event.bpm > self.max_heart_rate:
+            self.max_heart_rate = event.bpm
+
+    @property
+    def cadence(self):
+        """Valid jumps per minute over the sliding window"""
+        span = min(max(self.t_ms, 1000), self.window_ms)
+        return len(self.jump_times) * 60000.0 / span
+
+    @property
+    def mean_heart_rate(self):
+        """Mean heart rate over the sliding window"""
+        return self.heart_rate_sum / len(self.heart_rates) if self.heart_rates else None
+
+    def _update_band(self):
+        # updateFrequency(): jumps over whole elapsed seconds, only after the first 5 s
+        elapsed = self.t_ms // 1000
+        if elapsed > 5:
+            self.firmware_frequency = self.jumps / elapsed * 60
+
+        frequency = self.firmware_frequency if self.band_rule == "firmware" else self.cadence
+        if frequency <= 0:
+            self.band = "none"
+        elif frequency < self.min_freq:
+            self.band = "below"
+        elif frequency > self.max_freq:
+            self.band = "above"
+        else:
+            self.band = "in"
+
+    def _sample(self):
+        if self._last_sample_ms is not None and self.t_ms - self._last_sample_ms < self.sample_ms:
+            return
+        self._last_sample_ms = self.t_ms
+        self.sample_times.append(self.t_ms / 1000.0)
+        self.sample_cadence.append(self.cadence)
+        self.sample_heart_rate.append(self.heart_rate if self.heart_rate is not None else math.nan)
+
+    def snapshot(self):
+        """Current values as a dict"""
+        with self._lock:
+            return {"active": self.active, "mode": self.mode, "t_ms": self.t_ms, "jumps": self.jumps,
+                    "cadence": self.cadence, "instant_cadence": self.instant_cadence,
+                    "firmware_frequency": self.firmware_frequency,
+                    "heart_rate": self.heart_rate, "mean_heart_rate": self.mean_heart_rate,
+                    "max_heart_rate": self.max_heart_rate,
+                    "min_freq": self.min_freq, "max_freq": self.max_freq, "band": self.band,
+                    "below_ms": self.band_ms["below"], "above_ms": self.band_ms["above"],
+                    "in_band_ms": self.band_ms["in"]}
+
+    def series(self):
+        """Strip chart samples: (seconds, cadence, heart rate) arrays"""
+        with self._lock:
+            return self.sample_times.values(), self.sample_cadence.values(), self.sample_heart_rate.values()
+
+
+class LiveMetricsHub:
+    """One LiveMetrics per device, fed from SerialPage.telemetry_listeners"""
+
+    def __init__(self, **options):
+        self.options = options
+        self.engines = {}
+        self.latest = None  # Device that sent the most recent events
+        self._lock = threading.Lock()
+
+    def on_events(self, device, events):
+        engine = self.engines.get(device)
+        if engine is None:
+            with self._lock:
+                engine = self.engines.setdefault(device, LiveMetrics(**self.options))
+        engine.add_events(events)
+        self.latest = device
+
+    def engine(self, device=None):
+        """Metrics of device, or of the device heard from last"""
+        return self.engines.get(self.latest if device is None else device)
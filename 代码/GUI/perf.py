@@ -0,0 +1,250 @@
+import atexit
+import functools
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+# Latency buckets: SUBDIVISIONS per power of two, from 2**MIN_EXPONENT s (~1 us) to 2**MAX_EXPONENT s (64 s)
+MIN_EXPONENT = -20
+MAX_EXPONENT = 6
+SUBDIVISIONS = 4
+BUCKETS = (MAX_EXPONENT - MIN_EXPONENT) * SUBDIVISIONS
+PERCENTILES = (50, 90, 99)
+
+
+def _bucket(seconds):
+    """Histogram bucket of a latency"""
+    if seconds <= 0:
+        return 0
+    mantissa, exponent = math.frexp(seconds)  # seconds = mantissa * 2**exponent, 0.5 <= mantissa < 1
+    index = (exponent - 1 - MIN_EXPONENT) * SUBDIVISIONS + int((mantissa - 0.5) * 2 * SUBDIVISIONS)
+    return min(max(index, 0), BUCKETS - 1)
+
+
+def _bucket_upper(index):
+    """Upper bound of a bucket in seconds"""
+    octave, step = divmod(index, SUBDIVISIONS)
+    return 2.0 ** (octave + MIN_EXPONENT) * (1 + (step + 1) / SUBDIVISIONS)
+
+
+class Probe:
+    """Call count, items handled and a log-scale latency histogram for one code path"""
+
+    __slots__ = ("name", "calls", "items", "errors", "total", "max", "buckets", "_lock")
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.items = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def record(self, seconds, items=1, error=False):
+        index = _bucket(seconds)
+        with self._lock:
+            self.calls += 1
+            self.items += items
+            self.errors += error
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+            self.buckets[index] += 1
+
+    def percentile(self, p):
+        """Approximate latency percentile in seconds (upper edge of its bucket)"""
+        if not self.calls:
+            return None
+        rank = p / 100.0 * self.calls
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(_bucket_upper(index), self.max)
+        return self.max
+
+    def summary(self):
+        with self._lock:
+            result = {"calls": self.calls, "items": self.items, "errors": self.errors,
+                      "mean_ms": self.total / self.calls * 1000 if self.calls else None,
+                      "max_ms": self.max * 1000 if self.calls else None,
+                      "total_s": self.total}
+            for p in PERCENTILES:
+                value = self.percentile(p)
+                result[f"p{p}_ms"] = value * 1000 if value is not None else None
+        return result
+
+
+class Gauge:
+    """A sampled level such as a queue depth, with the highest value seen"""
+
+    __slots__ = ("name", "fn", "last", "max")
+
+    def __init__(self, name, fn=None):
+        self.name = name
+        self.fn = fn
+        self.last = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.last = value
+        if value > self.max:
+            self.max = value
+
+    def sample(self):
+        if self.fn is not None:
+            try:
+                self.observe(self.fn())
+            except Exception:
+                pass
+        return self.last
+
+    def reset(self):
+        self.max = self.last
+
+
+class PerfRegistry:
+    """Named probes and gauges for the hot paths of the app.
+
+    Instrumented code checks self.enabled before reading the clock, so when
+    instrumentation is off each instrumented call costs one attribute test.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.probes = {}
+        self.gauges = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def probe(self, name):
+        """The probe called name, created on first use"""
+        probe = self.probes.get(name)
+        if probe is None:
+            with self._lock:
+                probe = self.probes.setdefault(name, Probe(name))
+        return probe
+
+    def gauge(self, name, fn=None):
+        """The gauge called name; fn, if given, is called to sample it"""
+        gauge = self.gauges.get(name)
+        if gauge is None:
+            with self._lock:
+                gauge = self.gauges.setdefault(name, Gauge(name, fn))
+        if fn is not None:
+            gauge.fn = fn
+        return gauge
+
+    def observe(self, name, value):
+        """Record the current level of a gauge"""
+        if self.enabled:
+            self.gauge(name).observe(value)
+
+    def timed(self, name, items=None):
+        """Decorator timing every call of a function under probe name.
+
+        items, if given, is called with the same arguments and returns how
+        many items (lines, records, rows) the call handled.
+        """
+        probe = self.probe(name)
+
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                error = True
+                try:
+                    result = fn(*args, **kwargs)
+                    error = False
+                    return result
+                finally:
+                    probe.record(time.perf_counter() - start,
+                                 items(*args, **kwargs) if items is not None else 1, error)
+            return wrapper
+        return decorate
+
+    def snapshot(self):
+        """Summaries of every probe and gauge"""
+        gauges = {}
+        for name, gauge in list(self.gauges.items()):
+            if self.enabled:
+                gauge.sample()
+            gauges[name] = {"last": gauge.last, "max": gauge.max}
+        return {"enabled": self.enabled,
+                "time": time.time(),
+                "uptime_s": time.time() - self.started,
+                "startup": STARTUP.report(),
+                "probes": {name: probe.summary() for name, probe in sorted(self.probes.items())},
+                "gauges": dict(sorted(gauges.items()))}
+
+    def reset(self):
+        """Clear all counters"""
+        for probe in list(self.probes.values()):
+            with probe._lock:
+                probe.reset()
+        for gauge in list(self.gauges.values()):
+            gauge.reset()
+        self.started = time.time()
+
+    def dump(self, path):
+        """Write a snapshot to path as JSON"""
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.snapshot(), file, indent=2)
+
+
+class StartupTimer:
+    """Milestones of application startup, in seconds since this module was imported.
+
+    mark() records when a milestone (imports done, first paint) was first
+    reached; record() keeps the duration of one-off steps such as building
+    a page. append_to() adds a report to a JSON lines file so startup time
+    can be compared across releases and machines.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.marks = {}
+        self.durations = {}
+
+    def mark(self, name):
+        """Note that milestone name was reached now (only the first time counts)"""
+        self.marks.setdefault(name, time.perf_counter() - self.started)
+
+    def record(self, name, seconds):
+        """Keep the duration of a one-off step"""
+        self.durations[name] = seconds
+
+    def report(self):
+        return {"marks_ms": {name: value * 1000 for name, value in self.marks.items()},
+                "durations_ms": {name: value * 1000 for name, value in self.durations.items()}}
+
+    def append_to(self, path):
+        """Append this run's report to a JSON lines file"""
+        import platform
+
+        entry = {"time": time.strftime('%Y-%m-%d %H:%M:%S'),
+                 "python": platform.python_version(),
+                 "platform": sys.platform,
+                 "machine": platform.machine()}
+        entry.update(self.report())
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(entry) + "\n")
+
+
+# Startup clock; GUI.py imports this module first so the marks include every other import
+STARTUP = StartupTimer()
+
+# Shared registry; JUMPROPE_PERF=1 turns it on at startup, JUMPROPE_PERF_DUMP=<path> also dumps it on exit
+PERF = PerfRegistry(enabled=os.environ.get("JUMPROPE_PERF") == "1" or bool(os.environ.get("JUMPROPE_PERF_DUMP")))
+if os.environ.get("JUMPROPE_PERF_DUMP"):
+    atexit.register(PERF.dump, os.environ["JUMPROPE_PERF_DUMP"])
@@ -0,0 +1,240 @@
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Column names match the keys used for records throughout the GUI
+FIELDS = ("mode", "exerciseDuration", "avgHeartRate", "maxHeartRate", "finalFrequency", "finalJumpCount")
+COLUMNS = FIELDS + ("timestamp", "device")
+DTYPES = {
+    "mode": np.int8,
+    "exerciseDuration": np.int32,
+    "avgHeartRate": np.int16,
+    "maxHeartRate": np.int16,
+    "finalFrequency": np.float64,
+    "finalJumpCount": np.int32,
+    "timestamp": np.float64,
+    "device": np.int16,  # Id from a DeviceRegistry; 0 is an unknown device
+}
+MODE_COUNT = 3
+
+
+class DeviceRegistry:
+    """Maps device names (e.g. serial ports) to the small integer ids stored per record"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = [""]
+        self._ids = {"": 0}
+
+    def id(self, name):
+        """Id for name, registering it on first use"""
+        name = name or ""
+        device_id = self._ids.get(name)
+        if device_id is None:
+            with self._lock:
+                device_id = self._ids.get(name)
+                if device_id is None:
+                    device_id = self._ids[name] = len(self._names)
+                    self._names.append(name)
+        return device_id
+
+    def name(self, device_id):
+        return self._names[device_id]
+
+    def names(self):
+        return list(self._names)
+
+
+_FILE_DATE = re.compile(r"JumpRopeData_(\d{8})_\d{6}")
+
+
+class ParsedBatch:
+    """Columnar result of parsing a block of device lines"""
+
+    def __init__(self, columns, malformed):
+        self.columns = columns  # Column name -> NumPy array
+        self.malformed = malformed  # Lines that could not be parsed
+
+    def __len__(self):
+        return len(self.columns["mode"])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def records(self):
+        """Yield each parsed row as a record dict"""
+        cols = [self.columns[name].tolist() for name in COLUMNS]
+        last_ts, last_time = None, None
+        for mode, duration, avg_hr, max_hr, freq, count, ts, device in zip(*cols):
+            if ts != last_ts:
+                last_ts, last_time = ts, time.strftime('%H:%M:%S', time.localtime(ts))
+            yield {
+                "mode": mode,
+                "exerciseDuration": duration,
+                "avgHeartRate": avg_hr,
+                "maxHeartRate": max_hr,
+                "finalFrequency": freq,
+                "finalJumpCount": count,
+                "recordTime": last_time,
+                "device": device
+            }
+
+
+def empty_columns():
+    """Return a dict of zero-length columns"""
+    return {name: np.empty(0, dtype=DTYPES[name]) for name in COLUMNS}
+
+
+def _to_values(fields, originals, malformed, field_count):
+    """Convert comma-separated numeric strings to an (n, field_count) float array.
+
+    Returns the array and the original lines of the rows it holds; rows
+    with non-numeric fields are moved to malformed.
+    """
+    if not fields:
+        return np.empty((0, field_count)), originals
+    try:
+        # Fast path: one conversion over every field of every line
+        values = np.array(','.join(fields).split(','), dtype=np.float64)
+        return values.reshape(-1, field_count), originals
+    except ValueError:
+        pass
+
+    # Slow path, only when the block contains non-numeric fields
+    good_lines, rows = [], []
+    for text, line in zip(fields, originals):
+        try:
+            rows.append([float(part) for part in text.split(',')])
+            good_lines.append(line)
+        except ValueError:
+            malformed.append(line)
+    return np.array(rows, dtype=np.float64).reshape(-1, field_count), good_lines
+
+
+def _build_columns(values, timestamps, devices, lines, malformed):
+    """Validate parsed values and cast them to typed columns"""
+    mode = values[:, 0]
+    valid = np.isfinite(values).all(axis=1) & (mode >= 0) & (mode < MODE_COUNT)
+    # Values outside an integer column's range would wrap around when cast
+    for i, name in enumerate(FIELDS):
+        if np.issubdtype(DTYPES[name], np.integer):
+            info = np.iinfo(DTYPES[name])
+            valid &= (values[:, i] >= info.min) & (values[:, i] <= info.max)
+    if not valid.all():
+        malformed.extend(line for line, ok in zip(lines, valid) if not ok)
+        values = values[valid]
+        timestamps = timestamps[valid]
+        devices = devices[valid]
+
+    columns = {name: values[:, i].astype(DTYPES[name]) for i, name in enumerate(FIELDS)}
+    columns["timestamp"] = timestamps.astype(np.float64)
+    columns["device"] = devices.astype(DTYPES["device"])
+    return columns
+
+
+def parse_lines(lines, timestamp=None, device=0):
+    """Parse six-field device lines (mode,duration,avgHR,maxHR,freq,count) in one pass.
+
+    All records get the same timestamp (default: now) and device id. Lines
+    that do not match the format are returned in ParsedBatch.malformed
+    instead of raising.
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    malformed = []
+    candidates = []
+    for line in lines:
+        line = line.strip()
+        if line.count(',') == 5:
+            candidates.append(line)
+        elif line:
+            malformed.append(line)
+
+    values, candidates = _to_values(candidates, candidates, malformed, len(FIELDS))
+    if not len(values):
+        return ParsedBatch(empty_columns(), malformed)
+    timestamps = np.full(len(values), timestamp, dtype=np.float64)
+    devices = np.full(len(values), device, dtype=DTYPES["device"])
+    return ParsedBatch(_build_columns(values, timestamps, devices, candidates, malformed), malformed)
+
+
+def parse_csv_lines(lines, date, devices=None):
+    """Parse rows written by the session file (six fields, record time, optional device).
+
+    The record time is either HH:MM:SS, combined with date (the day the
+    file was recorded), or a full "YYYY-MM-DD HH:MM:SS" as written by
+    archive exports. Device names are mapped to ids through the devices
+    registry; without one every row gets device 0.
+    """
+    malformed = []
+    fields, originals = [], []
+    day_prefix = f"{date.year},{date.month},{date.day}"
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("Mode"):
+            continue
+        name = ""
+        if line.count(',') == 7:
+            line, _, name = line.rpartition(',')
+        head, sep, tail = line.rpartition(',')
+        if sep and head.count(',') == 5 and tail.count(':') == 2:
+            # Treat the record date and time as six more numeric fields
+            day, _, clock = tail.rpartition(' ')
+            day = day.replace('-', ',') if day else day_prefix
+            fields.append(f"{head},{day},{clock.replace(':', ',')}")
+            originals.append(f"{line},{name}" if name else line)
+        else:
+            malformed.append(f"{line},{name}" if name else line)
+
+    values, originals = _to_values(fields, originals, malformed, len(FIELDS) + 6)
+    if not len(values):
+        return ParsedBatch(empty_columns(), malformed)
+
+    seconds = values[:, 9] * 3600 + values[:, 10] * 60 + values[:, 11]
+    dated = np.array([' ' in line.split(',')[6] for line in originals])
+    if not dated.all():
+        # A session left running past midnight wraps back to 00:00:00
+        undated = seconds[~dated]
+        undated += np.cumsum(np.diff(undated, prepend=undated[0]) < -12 * 3600) * 86400
+        seconds[~dated] = undated
+
+    # One datetime conversion per distinct day rather than per row
+    days, day_index = np.unique(values[:, 6:9], axis=0, return_inverse=True)
+    midnights = np.array([datetime(int(y), int(m), int(d)).timestamp() for y, m, d in days])
+    timestamps = midnights[day_index.ravel()] + seconds
+
+    if devices is None:
+        ids = np.zeros(len(originals), dtype=DTYPES["device"])
+    else:
+        ids = np.array([devices.id(line.split(',')[7] if line.count(',') == 7 else "") for line in originals],
+                       dtype=DTYPES["device"])
+    return ParsedBatch(_build_columns(values[:, :6], timestamps, ids, originals, malformed), malformed)
+
+
+def file_date(path):
+    """Recording date of a session file, from its name or else its mtime"""
+    match = _FILE_DATE.search(os.path.basename(path))
+    if match:
+        return datetime.strptime(match.group(1), "%Y%m%d").date()
+    return datetime.fromtimestamp(os.path.getmtime(path)).date()
+
+
+def load_csv_file(path, devices=None):
+    """Parse a JumpRopeData_*.csv session file into columns"""
+    with open(path, 'r', newline='', encoding='utf-8-sig') as file:
+        lines = file.read().splitlines()
+    return parse_csv_lines(lines, file_date(path), devices)
+
+
+def concat_batches(batches):
+    """Concatenate several parsed batches column by column"""
+    batches = [batch for batch in batches if len(batch) or batch.malformed]
+    if not batches:
+        return ParsedBatch(empty_columns(), [])
+    columns = {name: np.concatenate([batch.columns[name] for batch in batches]) for name in COLUMNS}
+    malformed = [line for batch in batches for line in batch.malformed]
+    return ParsedBatch(columns, malformed)
@@ -0,0 +1,114 @@
+import threading
+import time
+
+import numpy as np
+
+from record_parser import COLUMNS, DTYPES, MODE_COUNT, DeviceRegistry
+
+
+class RecordStore:
+    """Columnar in-memory store for session records.
+
+    Each field lives in its own typed NumPy array that grows by doubling,
+    and every mode keeps an index array into those columns instead of a
+    second copy of its records. A record costs about 35 bytes.
+
+    Readers get views (column) or one vectorized gather (mode_column);
+    arrays are only ever appended to, so a view taken earlier stays valid
+    while the reader thread keeps appending.
+    """
+
+    def __init__(self, capacity=1024, devices=None):
+        self._lock = threading.Lock()
+        self.devices = devices if devices is not None else DeviceRegistry()  # Names behind the device column
+        self._size = 0
+        self._columns = {name: np.empty(capacity, dtype=DTYPES[name]) for name in COLUMNS}
+        self._mode_index = {mode: np.empty(capacity, dtype=np.int32) for mode in range(MODE_COUNT)}
+        self._mode_size = {mode: 0 for mode in range(MODE_COUNT)}
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def _grow(array, needed):
+        """Return array with room for at least needed items"""
+        if needed <= len(array):
+            return array
+        capacity = max(needed, len(array) * 2, 16)
+        grown = np.empty(capacity, dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def append_columns(self, columns):
+        """Append a block of records given as a dict of equal-length columns.
+
+        Returns the (start, end) positions of the new records.
+        """
+        modes = np.asarray(columns["mode"])
+        count = len(modes)
+        if not count:
+            return self._size, self._size
+
+        with self._lock:
+            start = self._size
+            end = start + count
+            for name in COLUMNS:
+                column = self._grow(self._columns[name], end)
+                column[start:end] = columns[name]
+                self._columns[name] = column
+
+            positions = np.arange(start, end, dtype=np.int32)
+            mode_sizes = {}
+            for mode in range(MODE_COUNT):
+                selected = positions[modes == mode]
+                if not len(selected):
+                    continue
+                mode_start = self._mode_size[mode]
+                mode_end = mode_start + len(selected)
+                index = self._grow(self._mode_index[mode], mode_end)
+                index[mode_start:mode_end] = selected
+                self._mode_index[mode] = index
+                mode_sizes[mode] = mode_end
+
+            # Publish the sizes only once every slot is filled, the record count before the
+            # per-mode counts so a mode index never points past column()
+            self._size = end
+            self._mode_size.update(mode_sizes)
+        return start, end
+
+    def append(self, record):
+        """Append one record dict (recordTime is ignored in favour of timestamp)"""
+        defaults = {"timestamp": time.time(), "device": 0}
+        columns = {name: [record.get(name, defaults.get(name))] for name in COLUMNS}
+        return self.append_columns(columns)
+
+    def column(self, name):
+        """View of one field over all records"""
+        return self._columns[name][:self._size]
+
+    def mode_count(self, mode):
+        """Number of records recorded in mode"""
+        return self._mode_size.get(mode, 0)
+
+    def mode_indices(self, mode):
+        """View of the record positions belonging to mode"""
+        return self._mode_index[mode][:self._mode_size[mode]]
+
+    def mode_column(self, mode, name, start=0, end=None):
+        """One field over the records of mode (optionally the start:end range of them),
+        gathered into a contiguous array"""
+        with self._lock:
+            index = self.mode_indices(mode)[start:end]
+            column = self._columns[name]
+        return column.take(index)
+
+    def record(self, position):
+        """Rebuild the record dict stored at position"""
+        row = {name: self._columns[name][position].item() for name in COLUMNS}
+        row["recordTime"] = time.strftime('%H:%M:%S', time.localtime(row.pop("timestamp")))
+        return row
+
+    def nbytes(self):
+        """Bytes used by the live part of the store"""
+        per_record = sum(np.dtype(DTYPES[name]).itemsize for name in COLUMNS)
+        return self._size * (per_record + np.dtype(np.int32).itemsize)
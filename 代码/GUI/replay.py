@@ -0,0 +1,252 @@
+"""Replay recorded sessions or synthetic records through a virtual serial port.
+
+Usage:
+    python replay.py --synthetic 10000 --rate 500                # prints a pty path to connect to
+    python replay.py JumpRopeData/JumpRopeData_*.csv --rate 50 --burst 10
+    python replay.py --telemetry 5 --rate 40                    # live jump and heart rate frames
+
+Lines are written in the firmware's six-field format
+(mode,duration,avgHR,maxHR,freq,count) with CRLF endings, like
+handleButtonPress() prints them. Point SerialPage or ingest_daemon.py at
+the printed port to exercise the whole ingest path without a device.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+
+def synthetic_lines(count, seed=None, sequence=False):
+    """Plausible device records; with sequence=True the jump count field is the line number"""
+    rng = random.Random(seed)
+    for index in range(count):
+        mode = rng.randrange(3)
+        duration = rng.randint(20, 600)
+        avg_hr = rng.randint(90, 170)
+        max_hr = avg_hr + rng.randint(5, 30)
+        freq = round(rng.uniform(60, 200), 2)
+        jumps = index if sequence else int(freq * duration / 60)
+        yield f"{mode},{duration},{avg_hr},{max_hr},{freq:.2f},{jumps}"
+
+
+def telemetry_sessions(count, seed=None, cadence=120.0, heart_rate=130, min_freq=60, max_freq=200):
+    """Streamed sessions: telemetry frames (bytes) in time order, then the summary line.
+
+    cadence is the mean jumps per minute; it drifts during a session so the
+    rope goes in and out of the min_freq..max_freq band now and then.
+    """
+    from telemetry import HeartRate, Jump, SessionEnd, SessionStart, encode_event
+
+    rng = random.Random(seed)
+    seq = 0
+    for _ in range(count):
+        mode = rng.randrange(3)
+        jumps = rng.randint(50, 400)
+        events = [SessionStart(0, mode, min_freq, max_freq)]
+        t_ms = 0.0
+        rate = cadence
+        for index in range(1, jumps + 1):
+            rate = min(max(rate + 0.05 * (cadence - rate) + rng.gauss(0, 4), 20.0), 400.0)
+            t_ms += 60000.0 / rate * rng.uniform(0.9, 1.1)
+            events.append(Jump(int(t_ms), index, 1))
+        beats = []
+        t_beat = rng.uniform(300, 900)
+        while t_beat < t_ms:
+            bpm = min(max(int(rng.gauss(heart_rate + t_beat / 30000.0, 6)), 40), 250)  # +2 BPM a minute
+            beats.append(HeartRate(int(t_beat), bpm, bpm))
+            t_beat += 60000.0 / bpm * 4  # The firmware averages over 4 beats
+        events = sorted(events + beats, key=lambda event: event.t_ms)
+        events.append(SessionEnd(int(t_ms), jumps))
+        for event in events:
+            yield encode_event(event, seq)
+            seq += 1
+
+        duration = max(int(t_ms / 1000), 1)
+        rates = [beat.bpm for beat in beats] or [0]
+        yield (f"{mode},{duration},{sum(rates) // len(rates)},{max(rates)},"
+               f"{jumps / duration * 60:.2f},{jumps}")
+
+
+def csv_lines(paths):
+    """Device lines rebuilt from session CSV files"""
+    for path in paths:
+        with open(path, 'r', newline='', encoding='utf-8-sig') as file:
+            for row in file:
+                if row.startswith("Mode") or not row.strip():
+                    continue
+                yield ','.join(row.strip().split(',')[:6])
+
+
+class PtyPort:
+    """Pseudo-terminal pair; readers open .name like a serial port (POSIX only)"""
+
+    def __init__(self):
+        import tty
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.name = os.ttyname(self.slave)
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            written = os.write(self.master, view)
+            view = view[written:]
+
+    def close(self):
+        os.close(self.master)
+        os.close(self.slave)
+
+
+class LoopPort:
+    """pyserial loop:// port; write to it and read from .serial_port in the same process"""
+
+    def __init__(self, timeout=0.1):
+        import serial
+
+        self.serial_port = serial.serial_for_url("loop://", timeout=timeout)
+        self.name = "loop://"
+
+    def write(self, data):
+        self.serial_port.write(data)
+
+    def close(self):
+        self.serial_port.close()
+
+
+def open_virtual_port(transport="auto"):
+    """A PtyPort where available, otherwise a LoopPort"""
+    if transport == "pty" or (transport == "auto" and hasattr(os, "openpty")):
+        return PtyPort()
+    return LoopPort()
+
+
+class Replayer:
+    """Write lines to a port at a target rate, in bursts, with optional pauses.
+
+    rate is lines per second (0 = as fast as possible), burst the number of
+    lines per write; after every pause_every lines the writer goes quiet for
+    pause seconds. send_times maps line number to the time it was written.
+    Lines given as bytes (telemetry frames) are written unchanged.
+    """
+
+    def __init__(self, port, lines, rate=100.0, burst=1, pause_every=0, pause=0.0, record_times=False):
+        self.port = port
+        self.lines = lines
+        self.rate = rate
+        self.burst = max(int(burst), 1)
+        self.pause_every = pause_every
+        self.pause = pause
+        self.record_times = record_times
+        self.send_times = []
+        self.sent = 0
+        self.stop_event = threading.Event()
+        self.done = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="Replayer")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=2.0)
+
+    def run(self):
+        try:
+            start = time.perf_counter()
+            pending = []
+            for line in self.lines:
+                if self.stop_event.is_set():
+                    break
+                pending.append(line)
+                if len(pending) >= self.burst:
+                    self._send(pending)
+                    pending = []
+                    self._wait(start)
+            if pending and not self.stop_event.is_set():
+                self._send(pending)
+        finally:
+            self.done.set()
+
+    def _send(self, lines):
+        if self.record_times:
+            # Recorded before writing so a fast reader never sees a line without its time
+            now = time.perf_counter()
+            self.send_times.extend([now] * len(lines))
+        # Text lines get the firmware's CRLF; bytes (telemetry frames) are written as they are
+        self.port.write(b''.join(line if isinstance(line, bytes) else (line + '\r\n').encode('utf-8')
+                                 for line in lines))
+        before = self.sent
+        self.sent += len(lines)
+        if self.pause_every and self.sent // self.pause_every > before // self.pause_every:
+            self.stop_event.wait(self.pause)
+
+    def _wait(self, start):
+        """Sleep until the schedule for the lines sent so far"""
+        if self.rate <= 0:
+            return
+        delay = start + self.sent / self.rate - time.perf_counter()
+        if delay > 0:
+            self.stop_event.wait(delay)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay jump rope records through a virtual serial port")
+    parser.add_argument("files", nargs="*", help="Session CSV files to replay")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate this many synthetic records instead")
+    parser.add_argument("--telemetry", type=int, default=0,
+                        help="Stream this many synthetic sessions as telemetry frames plus summary lines")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--rate", type=float, default=100.0, help="Lines per second (0 = unthrottled)")
+    parser.add_argument("--burst", type=int, default=1, help="Lines per write")
+    parser.add_argument("--pause-every", type=int, default=0, help="Pause after this many lines")
+    parser.add_argument("--pause", type=float, default=0.0, help="Length of each pause in seconds")
+    parser.add_argument("--loop", action="store_true", help="Repeat the input until interrupted")
+    parser.add_argument("--wait", type=float, default=5.0, help="Seconds to wait for a reader before sending")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.files and not args.synthetic and not args.telemetry:
+        print("Give session CSV files, --synthetic N or --telemetry N", file=sys.stderr)
+        return 2
+    if not hasattr(os, "openpty"):
+        print("Virtual serial ports need a POSIX pty", file=sys.stderr)
+        return 2
+
+    def source():
+        while True:
+            if args.telemetry:
+                yield from telemetry_sessions(args.telemetry, args.seed)
+            elif args.synthetic:
+                yield from synthetic_lines(args.synthetic, args.seed)
+            else:
+                yield from csv_lines(args.files)
+            if not args.loop:
+                return
+
+    port = PtyPort()
+    print(f"Virtual serial port: {port.name}", flush=True)
+    time.sleep(args.wait)
+    replayer = Replayer(port, source(), rate=args.rate, burst=args.burst,
+                        pause_every=args.pause_every, pause=args.pause)
+    start = time.perf_counter()
+    try:
+        replayer.run()
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.perf_counter() - start
+    print(f"Sent {replayer.sent} lines in {elapsed:.2f}s ({replayer.sent / elapsed:.0f} lines/s)")
+    time.sleep(0.5)  # Let the reader drain before the pty goes away
+    port.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
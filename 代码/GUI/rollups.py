@@ -0,0 +1,428 @@
+"""Per-athlete rollups of session records, for leaderboards and trends.
+
+Every record carries the id of the device (serial port) it came from; a
+Roster says which athlete uses each device and which team each athlete
+belongs to. RollupStore keeps one small aggregate per (athlete, mode,
+day), updated with every ingested batch, plus running totals per
+(athlete, mode). Leaderboards and trends are answered from those
+aggregates, so their cost depends on the number of athletes and days
+asked for, never on the number of records.
+
+Usage:
+    python rollups.py leaderboard --metric jumps --days 30
+    python rollups.py leaderboard --metric avg_frequency --mode 0 --teams
+    python rollups.py trend Alice --mode 1 --days 14
+    python rollups.py assign COM3 Alice --team Red
+    python rollups.py rebuild                          # recompute from the archive
+"""
+import json
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from record_parser import MODE_COUNT
+from session_archive import local_days
+
+UNKNOWN_USER = "Unknown"
+
+
+class Roster:
+    """Which athlete uses each device and which team each athlete is on, saved as JSON.
+
+    Every assignment is also kept in a history with the time it was made,
+    so the athlete who used a device at any moment can be looked up
+    (timeline()). Files written before the history existed count their
+    assignments as made at time 0.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.devices = {}  # Device name -> athlete
+        self.teams = {}  # Athlete -> team
+        self.history = []  # [device, athlete or None, since] in the order assigned
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                content = json.load(file)
+            self.devices = content.get("devices", {})
+            self.teams = content.get("teams", {})
+            self.history = content.get("history") or [[device, user, 0] for device, user in self.devices.items()]
+
+    def user(self, device):
+        """Athlete using device; unassigned devices stand for themselves"""
+        return self.devices.get(device) or device or UNKNOWN_USER
+
+    def timeline(self, device):
+        """Athletes of device over time: (start times, athletes), the first starting at -inf"""
+        times = [-np.inf]
+        users = [device or UNKNOWN_USER]
+        with self._lock:
+            for name, user, since in self.history:
+                if name == device:
+                    times.append(since)
+                    users.append(user or device or UNKNOWN_USER)
+        return np.array(times, dtype=np.float64), users
+
+    def team(self, user):
+        return self.teams.get(user)
+
+    def assign(self, device, user, team=None):
+        """Record that user now jumps with device (and is on team, if given) and save"""
+        with self._lock:
+            self.history.append([device, user or None, time.time()])
+            if user:
+                self.devices[device] = user
+            else:
+                self.devices.pop(device, None)
+            if user and team is not None:
+                if team:
+                    self.teams[user] = team
+                else:
+                    self.teams.pop(user, None)
+        self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            content = {"devices": self.devices, "teams": self.teams, "history": self.history}
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(self.path + ".tmp", 'w', encoding='utf-8') as file:
+            json.dump(content, file, indent=2)
+        os.replace(self.path + ".tmp", self.path)
+
+
+class Rollup:
+    """Aggregate of a group of sessions; mergeable"""
+
+    FIELDS = ("sessions", "jumps", "duration", "frequency_sum", "heart_rate_sum",
+              "best_jumps", "best_frequency", "max_heart_rate")
+    __slots__ = FIELDS
+
+    def __init__(self, values=None):
+        for name, value in zip(self.FIELDS, values or (0,) * len(self.FIELDS)):
+            setattr(self, name, value)
+
+    def merge(self, other):
+        self.sessions += other.sessions
+        self.jumps += other.jumps
+        self.duration += other.duration
+        self.frequency_sum += other.frequency_sum
+        self.heart_rate_sum += other.heart_rate_sum
+        self.best_jumps = max(self.best_jumps, other.best_jumps)
+        self.best_frequency = max(self.best_frequency, other.best_frequency)
+        self.max_heart_rate = max(self.max_heart_rate, other.max_heart_rate)
+
+    def values(self):
+        return [getattr(self, name) for name in self.FIELDS]
+
+    @property
+    def avg_frequency(self):
+        return self.frequency_sum / self.sessions if self.sessions else 0.0
+
+    @property
+    def avg_heart_rate(self):
+        return self.heart_rate_sum / self.sessions if self.sessions else 0.0
+
+
+# Leaderboard and trend metrics: name -> (label, value of a Rollup)
+METRICS = {
+    "jumps": ("Total Jumps", lambda rollup: rollup.jumps),
+    "best_jumps": ("Most Jumps in a Session", lambda rollup: rollup.best_jumps),
+    "avg_frequency": ("Average Frequency (jumps/min)", lambda rollup: rollup.avg_frequency),
+    "best_frequency": ("Best Frequency (jumps/min)", lambda rollup: rollup.best_frequency),
+    "sessions": ("Sessions", lambda rollup: rollup.sessions),
+    "duration": ("Total Duration (s)", lambda rollup: rollup.duration),
+    "avg_heart_rate": ("Average Heart Rate (BPM)", lambda rollup: rollup.avg_heart_rate),
+    "max_heart_rate": ("Maximum Heart Rate (BPM)", lambda rollup: rollup.max_heart_rate),
+}
+
+
+def today():
+    """Local day number (days since 1970-01-01) of the current time"""
+    return int(local_days([time.time()])[0])
+
+
+def day_date(day):
+    """date of a local day number"""
+    return date(1970, 1, 1) + timedelta(days=int(day))
+
+
+class RollupStore:
+    """Incremental aggregates per (athlete, mode, day) and per (athlete, mode).
+
+    add_columns() folds in a block of records: they are grouped in one
+    sort and each group is folded into its day rollup and the running
+    total. IngestPipeline feeds its rollup store through sync() after
+    every archive flush, so the count of records covered is always what
+    the archive has persisted, never what was merely ingested. The
+    athlete of a record is whoever the roster had assigned to its device
+    at the record's timestamp, so reassigning a device later moves no
+    past sessions, neither live nor when sync() rolls them up again.
+
+    With a path the aggregates are saved as JSON along with the number of
+    archived records they cover; sync() rolls up any archive records past
+    that count, e.g. after a crash between archive and rollup saves.
+    Records the archive never persisted are not counted, so the write-ahead
+    log replaying them after a crash does not count them twice. An
+    unreadable file is ignored, so the next sync() rebuilds everything.
+    """
+
+    def __init__(self, path=None, roster=None):
+        self.path = path
+        self.roster = roster if roster is not None else Roster()
+        self.records = 0  # Records rolled up so far
+        self._days = {}  # (user, mode) -> {day: Rollup}
+        self._totals = {}  # (user, mode) -> Rollup
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    def __len__(self):
+        return self.records
+
+    def add_columns(self, columns, devices):
+        """Fold a block of records (columns with device ids from the devices registry) into the rollups"""
+        modes = np.asarray(columns["mode"], dtype=np.int64)
+        count = len(modes)
+        if not count:
+            return
+
+        # Athlete of every record: the assignment of its device in effect at its timestamp
+        names = devices.names()
+        device_ids = np.asarray(columns["device"], dtype=np.int64)
+        timestamps = np.asarray(columns["timestamp"], dtype=np.float64)
+        record_users = np.empty(count, dtype=np.int64)
+        user_ids = {}
+        for device_id in np.unique(device_ids).tolist():
+            selected = device_ids == device_id
+            times, device_users = self.roster.timeline(names[device_id])
+            mapping = np.array([user_ids.setdefault(user, len(user_ids)) for user in device_users], dtype=np.int64)
+            record_users[selected] = mapping[np.searchsorted(times, timestamps[selected], side='right') - 1]
+        users = list(user_ids)
+        days = local_days(timestamps)
+
+        # Sort into (user, mode, day) groups and reduce every column per group
+        order = np.lexsort((days, modes, record_users))
+        keys = np.stack((record_users[order], modes[order], days[order]))
+        starts = np.concatenate(([0], np.flatnonzero((np.diff(keys, axis=1) != 0).any(axis=0)) + 1))
+        jumps = np.asarray(columns["finalJumpCount"], dtype=np.int64)[order]
+        duration = np.asarray(columns["exerciseDuration"], dtype=np.int64)[order]
+        frequency = np.asarray(columns["finalFrequency"], dtype=np.float64)[order]
+        heart_rate = np.asarray(columns["avgHeartRate"], dtype=np.int64)[order]
+        max_heart_rate = np.asarray(columns["maxHeartRate"], dtype=np.int64)[order]
+        groups = zip(keys[:, starts].T.tolist(),
+                     np.diff(np.append(starts, count)).tolist(),
+                     np.add.reduceat(jumps, starts).tolist(),
+                     np.add.reduceat(duration, starts).tolist(),
+                     np.add.reduceat(frequency, starts).tolist(),
+                     np.add.reduceat(heart_rate, starts).tolist(),
+                     np.maximum.reduceat(jumps, starts).tolist(),
+                     np.maximum.reduceat(frequency, starts).tolist(),
+                     np.maximum.reduceat(max_heart_rate, starts).tolist())
+
+        with self._lock:
+            for (user, mode, day), *values in groups:
+                self._add((users[user], mode, day), Rollup(values))
+            self.records += count
+
+    def _add(self, key, rollup):
+        user, mode, day = key
+        days = self._days.setdefault((user, mode), {})
+        cell = days.get(day)
+        if cell is None:
+            days[day] = cell = Rollup()
+        cell.merge(rollup)
+        total = self._totals.get((user, mode))
+        if total is None:
+            self._totals[(user, mode)] = total = Rollup()
+        total.merge(rollup)
+
+    def sync(self, archive):
+        """Roll up archive records that are not covered yet; returns how many were added"""
+        total = len(archive)
+        if total <= self.records:
+            return 0
+        start = self.records
+        columns = {name: archive.column(name)[start:total]
+                   for name in ("mode", "exerciseDuration", "avgHeartRate", "maxHeartRate",
+                                "finalFrequency", "finalJumpCount", "timestamp", "device")}
+        self.add_columns(columns, archive.devices)
+        return total - start
+
+    def clear(self):
+        with self._lock:
+            self._days = {}
+            self._totals = {}
+            self.records = 0
+
+    def users(self):
+        """Athletes with at least one session"""
+        with self._lock:
+            return sorted({user for user, _ in self._totals})
+
+    def totals(self, user, mode=None, since=None, until=None):
+        """Rollup of user's sessions in mode (all modes if None), optionally between two day numbers"""
+        result = Rollup()
+        modes = range(MODE_COUNT) if mode is None else (mode,)
+        with self._lock:
+            for each in modes:
+                if since is None and until is None:
+                    total = self._totals.get((user, each))
+                    if total is not None:
+                        result.merge(total)
+                else:
+                    for cell in self._range(self._days.get((user, each), {}), since, until):
+                        result.merge(cell)
+        return result
+
+    @staticmethod
+    def _range(days, since, until):
+        """Rollups of the days in [since, until]; looks up each day when that is cheaper than a scan"""
+        if since is not None and until is not None and until - since + 1 < len(days):
+            return [days[day] for day in range(since, until + 1) if day in days]
+        return [cell for day, cell in days.items()
+                if (since is None or day >= since) and (until is None or day <= until)]
+
+    def trend(self, user, metric="jumps", mode=None, days=30, until=None):
+        """Metric per day for user's last days days: (day numbers, values); days without sessions are None"""
+        until = today() if until is None else until
+        value = METRICS[metric][1]
+        modes = range(MODE_COUNT) if mode is None else (mode,)
+        numbers = list(range(until - days + 1, until + 1))
+        values = []
+        with self._lock:
+            per_mode = [self._days.get((user, each), {}) for each in modes]
+            for day in numbers:
+                cell = Rollup()
+                for cells in per_mode:
+                    found = cells.get(day)
+                    if found is not None:
+                        cell.merge(found)
+                values.append(value(cell) if cell.sessions else None)
+        return numbers, values
+
+    def leaderboard(self, metric="jumps", mode=None, since=None, until=None, teams=False,
+                    limit=10, min_sessions=1):
+        """Best athletes (or teams) by metric, highest first: list of (name, value, sessions)"""
+        value = METRICS[metric][1]
+        groups = {}
+        for user in self.users():
+            name = self.roster.team(user) if teams else user
+            if name is None:
+                continue
+            rollup = groups.get(name)
+            if rollup is None:
+                groups[name] = rollup = Rollup()
+            rollup.merge(self.totals(user, mode, since, until))
+        ranked = [(name, value(rollup), rollup.sessions) for name, rollup in groups.items()
+                  if rollup.sessions >= min_sessions]
+        ranked.sort(key=lambda entry: (-entry[1], entry[0]))
+        return ranked[:limit] if limit else ranked
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                content = json.load(file)
+            users = content["users"]
+            for user, mode, day, *values in content["cells"]:
+                self._add((users[user], mode, day), Rollup(values))
+            self.records = content["records"]
+        except Exception:
+            self._days = {}
+            self._totals = {}
+            self.records = 0
+
+    def save(self):
+        """Write the rollups to path; written to a temporary file and renamed, like the archive index"""
+        if not self.path:
+            return
+        with self._lock:
+            users = sorted({user for user, _ in self._days})
+            user_ids = {user: index for index, user in enumerate(users)}
+            cells = [[user_ids[user], mode, day] + cell.values()
+                     for (user, mode), days in self._days.items() for day, cell in days.items()]
+            content = {"records": self.records, "users": users, "cells": cells}
+        with open(self.path + ".tmp", 'w', encoding='utf-8') as file:
+            json.dump(content, file)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def parse_args(argv=None):
+    import argparse
+
+    from ingest import ARCHIVE_DIR, ROLLUP_FILE, ROSTER_FILE
+
+    parser = argparse.ArgumentParser(description="Leaderboards and trends from the per-athlete rollups")
+    parser.add_argument("--archive", default=ARCHIVE_DIR)
+    parser.add_argument("--rollups", default=ROLLUP_FILE)
+    parser.add_argument("--roster", default=ROSTER_FILE)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    board = commands.add_parser("leaderboard", help="Rank athletes or teams")
+    board.add_argument("--metric", choices=sorted(METRICS), default="jumps")
+    board.add_argument("--mode", type=int)
+    board.add_argument("--days", type=int, help="Only the last DAYS days")
+    board.add_argument("--teams", action="store_true", help="Rank teams instead of athletes")
+    board.add_argument("--limit", type=int, default=10)
+    board.add_argument("--min-sessions", type=int, default=1)
+
+    trend = commands.add_parser("trend", help="One athlete's metric per day")
+    trend.add_argument("user")
+    trend.add_argument("--metric", choices=sorted(METRICS), default="jumps")
+    trend.add_argument("--mode", type=int)
+    trend.add_argument("--days", type=int, default=14)
+
+    assign = commands.add_parser("assign", help="Assign a device to an athlete")
+    assign.add_argument("device")
+    assign.add_argument("user")
+    assign.add_argument("--team")
+
+    commands.add_parser("rebuild", help="Recompute the rollups from the whole archive")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from session_archive import SessionArchive
+
+    args = parse_args(argv)
+    roster = Roster(args.roster)
+    if args.command == "assign":
+        roster.assign(args.device, args.user, args.team)
+        print(f"{args.device} -> {args.user}" + (f" ({args.team})" if args.team else ""))
+        return
+
+    rollups = RollupStore(args.rollups, roster)
+    if os.path.exists(args.archive):
+        archive = SessionArchive(args.archive)
+        try:
+            if args.command == "rebuild":
+                rollups.clear()
+            start = time.perf_counter()
+            added = rollups.sync(archive)
+            if added:
+                print(f"Rolled up {added} archived records in {(time.perf_counter() - start) * 1000:.1f} ms")
+                rollups.save()
+        finally:
+            archive.close()
+
+    if args.command == "leaderboard":
+        since = today() - args.days + 1 if args.days else None
+        label = METRICS[args.metric][0]
+        print(f"{'Rank':<6}{'Team' if args.teams else 'Athlete':<20}{label:>32}{'Sessions':>10}")
+        for rank, (name, value, sessions) in enumerate(
+                rollups.leaderboard(args.metric, args.mode, since, None, args.teams,
+                                    args.limit, args.min_sessions), start=1):
+            print(f"{rank:<6}{name:<20}{value:>32.1f}{sessions:>10}")
+    elif args.command == "trend":
+        for day, value in zip(*rollups.trend(args.user, args.metric, args.mode, args.days)):
+            print(f"{day_date(day).isoformat()}  {'-' if value is None else f'{value:.1f}'}")
+
+
+if __name__ == "__main__":
+    main()
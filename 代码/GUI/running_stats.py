@@ -0,0 +1,223 @@
+import threading
+
+import numpy as np
+
+from record_parser import FIELDS
+
+METRICS = FIELDS[1:]  # Everything except mode
+
+# Histogram range (low, high, bin width) used for the percentile sketch of each metric
+SKETCH_RANGES = {
+    "exerciseDuration": (0, 7200, 5),
+    "avgHeartRate": (0, 250, 1),
+    "maxHeartRate": (0, 250, 1),
+    "finalFrequency": (0, 400, 1),
+    "finalJumpCount": (0, 10000, 5),
+    "intensity": (1, 11, 1),
+}
+
+PERCENTILES = (50, 90, 99)
+
+
+class RunningStats:
+    """Welford mean/variance plus min and max, updated in O(1) per value"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        """Add one value"""
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def add_many(self, values):
+        """Add a block of values by merging its moments (Chan et al.)"""
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if not n:
+            return
+        block_mean = float(values.mean())
+        block_m2 = float(((values - block_mean) ** 2).sum())
+        total = self.count + n
+        delta = block_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += block_m2 + delta * delta * self.count * n / total
+        self.count = total
+        low, high = float(values.min()), float(values.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def merge(self, other):
+        """Fold another RunningStats into this one"""
+        if not other.count:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return self.variance ** 0.5
+
+
+class HistogramSketch:
+    """Fixed-bin histogram giving approximate percentiles in O(1) per value.
+
+    Values outside [low, high) are counted in the first or last bin;
+    percentiles are accurate to one bin width inside the range.
+    """
+
+    def __init__(self, low, high, width):
+        self.low = low
+        self.width = width
+        self.bins = max(int(np.ceil((high - low) / width)), 1)
+        self.counts = np.zeros(self.bins, dtype=np.int64)
+        self.count = 0
+
+    def _bin(self, value):
+        return min(max(int((value - self.low) // self.width), 0), self.bins - 1)
+
+    def add(self, value):
+        """Count one value"""
+        self.counts[self._bin(value)] += 1
+        self.count += 1
+
+    def add_many(self, values):
+        """Count a block of values"""
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        index = np.clip(((values - self.low) // self.width).astype(np.int64), 0, self.bins - 1)
+        self.counts += np.bincount(index, minlength=self.bins)
+        self.count += len(values)
+
+    def merge(self, other):
+        """Add the counts of a sketch with the same bins"""
+        self.counts += other.counts
+        self.count += other.count
+
+    def percentile(self, q):
+        """Approximate q-th percentile (0-100), interpolated within its bin"""
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        cumulative = np.cumsum(self.counts)
+        index = min(int(np.searchsorted(cumulative, rank, side='left')), self.bins - 1)
+        before = cumulative[index - 1] if index else 0
+        in_bin = self.counts[index]
+        fraction = (rank - before) / in_bin if in_bin else 0.0
+        return float(self.low + (index + fraction) * self.width)
+
+
+class MetricStats:
+    """Running moments and a percentile sketch for one (mode, metric) pair"""
+
+    def __init__(self, metric):
+        self.moments = RunningStats()
+        self.sketch = HistogramSketch(*SKETCH_RANGES[metric])
+
+    def add(self, value):
+        self.moments.add(value)
+        self.sketch.add(value)
+
+    def add_many(self, values):
+        self.moments.add_many(values)
+        self.sketch.add_many(values)
+
+    def merge(self, other):
+        """Fold another MetricStats for the same metric into this one"""
+        self.moments.merge(other.moments)
+        self.sketch.merge(other.sketch)
+
+    def summary(self):
+        """Count, mean, std, min, max and percentiles as a dict"""
+        moments = self.moments
+        result = {
+            "count": moments.count,
+            "mean": moments.mean,
+            "std": moments.std,
+            "min": moments.min,
+            "max": moments.max,
+        }
+        for q in PERCENTILES:
+            value = self.sketch.percentile(q)
+            if value is not None:
+                # The sketch cannot be more extreme than what was actually seen
+                value = min(max(value, moments.min), moments.max)
+            result[f"p{q}"] = value
+        return result
+
+
+class StatsEngine:
+    """Incremental statistics keyed by (mode, metric).
+
+    Fed one record dict or one parsed column block at a time; queries cost
+    the same no matter how much history has been seen. Has no GUI
+    dependencies and can be used headless.
+    """
+
+    def __init__(self, metrics=METRICS):
+        self.metrics = tuple(metrics)
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get(self, mode, metric):
+        key = (mode, metric)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = MetricStats(metric)
+        return stats
+
+    def add_record(self, record):
+        """Update with one record dict"""
+        with self._lock:
+            for metric in self.metrics:
+                self._get(record["mode"], metric).add(record[metric])
+
+    def add_columns(self, columns):
+        """Update with a block of records given as columns"""
+        modes = np.asarray(columns["mode"])
+        if not len(modes):
+            return
+        with self._lock:
+            for mode in np.unique(modes).tolist():
+                selected = modes == mode
+                for metric in self.metrics:
+                    self._get(mode, metric).add_many(np.asarray(columns[metric])[selected])
+
+    def summary(self, mode, metric):
+        """Statistics for one mode and metric, or None when nothing was seen"""
+        with self._lock:
+            stats = self._stats.get((mode, metric))
+            return stats.summary() if stats else None
+
+    def combined_summary(self, mode, metric, *others):
+        """Statistics for one mode and metric over this engine and other engines"""
+        combined = MetricStats(metric)
+        for engine in (self,) + others:
+            with engine._lock:
+                stats = engine._stats.get((mode, metric))
+                if stats:
+                    combined.merge(stats)
+        return combined.summary() if combined.moments.count else None
+
+    def keys(self):
+        with self._lock:
+            return sorted(self._stats)
@@ -0,0 +1,70 @@
+import time
+
+from perf import PERF
+
+
+class LineFramer:
+    """Split a raw byte stream into complete text lines.
+
+    Bytes are accumulated in a reusable bytearray; every call to feed()
+    returns the complete lines seen so far and keeps any trailing partial
+    line for the next chunk.
+    """
+
+    def __init__(self, encoding='utf-8', max_line_length=4096):
+        self.encoding = encoding
+        self.max_line_length = max_line_length
+        self._buffer = bytearray()
+        self.dropped_bytes = 0  # Bytes discarded from over-long lines
+
+    def feed(self, data):
+        """Add a chunk of bytes and return the complete lines it finishes"""
+        buffer = self._buffer
+        buffer += data
+        end = buffer.rfind(b'\n')
+        if end < 0:
+            # No complete line yet; guard against a device that never sends '\n'
+            if len(buffer) > self.max_line_length:
+                self.dropped_bytes += len(buffer)
+                del buffer[:]
+            return []
+
+        # Decode every complete line in one go, then drop them from the buffer
+        text = buffer[:end].decode(self.encoding, errors='replace')
+        del buffer[:end + 1]
+        return [line for line in (part.strip() for part in text.split('\n')) if line]
+
+    def pending(self):
+        """Number of buffered bytes belonging to an unfinished line"""
+        return len(self._buffer)
+
+    def reset(self):
+        """Discard any partial line"""
+        del self._buffer[:]
+
+
+def read_chunks(serial_port, stop_event, on_lines, framer=None, chunk_size=4096):
+    """Read whatever bytes are available from serial_port and pass complete lines to on_lines.
+
+    The port should be opened with a short read timeout: when nothing is
+    waiting we block in a one-byte read instead of spinning, so the loop
+    uses no CPU while idle and still notices stop_event within one timeout.
+    """
+    if framer is None:
+        framer = LineFramer()
+    read_probe = PERF.probe("serial.read")
+    while not stop_event.is_set():
+        waiting = serial_port.in_waiting
+        if waiting and PERF.enabled:
+            # Only reads of waiting data are timed; idle one-byte reads just measure the timeout
+            PERF.observe("serial.in_waiting", waiting)
+            start = time.perf_counter()
+            data = serial_port.read(min(waiting, chunk_size))
+            read_probe.record(time.perf_counter() - start, len(data))
+        else:
+            data = serial_port.read(min(waiting, chunk_size) if waiting else 1)
+        if not data:
+            continue
+        lines = framer.feed(data)
+        if lines:
+            on_lines(lines)
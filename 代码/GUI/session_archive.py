@@ -0,0 +1,324 @@
+import csv
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from ingest import CSV_HEADER
+from perf import PERF
+from record_parser import COLUMNS, DTYPES, DeviceRegistry, MODE_COUNT, empty_columns, load_csv_file
+
+INDEX_FILE = "index.json"
+DEVICES_FILE = "devices.json"
+
+
+class SessionArchive:
+    """Append-only binary archive of records with a block index by day and mode.
+
+    Each field is stored as a raw little-endian column file
+    (<field>.bin) of fixed-width values. Records are grouped into blocks
+    that never span two days; index.json lists every block with its
+    position, time range and per-mode counts, so a query only maps and
+    reads the blocks that can match. Columns are read through np.memmap,
+    so whole-column reads and single-block queries are zero-copy views.
+    """
+
+    def __init__(self, path, block_records=4096):
+        self.path = path
+        self.block_records = block_records
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+        self._lock = threading.Lock()
+        self._files = {}
+        self._maps = {}
+        self._closed = False
+        self.devices = DeviceRegistry()
+        self.blocks = []  # Dicts: start, end, day, t_min, t_max, modes
+        self._load()
+        self._files = {name: open(self._column_path(name), 'ab') for name in COLUMNS}
+
+    def _column_path(self, name):
+        return os.path.join(self.path, f"{name}.bin")
+
+    def _load(self):
+        """Read the index and device names, recovering any records written after the last index save"""
+        index_path = os.path.join(self.path, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='utf-8') as file:
+                self.blocks = json.load(file)["blocks"]
+        devices_path = os.path.join(self.path, DEVICES_FILE)
+        if os.path.exists(devices_path):
+            with open(devices_path, 'r', encoding='utf-8') as file:
+                for name in json.load(file):
+                    self.devices.id(name)
+
+        # Column files can be longer than the index after a crash, and torn
+        # writes can leave them with different lengths; keep whole records only
+        lengths = []
+        for name in COLUMNS:
+            column_path = self._column_path(name)
+            size = os.path.getsize(column_path) if os.path.exists(column_path) else 0
+            lengths.append(size // np.dtype(DTYPES[name]).itemsize)
+        total = min(lengths)
+        for name in COLUMNS:
+            column_path = self._column_path(name)
+            if os.path.exists(column_path):
+                with open(column_path, 'r+b') as file:
+                    file.truncate(total * np.dtype(DTYPES[name]).itemsize)
+
+        indexed = self.blocks[-1]["end"] if self.blocks else 0
+        if indexed > total:
+            # Index points past the data; drop the blocks that lost their records
+            self.blocks = [block for block in self.blocks if block["end"] <= total]
+            indexed = self.blocks[-1]["end"] if self.blocks else 0
+        if total > indexed:
+            columns = {name: self._map(name, total)[indexed:total] for name in ("mode", "timestamp")}
+            self._index(columns, indexed)
+            self._save_index()
+
+    def __len__(self):
+        return self.blocks[-1]["end"] if self.blocks else 0
+
+    @PERF.timed("archive.append", items=lambda self, columns, devices=None: len(columns["mode"]))
+    def append_columns(self, columns, devices=None):
+        """Append a block of records given as columns.
+
+        devices is the registry behind the device ids in columns; ids are
+        translated to this archive's own registry so they stay stable.
+        """
+        count = len(columns["mode"])
+        if not count:
+            return
+        with self._lock:
+            start = len(self)
+            for name in COLUMNS:
+                values = np.asarray(columns[name])
+                if name == "device" and devices is not None:
+                    mapping = np.array([self.devices.id(device_name) for device_name in devices.names()],
+                                       dtype=DTYPES["device"])
+                    values = mapping[values]
+                self._files[name].write(values.astype(_disk_dtype(name)).tobytes())
+            self._index({"mode": np.asarray(columns["mode"]), "timestamp": np.asarray(columns["timestamp"])}, start)
+
+    def _index(self, columns, start):
+        """Extend the block index with records at positions start onwards"""
+        timestamps = np.asarray(columns["timestamp"], dtype=np.float64)
+        modes = np.asarray(columns["mode"])
+        days = local_days(timestamps)
+
+        # Split wherever the day changes, then into blocks of at most block_records
+        cuts = np.flatnonzero(np.diff(days)) + 1
+        for part_start, part_end in zip(np.concatenate(([0], cuts)), np.concatenate((cuts, [len(days)]))):
+            position = int(part_start)
+            while position < part_end:
+                block = self.blocks[-1] if self.blocks else None
+                day = time.strftime('%Y-%m-%d', time.localtime(float(timestamps[position])))
+                if block is None or block["day"] != day or block["end"] - block["start"] >= self.block_records:
+                    block = {"start": start + position, "end": start + position, "day": day,
+                             "t_min": None, "t_max": None, "modes": [0] * MODE_COUNT}
+                    self.blocks.append(block)
+                room = self.block_records - (block["end"] - block["start"])
+                stop = min(int(part_end), position + room)
+                chunk_ts = timestamps[position:stop]
+                chunk_modes = modes[position:stop]
+                low, high = float(chunk_ts.min()), float(chunk_ts.max())
+                block["t_min"] = low if block["t_min"] is None else min(block["t_min"], low)
+                block["t_max"] = high if block["t_max"] is None else max(block["t_max"], high)
+                counts = np.bincount(chunk_modes.astype(np.int64), minlength=MODE_COUNT)
+                block["modes"] = [a + int(b) for a, b in zip(block["modes"], counts[:MODE_COUNT])]
+                block["end"] = start + stop
+                position = stop
+
+    def flush(self):
+        """Write buffered column data and save the index"""
+        with self._lock:
+            for file in self._files.values():
+                file.flush()
+            self._save_index()
+
+    def _save_index(self):
+        # Written to a temporary file and renamed so a crash never leaves a torn index
+        for filename, content in ((INDEX_FILE, {"blocks": self.blocks}), (DEVICES_FILE, self.devices.names())):
+            target = os.path.join(self.path, filename)
+            with open(target + ".tmp", 'w', encoding='utf-8') as file:
+                json.dump(content, file)
+            os.replace(target + ".tmp", target)
+
+    def close(self):
+        """Flush and close the column files; closing again does nothing"""
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        with self._lock:
+            for file in self._files.values():
+                file.close()
+            self._maps = {}
+
+    def _map(self, name, length=None):
+        """Read-only memory map of one column file"""
+        if length is None:
+            length = len(self)
+        if not length:
+            return np.empty(0, dtype=DTYPES[name])
+        cached = self._maps.get(name)
+        if cached is not None and len(cached) >= length:
+            return cached[:length]
+        mapped = np.memmap(self._column_path(name), dtype=_disk_dtype(name), mode='r', shape=(length,))
+        self._maps[name] = mapped
+        return mapped
+
+    def column(self, name):
+        """Zero-copy view of one field over the whole archive"""
+        with self._lock:
+            for file in self._files.values():
+                file.flush()
+            return self._map(name)
+
+    def select_blocks(self, start=None, end=None, modes=None):
+        """Blocks that may hold records in [start, end] with one of modes"""
+        selected = []
+        for block in self.blocks:
+            if start is not None and block["t_max"] < start:
+                continue
+            if end is not None and block["t_min"] > end:
+                continue
+            if modes is not None and not any(block["modes"][mode] for mode in modes):
+                continue
+            selected.append(block)
+        return selected
+
+    def query(self, start=None, end=None, modes=None, devices=None, names=COLUMNS):
+        """Records with start <= timestamp <= end, in modes and from devices (ids), as columns.
+
+        Only the selected blocks are read. When every record of a single
+        contiguous range matches, the columns are views into the memory map.
+        """
+        with self._lock:
+            for file in self._files.values():
+                file.flush()
+            blocks = self.select_blocks(start, end, modes)
+            if not blocks:
+                return {name: empty_columns()[name] for name in names}
+
+            # Merge adjacent blocks into contiguous ranges
+            ranges = []
+            for block in blocks:
+                if ranges and ranges[-1][1] == block["start"]:
+                    ranges[-1][1] = block["end"]
+                else:
+                    ranges.append([block["start"], block["end"]])
+            maps = {name: self._map(name) for name in set(names) | {"mode", "timestamp", "device"}}
+
+        def pieces(name):
+            return [maps[name][a:b] for a, b in ranges]
+
+        masks = []
+        for (a, b) in ranges:
+            mask = np.ones(b - a, dtype=bool)
+            timestamps = maps["timestamp"][a:b]
+            if start is not None:
+                mask &= timestamps >= start
+            if end is not None:
+                mask &= timestamps <= end
+            if modes is not None:
+                mask &= np.isin(maps["mode"][a:b], list(modes))
+            if devices is not None:
+                mask &= np.isin(maps["device"][a:b], list(devices))
+            masks.append(mask)
+
+        if len(ranges) == 1 and masks[0].all():
+            return {name: maps[name][ranges[0][0]:ranges[0][1]] for name in names}
+        return {name: np.concatenate([piece[mask] for piece, mask in zip(pieces(name), masks)])
+                for name in names}
+
+    def days(self):
+        """Record count per day"""
+        counts = {}
+        for block in self.blocks:
+            counts[block["day"]] = counts.get(block["day"], 0) + block["end"] - block["start"]
+        return counts
+
+    def import_csv(self, paths):
+        """Append the records of session CSV files; returns the number imported"""
+        imported = 0
+        for path in paths:
+            batch = load_csv_file(path, self.devices)
+            order = np.argsort(batch["timestamp"], kind='stable')
+            self.append_columns({name: batch[name][order] for name in COLUMNS})
+            imported += len(batch)
+        self.flush()
+        return imported
+
+    def export_csv(self, path, start=None, end=None, modes=None, devices=None):
+        """Write matching records as a session CSV with full dates; returns the number written"""
+        columns = self.query(start, end, modes, devices)
+        with open(path, 'w', newline='', encoding='utf-8-sig') as file:
+            writer = csv.writer(file)
+            writer.writerow(CSV_HEADER)
+            values = [columns[name].tolist() for name in COLUMNS]
+            for mode, duration, avg_hr, max_hr, freq, count, ts, device in zip(*values):
+                writer.writerow([mode, duration, avg_hr, max_hr, freq, count,
+                                 datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S'),
+                                 self.devices.name(device)])
+        return len(columns["mode"])
+
+
+def _disk_dtype(name):
+    """Column files are always little-endian"""
+    return np.dtype(DTYPES[name]).newbyteorder('<')
+
+
+def _utc_offset(timestamps):
+    """Local UTC offset in seconds for each timestamp (for splitting by local day)"""
+    if not len(timestamps):
+        return np.zeros(0)
+    # Offsets only change at DST transitions, so look them up per distinct hour
+    hours, inverse = np.unique(np.asarray(timestamps) // 3600, return_inverse=True)
+    offsets = np.array([datetime.fromtimestamp(hour * 3600).astimezone().utcoffset().total_seconds()
+                        for hour in hours.tolist()])
+    return offsets[inverse.ravel()]
+
+
+def local_days(timestamps):
+    """Local calendar day of each timestamp, as whole days since 1970-01-01"""
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    return ((timestamps + _utc_offset(timestamps)) // 86400).astype(np.int64)
+
+
+def main(argv=None):
+    """Command line bridge between session CSV files and the archive"""
+    import argparse
+
+    from ingest import ARCHIVE_DIR
+
+    parser = argparse.ArgumentParser(description="Import session CSVs into, or export them from, the binary archive")
+    parser.add_argument("--archive", default=ARCHIVE_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="Append session CSV files to the archive")
+    import_parser.add_argument("files", nargs="+")
+    export_parser = commands.add_parser("export", help="Write archived records to a CSV file")
+    export_parser.add_argument("output")
+    export_parser.add_argument("--since", help="First day to export (YYYY-MM-DD)")
+    export_parser.add_argument("--until", help="Last day to export (YYYY-MM-DD)")
+    export_parser.add_argument("--mode", type=int, action="append", help="Mode to export; repeat for several")
+    args = parser.parse_args(argv)
+
+    archive = SessionArchive(args.archive)
+    try:
+        if args.command == "import":
+            print(f"Imported {archive.import_csv(args.files)} records")
+        else:
+            start = datetime.strptime(args.since, "%Y-%m-%d").timestamp() if args.since else None
+            end = datetime.strptime(args.until, "%Y-%m-%d").timestamp() + 86399 if args.until else None
+            print(f"Exported {archive.export_csv(args.output, start, end, args.mode)} records")
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import csv
+import threading
+import time
+
+from perf import PERF
+
+
+class SessionWriter:
+    """Buffered CSV writer that keeps the session file open and flushes in batches.
+
+    Rows are queued in memory by write_row() and written by a background
+    thread once flush_rows rows are pending or flush_interval seconds have
+    passed, whichever comes first. With flush_rows and flush_interval both
+    None there is no background thread and rows are only written by
+    flush(). Rows whose write fails stay queued for the next flush; errors
+    on the background thread are passed to on_error(exception).
+    """
+
+    def __init__(self, path, header=None, flush_rows=256, flush_interval=0.5, on_error=None):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.on_error = on_error
+
+        self._file = open(path, 'w', newline='', encoding='utf-8-sig')
+        self._writer = csv.writer(self._file)
+        if header:
+            self._writer.writerow(header)
+            self._file.flush()
+
+        self._pending = []
+        self._lock = threading.Lock()  # Guards _pending and the counters
+        self._io_lock = threading.Lock()  # Serializes flushes so batches stay in order
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        # Throughput / latency counters
+        self.rows_received = 0
+        self.rows_written = 0
+        self.flush_count = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self.total_flush_time = 0.0
+        self.last_error = None
+        self._started = time.perf_counter()
+
+        self._thread = None
+        if flush_rows is not None or flush_interval is not None:
+            self._thread = threading.Thread(target=self._run, name="SessionWriter")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def write_row(self, row):
+        """Queue one row for writing"""
+        with self._lock:
+            if self._closed:
+                raise ValueError("SessionWriter is closed")
+            self._pending.append(row)
+            self.rows_received += 1
+            full = self.flush_rows is not None and len(self._pending) >= self.flush_rows
+        if full:
+            self._wakeup.set()
+
+    def write_rows(self, rows):
+        """Queue several rows for writing"""
+        with self._lock:
+            if self._closed:
+                raise ValueError("SessionWriter is closed")
+            self._pending.extend(rows)
+            self.rows_received += len(rows)
+            full = self.flush_rows is not None and len(self._pending) >= self.flush_rows
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write all pending rows to disk now"""
+        with self._io_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = []
+            if not batch:
+                return 0
+
+            start = time.perf_counter()
+            try:
+                self._writer.writerows(batch)
+                self._file.flush()
+            except Exception:
+                # Keep the rows, ahead of any queued meanwhile, for the next attempt
+                with self._lock:
+                    self._pending[:0] = batch
+                raise
+            latency = time.perf_counter() - start
+
+        if PERF.enabled:
+            PERF.probe("writer.flush").record(latency, len(batch))
+        with self._lock:
+            self.rows_written += len(batch)
+            self.flush_count += 1
+            self.last_flush_latency = latency
+            self.max_flush_latency = max(self.max_flush_latency, latency)
+            self.total_flush_time += latency
+        return len(batch)
+
+    def close(self):
+        """Stop the flush thread, write remaining rows and close the file"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wakeup.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self.flush()
+        with self._io_lock:
+            self._file.close()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def stats(self):
+        """Return throughput and flush latency counters"""
+        with self._lock:
+            elapsed = time.perf_counter() - self._started
+            return {
+                "rows_received": self.rows_received,
+                "rows_written": self.rows_written,
+                "pending": len(self._pending),
+                "flush_count": self.flush_count,
+                "rows_per_sec": self.rows_written / elapsed if elapsed > 0 else 0.0,
+                "last_flush_ms": self.last_flush_latency * 1000,
+                "max_flush_ms": self.max_flush_latency * 1000,
+                "avg_flush_ms": (self.total_flush_time / self.flush_count * 1000) if self.flush_count else 0.0,
+            }
+
+    def _run(self):
+        """Background thread: flush on size or time threshold"""
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.last_error = e
+                if self.on_error is not None:
+                    self.on_error(e)
@@ -0,0 +1,167 @@
+"""Binary telemetry frames streamed by the rope during a session.
+
+With streaming switched on (the host sends STREAM_ON), the firmware
+interleaves binary frames with its usual ASCII lines:
+
+    0xA5 0x5A | type | seq | length | payload (length bytes) | crc16
+
+seq counts frames modulo 256 so lost frames can be detected. crc16 is
+CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) over type, seq, length and
+payload, sent little-endian. All payload fields are little-endian; times
+are milliseconds since the session started. The sync bytes are never
+valid ASCII, so text and frames can share one serial stream.
+"""
+import binascii
+import struct
+from collections import namedtuple
+
+from serial_reader import LineFramer
+
+SYNC = b'\xa5\x5a'
+HEADER = struct.Struct('<2sBBB')  # sync, type, seq, length
+CRC = struct.Struct('<H')
+MAX_PAYLOAD = 255
+
+# Host -> device commands
+STREAM_ON = b'T'
+STREAM_OFF = b't'
+
+FRAME_SESSION_START = 1
+FRAME_JUMP = 2
+FRAME_HEART_RATE = 3
+FRAME_SESSION_END = 4
+
+SessionStart = namedtuple("SessionStart", "t_ms mode min_freq max_freq")
+Jump = namedtuple("Jump", "t_ms count valid")
+HeartRate = namedtuple("HeartRate", "t_ms bpm avg")
+SessionEnd = namedtuple("SessionEnd", "t_ms count")
+
+# Frame type -> (payload layout, event class)
+PAYLOADS = {
+    FRAME_SESSION_START: (struct.Struct('<IbHH'), SessionStart),
+    FRAME_JUMP: (struct.Struct('<IHB'), Jump),
+    FRAME_HEART_RATE: (struct.Struct('<IBB'), HeartRate),
+    FRAME_SESSION_END: (struct.Struct('<IH'), SessionEnd),
+}
+EVENT_TYPES = {cls: frame_type for frame_type, (_, cls) in PAYLOADS.items()}
+
+
+def crc16(data, crc=0xFFFF):
+    """CRC-16/CCITT-FALSE, computed in C by binascii"""
+    return binascii.crc_hqx(data, crc)
+
+
+def encode_frame(frame_type, seq, payload):
+    """One complete frame around payload bytes"""
+    header = HEADER.pack(SYNC, frame_type, seq & 0xFF, len(payload))
+    return header + payload + CRC.pack(crc16(header[2:] + payload))
+
+
+def encode_event(event, seq):
+    """Frame for an event tuple (SessionStart, Jump, HeartRate or SessionEnd)"""
+    frame_type = EVENT_TYPES[type(event)]
+    layout = PAYLOADS[frame_type][0]
+    return encode_frame(frame_type, seq, layout.pack(*event))
+
+
+class FrameDecoder:
+    """Split a serial stream into ASCII lines and decoded telemetry events.
+
+    A drop-in replacement for LineFramer: feed() returns the complete text
+    lines, while events are passed to on_events(list) as they are decoded.
+    Frames are located with bytearray.find, checked with the C CRC over a
+    memoryview and unpacked in place with struct.unpack_from, so no Python
+    code runs per byte; chunks without a sync byte go straight to the line
+    framer.
+    """
+
+    def __init__(self, on_events=None, encoding='utf-8', max_line_length=4096):
+        self.on_events = on_events
+        self.lines = LineFramer(encoding, max_line_length)
+        self._buffer = bytearray()
+        self.frames = 0
+        self.crc_errors = 0
+        self.lost_frames = 0  # From gaps in the sequence numbers
+        self.unknown_frames = 0
+        self._last_seq = None
+
+    @property
+    def dropped_bytes(self):
+        return self.lines.dropped_bytes
+
+    def feed(self, data):
+        """Add a chunk of bytes; returns complete text lines and dispatches events"""
+        if not self._buffer and SYNC[0] not in data:
+            return self.lines.feed(data)
+
+        buffer = self._buffer
+        buffer += data
+        text = []
+        events = []
+        position = 0
+        with memoryview(buffer) as view:
+            while True:
+                start = buffer.find(SYNC, position)
+                if start < 0:
+                    # Keep a trailing first sync byte that no frame has used; it may start
+                    # a frame in the next chunk
+                    end = len(buffer)
+                    if end > position and buffer[end - 1] == SYNC[0]:
+                        end -= 1
+                    text.append(view[position:end])
+                    position = end
+                    break
+                if start > position:
+                    text.append(view[position:start])
+                if len(buffer) - start < HEADER.size:
+                    position = start
+                    break
+                _, frame_type, seq, length = HEADER.unpack_from(buffer, start)
+                end = start + HEADER.size + length + CRC.size
+                if end > len(buffer):
+                    position = start
+                    break
+                (expected,) = CRC.unpack_from(buffer, end - CRC.size)
+                if crc16(view[start + 2:end - CRC.size]) != expected:
+                    # Corrupted frame: skip it rather than pass its bytes on as text. If a
+                    # sync pattern turns up inside it the length was probably damaged, so
+                    # resync there instead of trusting it
+                    self.crc_errors += 1
+                    resync = buffer.find(SYNC, start + len(SYNC), end)
+                    position = resync if resync >= 0 else end
+                    continue
+
+                self._count(seq)
+                layout = PAYLOADS.get(frame_type)
+                if layout is not None and length >= layout[0].size:
+                    events.append(layout[1]._make(layout[0].unpack_from(buffer, start + HEADER.size)))
+                else:
+                    self.unknown_frames += 1
+                position = end
+
+            lines = []
+            for piece in text:
+                if len(piece):
+                    lines.extend(self.lines.feed(piece))
+                piece.release()
+        del buffer[:position]
+
+        if events and self.on_events is not None:
+            self.on_events(events)
+        return lines
+
+    def _count(self, seq):
+        self.frames += 1
+        if self._last_seq is not None:
+            self.lost_frames += (seq - self._last_seq - 1) & 0xFF
+        self._last_seq = seq
+
+    def pending(self):
+        """Buffered bytes of unfinished frames and lines"""
+        return len(self._buffer) + self.lines.pending()
+
+    def reset(self):
+        """Discard partial frames and lines"""
+        del self._buffer[:]
+        self.lines.reset()
+        self._last_seq = None
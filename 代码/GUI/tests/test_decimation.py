@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from decimation import lttb, minmax_decimate, visible_slice
+
+
+def signal(n, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.arange(n, dtype=np.float64)
+    y = np.sin(x / 50) + rng.normal(0, 0.1, n)
+    return x, y
+
+
+@pytest.mark.parametrize("n, buckets", [(1000, 100), (1003, 100), (999, 7), (201, 100)])
+def test_minmax_keeps_extrema_and_endpoints(n, buckets):
+    x, y = signal(n)
+    y[n // 3] = 10.0
+    y[n // 2] = -10.0
+    dx, dy = minmax_decimate(x, y, buckets)
+    assert len(dx) <= 2 * buckets + 4
+    assert dx[0] == x[0] and dx[-1] == x[-1]
+    assert np.all(np.diff(dx) > 0)
+    assert dy.max() == 10.0 and dy.min() == -10.0
+    # Every bucket's own minimum and maximum survive, not just the global ones
+    size = -(-n // buckets)
+    kept = set(dx.tolist())
+    for start in range(0, n, size):
+        block = y[start:start + size]
+        assert x[start + block.argmin()] in kept and x[start + block.argmax()] in kept
+    assert np.array_equal(dy, y[dx.astype(int)])
+
+
+@pytest.mark.parametrize("n, threshold", [(1000, 100), (1001, 3), (50, 49)])
+def test_lttb_keeps_endpoints_and_spikes(n, threshold):
+    x, y = signal(n, seed=1)
+    y[n // 4] = 10.0
+    dx, dy = lttb(x, y, threshold)
+    assert len(dx) == threshold
+    assert dx[0] == x[0] and dx[-1] == x[-1]
+    assert np.all(np.diff(dx) > 0)
+    assert 10.0 in dy.tolist()
+    assert np.array_equal(dy, y[dx.astype(int)])
+
+
+@pytest.mark.parametrize("n", [0, 1, 2, 10])
+def test_small_inputs_pass_through(n):
+    x, y = signal(n)
+    assert minmax_decimate(x, y, 5)[0] is x
+    assert minmax_decimate(x, y, 0)[1] is y
+    assert lttb(x, y, 10)[0] is x
+    assert lttb(x, y, 2)[1] is y
+
+
+def test_visible_slice_includes_one_neighbour_each_side():
+    x = np.arange(0.0, 100.0, 1.0)
+    assert visible_slice(x, 10.5, 20.5) == (10, 22)
+    assert visible_slice(x, 10, 20) == (9, 22)
+    # Clamped at both ends of the data
+    assert visible_slice(x, -50, 3) == (0, 5)
+    assert visible_slice(x, 97.5, 500) == (97, 100)
+    assert visible_slice(x, 200, 300) == (99, 100)
+    assert visible_slice(x[:1], 0, 0) == (0, 1)
+    assert visible_slice(x[:0], 0, 10) == (0, 0)
@@ -0,0 +1,91 @@
+import os
+
+from history_loader import HistoryLoader
+from ingest import CSV_HEADER
+
+
+def write_session(directory, stamp, jumps, device="COM3"):
+    path = os.path.join(str(directory), f"JumpRopeData_{stamp}.csv")
+    rows = [",".join(CSV_HEADER)] + [f"0,60,120,150,95.5,{count},10:00:{index:02d},{device}"
+                                     for index, count in enumerate(jumps)]
+    with open(path, 'w', encoding='utf-8-sig', newline='') as file:
+        file.write("\r\n".join(rows) + "\r\n")
+    return path
+
+
+def load(directory):
+    loader = HistoryLoader(data_dir=str(directory), workers=2)
+    loader.load()
+    assert loader.error is None
+    return loader
+
+
+def test_files_are_published_oldest_first(tmp_path):
+    # Written newest first, so neither creation order nor mtime gives the answer
+    write_session(tmp_path, "20240103_090000", [30, 31])
+    write_session(tmp_path, "20240101_090000", [10, 11, 12])
+    write_session(tmp_path, "20240102_090000", [20])
+    write_session(tmp_path, "20240102_180000", [25, 26])
+
+    loader = load(tmp_path)
+    assert loader.files_total == loader.files_loaded == loader.files_parsed == 4
+    assert loader.records.column("finalJumpCount").tolist() == [10, 11, 12, 20, 25, 26, 30, 31]
+    assert loader.stats.summary(0, "finalJumpCount")["count"] == 8
+
+    # The same order when every file comes from the cache
+    cached = load(tmp_path)
+    assert cached.files_parsed == 0
+    assert cached.records.column("finalJumpCount").tolist() == [10, 11, 12, 20, 25, 26, 30, 31]
+
+
+def test_changed_files_are_parsed_again(tmp_path):
+    first = write_session(tmp_path, "20240101_090000", [10, 11])
+    second = write_session(tmp_path, "20240102_090000", [20, 21])
+    assert load(tmp_path).files_parsed == 2
+
+    # Same size, newer mtime
+    stat = os.stat(second)
+    write_session(tmp_path, "20240102_090000", [28, 29])
+    os.utime(second, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    assert os.path.getsize(second) == stat.st_size
+    loader = load(tmp_path)
+    assert loader.files_parsed == 1
+    assert loader.records.column("finalJumpCount").tolist() == [10, 11, 28, 29]
+
+    # Same mtime, different size
+    stat = os.stat(first)
+    write_session(tmp_path, "20240101_090000", [10, 11, 12])
+    os.utime(first, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    loader = load(tmp_path)
+    assert loader.files_parsed == 1
+    assert loader.records.column("finalJumpCount").tolist() == [10, 11, 12, 28, 29]
+
+    # Removed files drop out of the cache, new ones are parsed
+    os.remove(first)
+    write_session(tmp_path, "20240103_090000", [30], device="COM4")
+    loader = load(tmp_path)
+    assert loader.files_parsed == 1
+    assert loader.records.column("finalJumpCount").tolist() == [28, 29, 30]
+    assert load(tmp_path).files_parsed == 0
+
+
+def test_cached_device_ids_follow_the_registry(tmp_path):
+    write_session(tmp_path, "20240101_090000", [10], device="COM3")
+    write_session(tmp_path, "20240102_090000", [20], device="COM4")
+    load(tmp_path)
+
+    loader = HistoryLoader(data_dir=str(tmp_path))
+    loader.records.devices.id("COM9")  # Ids differ from the ones saved with the cache
+    loader.load()
+    assert loader.files_parsed == 0
+    names = [loader.records.devices.name(device_id) for device_id in loader.records.column("device")]
+    assert names == ["COM3", "COM4"]
+
+
+def test_excluded_file_is_skipped(tmp_path):
+    write_session(tmp_path, "20240101_090000", [10])
+    current = write_session(tmp_path, "20240102_090000", [20])
+    loader = HistoryLoader(data_dir=str(tmp_path), exclude=[current])
+    loader.load()
+    assert loader.files_total == 1
+    assert loader.records.column("finalJumpCount").tolist() == [10]
@@ -0,0 +1,179 @@
+import os
+
+from ingest import IngestPipeline
+from ingest_queue import ENTRY, IngestQueue, QueueConsumer, WriteAheadLog
+from session_archive import SessionArchive
+
+
+def open_log(path, **kwargs):
+    return WriteAheadLog(str(path), **kwargs)
+
+
+def test_recovers_batches_after_a_crash(tmp_path):
+    path = tmp_path / "ingest.wal"
+    wal = open_log(path)
+    wal.append(1.0, "COM3", ["0,60,120,150,95.5,96", "1,30,110,140,80.0,40"])
+    wal.append(2.0, None, ["2,10,100,120,70.0,12"])
+    wal.close()
+
+    batches = open_log(path).recover()
+    assert [(batch.seq, batch.timestamp, batch.device) for batch in batches] == [(1, 1.0, "COM3"), (2, 2.0, None)]
+    assert batches[0].lines == ["0,60,120,150,95.5,96", "1,30,110,140,80.0,40"]
+    assert batches[1].lines == ["2,10,100,120,70.0,12"]
+
+
+def test_torn_tail_is_cut_off(tmp_path):
+    path = tmp_path / "ingest.wal"
+    wal = open_log(path)
+    wal.append(1.0, "COM3", ["first"])
+    wal.append(2.0, "COM3", ["second"])
+    wal.close()
+    size = os.path.getsize(path)
+    with open(path, 'r+b') as file:
+        file.truncate(size - 3)
+
+    wal = open_log(path)
+    assert [batch.lines for batch in wal.recover()] == [["first"]]
+    assert wal.size == os.path.getsize(path) < size - 3
+    # New entries follow the last whole one and survive the next restart
+    wal.append(3.0, "COM4", ["third"])
+    wal.close()
+    assert [batch.lines for batch in open_log(path).recover()] == [["first"], ["third"]]
+
+
+def test_corrupt_entry_ends_the_log(tmp_path):
+    path = tmp_path / "ingest.wal"
+    wal = open_log(path)
+    wal.append(1.0, "COM3", ["first"])
+    wal.append(2.0, "COM3", ["second"])
+    wal.close()
+    with open(path, 'r+b') as file:
+        file.seek(ENTRY.size + 1)
+        file.write(b'X')
+
+    assert open_log(path).recover() == []
+
+
+def test_only_batches_after_the_checkpoint_are_replayed(tmp_path):
+    path = tmp_path / "ingest.wal"
+    wal = open_log(path)
+    for index in range(5):
+        wal.append(float(index), "COM3", [f"line {index}"])
+    wal.flush()
+    wal.checkpoint(3)
+    wal.close()
+
+    wal = open_log(path)
+    assert wal.checkpointed == 3
+    assert [batch.seq for batch in wal.recover()] == [4, 5]
+    assert wal.recover() == []
+    # Numbering continues after the recovered batches
+    assert wal.append(9.0, "COM3", ["next"]) == 6
+    wal.close()
+
+
+def test_log_is_compacted_up_to_the_checkpoint(tmp_path):
+    path = tmp_path / "ingest.wal"
+    wal = open_log(path, max_bytes=1024)
+    line = "0,60,120,150,95.5,96"
+    for index in range(200):
+        wal.append(float(index), "COM3", [line] * 4)
+        if index % 10 == 9:
+            wal.flush()
+            wal.checkpoint(index - 1)  # The newest batch is never durable yet
+    wal.flush()
+    size = wal.size
+    assert wal.compactions
+    assert size == os.path.getsize(path) < 2 * 1024 + 200
+    wal.close()
+
+    wal = open_log(path)
+    assert wal.checkpointed == 198
+    assert [batch.seq for batch in wal.recover()] == [199, 200]
+    wal.close()
+
+
+def test_queue_never_waits_for_the_log(tmp_path):
+    wal = open_log(tmp_path / "ingest.wal")
+    queue = IngestQueue(max_lines=10, wal=wal)
+    assert queue.put("COM3", 1.0, ["a"] * 6)
+    assert queue.put("COM4", 2.0, ["b"] * 6)
+    stats = queue.stats()
+    assert stats["lines"] == 6
+    assert stats["dropped_by_device"] == {"COM3": 6}
+    assert [batch.seq for batch in queue.get_batches()] == [2]
+    assert wal.flush(timeout=5.0)
+    assert wal.written == 2
+    wal.close()
+
+
+def test_drop_newest_rejects_the_incoming_batch():
+    queue = IngestQueue(max_lines=10, policy="drop_newest")
+    assert queue.put("COM3", 1.0, ["a"] * 6)
+    assert not queue.put("COM4", 2.0, ["b"] * 6)
+    assert queue.stats()["dropped_by_device"] == {"COM4": 6}
+    assert [batch.device for batch in queue.get_batches()] == ["COM3"]
+
+
+def test_consumer_replays_and_checkpoints(tmp_path):
+    path = tmp_path / "ingest.wal"
+    wal = open_log(path)
+    wal.append(1.0, "COM3", ["first"])
+    wal.append(2.0, "COM3", ["second"])
+    wal.close()
+
+    handled = []
+    flushed = []
+    wal = open_log(path)
+    consumer = QueueConsumer(IngestQueue(wal=wal), lambda lines, timestamp, device: handled.extend(lines),
+                             on_checkpoint=lambda: flushed.append(list(handled)))
+    assert consumer.replay(wal.recover()) == 2
+    assert handled == ["first", "second"]
+    assert flushed == [["first", "second"]]
+    wal.close()
+
+    # Nothing is replayed a second time
+    assert open_log(path).recover() == []
+
+
+def test_deferred_pipeline_writes_only_when_flushed(tmp_path):
+    archive = SessionArchive(str(tmp_path / "archive"))
+    pipeline = IngestPipeline(data_dir=str(tmp_path), archive=archive, defer_writes=True)
+    pipeline.process_lines(["0,60,120,150,95.5,96", "1,30,110,140,80.0,40"], 1000.0, device="COM3")
+    assert pipeline.writer.stats()["pending"] == 2
+    assert len(archive) == 0
+
+    pipeline.flush()
+    assert pipeline.writer.rows_written == 2
+    assert len(archive) == 2
+    pipeline.close()
+    with open(pipeline.data_file, encoding='utf-8-sig') as file:
+        assert len(file.read().splitlines()) == 3
+
+
+def test_pipeline_can_be_closed_twice(tmp_path):
+    archive = SessionArchive(str(tmp_path / "archive"))
+    pipeline = IngestPipeline(data_dir=str(tmp_path), archive=archive, defer_writes=True)
+    pipeline.process_lines(["0,60,120,150,95.5,96"], 1000.0, device="COM3")
+    pipeline.close()
+    pipeline.close()
+    archive.close()
+    assert len(SessionArchive(str(tmp_path / "archive"))) == 1
+
+
+def test_dropped_batches_are_not_replayed(tmp_path):
+    path = tmp_path / "ingest.wal"
+    wal = open_log(path)
+    queue = IngestQueue(max_lines=10, wal=wal)
+    queue.put("COM3", 1.0, ["a"] * 6)
+    wal.flush()  # The first batch reaches the file before it is dropped
+    queue.put("COM4", 2.0, ["b"] * 6)  # Drops the first batch
+    queue.put("COM3", 3.0, ["c"] * 3)
+    queue.put("COM4", 4.0, ["d"] * 3)  # Drops the second batch, written or not
+    assert queue.stats()["dropped_by_device"] == {"COM3": 6, "COM4": 6}
+    wal.close()
+
+    # Only what was still queued at the crash comes back, in order
+    wal = open_log(path)
+    assert [(batch.seq, batch.lines[0]) for batch in wal.recover()] == [(3, "c"), (4, "d")]
+    wal.close()
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from intensity import DEFAULT_MODEL, IntensityModel, IntensityScorer
+from record_parser import parse_lines
+from record_store import RecordStore
+from running_stats import MetricStats
+
+f32 = np.float32
+
+# (avgHeartRate, maxHeartRate, finalFrequency, finalJumpCount, exerciseDuration) -> level, worked out with
+# calculateIntensityLevel(): ranges 50-255, 50-255, 30-500, 0-10000, 0-6000, weights 0.2, all float32,
+# then constrain((int)(totalScore * 10 + 0.5), 1, 10)
+FIRMWARE_LEVELS = [
+    ((50, 50, 30.0, 0, 0), 1),  # Every metric at its minimum: (int)0.5 = 0, raised to 1
+    ((0, 0, 0.0, 0, 0), 1),  # Below every range
+    ((255, 255, 500.0, 10000, 6000), 10),  # Every metric at its maximum: (int)10.5 = 10
+    ((300, 300, 900.0, 20000, 9000), 10),  # Above every range
+    ((50, 50, 30.0, 10000, 0), 2),  # 0.2 * 10 + 0.5 = 2.5
+    ((50, 50, 30.0, 7500, 0), 2),  # 0.15 * 10 + 0.5 = 2.0000001 in float32
+    ((50, 50, 30.0, 10000, 1500), 3),  # 0.25 * 10 + 0.5 = 3.0000001
+    ((50, 50, 30.0, 1000, 3900), 1),  # 0.02 + 0.13 is just below 0.15 in float32 (2 in double)
+    ((50, 50, 30.0, 6500, 600), 1),  # 0.13 + 0.02, likewise
+    ((152, 152, 265.0, 5000, 3000), 5),  # About half of every range
+    ((255, 255, 500.0, 10000, 0), 8),  # 0.8 * 10 + 0.5 = 8.5
+    ((160, 190, 120.0, 800, 600), 3),  # 0.107 + 0.137 + 0.038 + 0.016 + 0.02 = 0.318
+]
+
+
+def firmware_level(avg_hr, max_hr, frequency, jumps, duration):
+    """calculateIntensityLevel() one scalar at a time, in float32 like the rope"""
+    def normalized(value, low, high):
+        value = min(max(value, low), high)
+        return f32(f32(value) - f32(low)) / f32(high - low)
+
+    weight = f32(0.2)
+    total = f32(0)
+    for value, low, high in ((avg_hr, 50, 255), (max_hr, 50, 255), (frequency, 30, 500),
+                             (jumps, 0, 10000), (duration, 0, 6000)):
+        total = f32(total + f32(normalized(value, low, high) * weight))
+    return min(max(int(float(f32(total * f32(10))) + 0.5), 1), 10)
+
+
+def columns(rows):
+    avg_hr, max_hr, frequency, jumps, duration = zip(*rows)
+    return {"avgHeartRate": np.array(avg_hr, dtype=np.int16), "maxHeartRate": np.array(max_hr, dtype=np.int16),
+            "finalFrequency": np.array(frequency, dtype=np.float64),
+            "finalJumpCount": np.array(jumps, dtype=np.int32),
+            "exerciseDuration": np.array(duration, dtype=np.int32)}
+
+
+@pytest.mark.parametrize("values, level", FIRMWARE_LEVELS)
+def test_matches_firmware_levels(values, level):
+    assert firmware_level(*values) == level
+    assert DEFAULT_MODEL.score(columns([values])).tolist() == [level]
+
+
+def test_matches_firmware_over_a_grid():
+    rows = [(avg_hr, max_hr, frequency, jumps, duration)
+            for avg_hr in (40, 90, 170, 255) for max_hr in (60, 180, 260) for frequency in (20.0, 95.5, 310.0)
+            for jumps in range(0, 10001, 500) for duration in range(0, 6001, 600)]
+    assert DEFAULT_MODEL.score(columns(rows)).tolist() == [firmware_level(*row) for row in rows]
+
+
+def test_custom_weights_and_ranges():
+    model = IntensityModel(ranges={"finalJumpCount": (0, 1000)},
+                           weights={"avgHeartRate": 0, "maxHeartRate": 0, "finalFrequency": 0,
+                                    "exerciseDuration": 0, "finalJumpCount": 1.0})
+    assert model.score(columns([(200, 200, 300.0, jumps, 60) for jumps in (0, 140, 150, 500, 2000)])).tolist() == \
+        [1, 1, 2, 5, 10]
+    with pytest.raises(ValueError):
+        IntensityModel(weights={"calories": 1.0})
+
+
+def record_lines(count, seed):
+    rng = np.random.default_rng(seed)
+    return [f"{rng.integers(0, 3)},{rng.integers(1, 600)},{rng.integers(60, 200)},{rng.integers(60, 220)},"
+            f"{rng.uniform(30, 300):.1f},{rng.integers(0, 3000)}" for _ in range(count)]
+
+
+def test_scores_and_stats_follow_a_growing_store():
+    store = RecordStore()
+    scorer = IntensityScorer()
+    store.append_columns(parse_lines(record_lines(50, 0)).columns)
+    first = scorer.scores(store).copy()
+    stats = scorer.stats(store)
+    assert stats.summary(0, "intensity")["count"] == int((store.column("mode") == 0).sum())
+
+    store.append_columns(parse_lines(record_lines(70, 1)).columns)
+    scores = scorer.scores(store)
+    assert len(scores) == 120
+    assert scores[:50].tolist() == first.tolist()
+    assert scores.tolist() == DEFAULT_MODEL.score({name: store.column(name) for name in columns([(0,) * 5])}).tolist()
+    # Same engine, extended with the new records only
+    assert scorer.stats(store) is stats
+    for mode in range(3):
+        expected = MetricStats("intensity")
+        expected.add_many(scorer.mode_column(store, mode))
+        summary = stats.summary(mode, "intensity")
+        assert summary["count"] == expected.summary()["count"]
+        assert summary["mean"] == pytest.approx(expected.summary()["mean"])
+
+
+def test_new_model_starts_its_own_cache():
+    store = RecordStore()
+    scorer = IntensityScorer()
+    store.append_columns(parse_lines(record_lines(40, 2)).columns)
+    jumps_only = IntensityModel(weights={"avgHeartRate": 0, "maxHeartRate": 0, "finalFrequency": 0,
+                                         "exerciseDuration": 0, "finalJumpCount": 1.0})
+    default_stats = scorer.stats(store)
+    jumps_stats = scorer.stats(store, jumps_only)
+    assert jumps_stats is not default_stats
+    assert scorer.scores(store, jumps_only).tolist() == \
+        jumps_only.score({name: store.column(name) for name in columns([(0,) * 5])}).tolist()
+    # Switching back reuses the cached scores and statistics
+    assert scorer.stats(store) is default_stats
@@ -0,0 +1,123 @@
+import math
+
+import numpy as np
+
+from live_metrics import LiveMetrics, LiveMetricsHub, RingBuffer
+from telemetry import HeartRate, Jump, SessionEnd, SessionStart
+
+
+def jumps(times, first_count=1, valid=True):
+    return [Jump(t_ms, count, valid) for count, t_ms in enumerate(times, start=first_count)]
+
+
+def test_ring_buffer_wraps_around():
+    ring = RingBuffer(4)
+    assert len(ring) == 0 and ring.values().tolist() == []
+    for value in range(3):
+        ring.append(value)
+    assert ring.values().tolist() == [0, 1, 2]
+    for value in range(3, 10):
+        ring.append(value)
+    assert len(ring) == 4
+    assert ring.values().tolist() == [6, 7, 8, 9]
+    # values() is a copy, not a view of the storage
+    values = ring.values()
+    ring.append(10)
+    assert values.tolist() == [6, 7, 8, 9]
+    assert ring.values().tolist() == [7, 8, 9, 10]
+    ring.clear()
+    ring.append(11)
+    assert ring.values().tolist() == [11]
+
+
+def test_window_evicts_old_jumps_and_heart_rates():
+    metrics = LiveMetrics(window_ms=1000, band_rule="window")
+    metrics.add_events([SessionStart(0, 0, 60, 200)] + jumps(range(100, 1001, 100)) + [HeartRate(1000, 100, 100)])
+    assert metrics.cadence == 10 * 60000 / 1000
+    metrics.add_events([HeartRate(1200, 140, 120)])
+    assert metrics.cadence == 8 * 60000 / 1000  # Jumps at 100 and 200 ms are out of the window
+    assert metrics.mean_heart_rate == 120
+
+    # Everything at or before t - window_ms is dropped
+    metrics.add_events([HeartRate(2000, 160, 130)])
+    assert len(metrics.jump_times) == 0
+    assert metrics.cadence == 0
+    assert metrics.mean_heart_rate == 150
+    assert metrics.jumps == 10
+
+
+def test_invalid_jumps_and_events_outside_a_session_are_ignored():
+    metrics = LiveMetrics(window_ms=1000)
+    metrics.add_events(jumps([100, 200]))  # No session yet
+    assert metrics.jumps == 0
+    metrics.add_events([SessionStart(0, 1, 60, 200), Jump(100, 1, False), Jump(200, 2, True), SessionEnd(300, 2)])
+    assert metrics.jumps == 2 and len(metrics.jump_times) == 1
+    assert not metrics.active
+    metrics.add_events(jumps([400], first_count=3))
+    assert metrics.jumps == 2
+
+
+def test_window_band_rule_accumulates_time_per_band():
+    metrics = LiveMetrics(window_ms=1000, band_rule="window")
+    metrics.add_events([SessionStart(0, 0, 60, 200)] + jumps(range(100, 1001, 100)))
+    # 1 jump in the first second is 60/min (in band), 4 jumps are 240/min (above)
+    metrics.add_events([HeartRate(1500, 120, 120), HeartRate(3000, 120, 120), HeartRate(4000, 120, 120)])
+    snapshot = metrics.snapshot()
+    assert snapshot["band"] == "none"
+    assert snapshot["in_band_ms"] == 300
+    assert snapshot["above_ms"] == 2600
+    assert snapshot["below_ms"] == 0
+    assert metrics.band_ms["none"] == 1100
+
+
+def test_firmware_band_rule_uses_cumulative_frequency():
+    # 300 jumps/min for 8 s, then nothing until 20 s
+    events = [SessionStart(0, 0, 60, 200)] + jumps(range(200, 8001, 200))
+    window = LiveMetrics(window_ms=2000, band_rule="window")
+    firmware = LiveMetrics(window_ms=2000, band_rule="firmware")
+    for metrics in (window, firmware):
+        metrics.add_events(events)
+    assert firmware.firmware_frequency == 40 / 8 * 60
+    assert firmware.band == window.band == "above"
+
+    idle = [HeartRate(t_ms, 100, 100) for t_ms in range(9000, 20001, 1000)]
+    for metrics in (window, firmware):
+        metrics.add_events(idle)
+    # The rope keeps judging jumps over the whole session, the window only the last 2 s
+    assert firmware.firmware_frequency == 40 / 20 * 60
+    assert firmware.band == "in"
+    assert window.band == "none"
+    # Below 60/min once enough idle time has passed
+    firmware.add_events([HeartRate(50000, 100, 100)])
+    assert firmware.band == "below"
+    assert firmware.band_ms["below"] == 0 and firmware.band_ms["in"] > 0
+
+
+def test_firmware_frequency_waits_for_five_seconds():
+    metrics = LiveMetrics(band_rule="firmware")
+    metrics.add_events([SessionStart(0, 0, 60, 200)] + jumps(range(100, 5001, 100)))
+    assert metrics.firmware_frequency == 0 and metrics.band == "none"
+    metrics.add_events(jumps([6000], first_count=51))
+    assert metrics.firmware_frequency == 51 / 6 * 60
+    assert metrics.band == "above"
+
+
+def test_samples_are_rate_limited_and_reset_per_session():
+    metrics = LiveMetrics(sample_ms=250, history=8)
+    metrics.add_events([SessionStart(0, 0, 60, 200)] + jumps(range(0, 3001, 50)))
+    times, cadence, heart_rate = metrics.series()
+    assert len(times) == 8  # Ring capacity
+    assert np.all(np.diff(times) >= 0.25)
+    assert math.isnan(heart_rate[-1])
+
+    metrics.add_events([SessionStart(0, 1, 60, 200)])
+    assert len(metrics.series()[0]) == 0
+    assert metrics.sessions == 2
+
+
+def test_hub_keeps_one_engine_per_device():
+    hub = LiveMetricsHub(window_ms=1000)
+    hub.on_events("COM3", [SessionStart(0, 0, 60, 200)] + jumps([100, 200]))
+    hub.on_events("COM4", [SessionStart(0, 0, 60, 200)] + jumps([100]))
+    assert hub.engine("COM3").jumps == 2
+    assert hub.engine().jumps == 1
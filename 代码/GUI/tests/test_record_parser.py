@@ -0,0 +1,28 @@
+import numpy as np
+
+from record_parser import parse_lines
+
+
+def test_parses_valid_lines():
+    batch = parse_lines(["0,60,120,150,95.5,96", "2,30,110,140,80.0,40"], timestamp=1000.0, device=3)
+    assert len(batch) == 2
+    assert batch["finalJumpCount"].tolist() == [96, 40]
+    assert batch["device"].tolist() == [3, 3]
+    assert batch.malformed == []
+
+
+def test_out_of_range_values_are_malformed():
+    lines = ["0,60,40000,150,95.5,96",  # Heart rate does not fit int16
+             "1,60,120,150,95.5,3000000000",  # Jump count does not fit int32
+             "1,60,120,150,95.5,96"]
+    with np.errstate(all="raise"):
+        batch = parse_lines(lines)
+    assert len(batch) == 1
+    assert batch["avgHeartRate"].tolist() == [120]
+    assert batch.malformed == lines[:2]
+
+
+def test_bad_mode_and_text_are_malformed():
+    batch = parse_lines(["3,60,120,150,95.5,96", "0,60,abc,150,95.5,96", "hello"])
+    assert len(batch) == 0
+    assert len(batch.malformed) == 3
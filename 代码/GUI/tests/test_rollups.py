@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from ingest import IngestPipeline
+from record_parser import DeviceRegistry
+from rollups import Roster, RollupStore
+from session_archive import SessionArchive
+
+
+def columns(device_ids, timestamps, jumps):
+    count = len(device_ids)
+    return {"mode": np.zeros(count, dtype=np.int8),
+            "exerciseDuration": np.full(count, 60, dtype=np.int32),
+            "avgHeartRate": np.full(count, 120, dtype=np.int16),
+            "maxHeartRate": np.full(count, 150, dtype=np.int16),
+            "finalFrequency": np.full(count, 90.0),
+            "finalJumpCount": np.array(jumps, dtype=np.int32),
+            "timestamp": np.array(timestamps, dtype=np.float64),
+            "device": np.array(device_ids, dtype=np.int16)}
+
+
+def test_records_keep_the_athlete_assigned_at_their_time(tmp_path):
+    roster = Roster(str(tmp_path / "roster.json"))
+    roster.history = [["COM3", "Alice", 100.0], ["COM3", "Bob", 200.0], ["COM4", "Carol", 0.0]]
+    devices = DeviceRegistry()
+    com3, com4 = devices.id("COM3"), devices.id("COM4")
+
+    rollups = RollupStore(roster=roster)
+    rollups.add_columns(columns([com3, com3, com3, com4], [50.0, 150.0, 250.0, 50.0], [1, 10, 100, 1000]),
+                        devices)
+    assert rollups.totals("COM3").jumps == 1
+    assert rollups.totals("Alice").jumps == 10
+    assert rollups.totals("Bob").jumps == 100
+    assert rollups.totals("Carol").jumps == 1000
+
+
+def test_assignments_are_saved_with_their_history(tmp_path):
+    path = str(tmp_path / "roster.json")
+    roster = Roster(path)
+    roster.assign("COM3", "Alice", "Red")
+    roster.assign("COM3", "Bob")
+    roster.assign("COM3", None)
+
+    loaded = Roster(path)
+    assert loaded.user("COM3") == "COM3"
+    assert loaded.team("Alice") == "Red"
+    times, users = loaded.timeline("COM3")
+    assert users == ["COM3", "Alice", "Bob", "COM3"]
+    assert times[0] == -np.inf and list(times[1:]) == sorted(times[1:])
+
+
+def test_rollups_count_only_what_the_archive_persisted(tmp_path, monkeypatch):
+    archive = SessionArchive(str(tmp_path / "archive"))
+    rollups = RollupStore(str(tmp_path / "rollups.json"))
+    pipeline = IngestPipeline(data_dir=str(tmp_path), archive=archive, rollups=rollups, defer_writes=True)
+    pipeline.process_lines(["0,60,120,150,95.5,96", "1,30,110,140,80.0,40"], 1000.0, device="COM3")
+    assert len(rollups) == 0
+
+    pipeline.flush()
+    assert len(rollups) == len(archive) == 2
+    assert rollups.totals("COM3").jumps == 136
+
+    # A failed archive flush leaves the rollups where the archive is
+    pipeline.process_lines(["2,10,100,120,70.0,12"], 1001.0, device="COM3")
+    def fail():
+        raise OSError("disk full")
+
+    monkeypatch.setattr(archive, "flush", fail)
+    with pytest.raises(OSError):
+        pipeline.flush()
+    assert len(rollups) == 2
+    monkeypatch.undo()
+    pipeline.close()
+    assert len(rollups) == len(archive) == 3
+    assert RollupStore(str(tmp_path / "rollups.json")).totals("COM3").jumps == 148
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from running_stats import PERCENTILES, SKETCH_RANGES, HistogramSketch, MetricStats, RunningStats, StatsEngine
+
+
+@pytest.mark.parametrize("metric", sorted(SKETCH_RANGES))
+def test_percentiles_within_one_bin_of_numpy(metric):
+    low, high, width = SKETCH_RANGES[metric]
+    rng = np.random.default_rng(7)
+    values = np.concatenate((rng.uniform(low, high, 4000), rng.normal((low + high) / 2, (high - low) / 10, 4000)))
+    values = np.clip(values, low, high - 1e-9)
+    sketch = HistogramSketch(low, high, width)
+    sketch.add_many(values)
+    for q in PERCENTILES + (5, 25, 75):
+        assert abs(sketch.percentile(q) - np.percentile(values, q)) <= width
+
+
+def test_out_of_range_values_land_in_the_edge_bins():
+    sketch = HistogramSketch(0, 10, 1)
+    sketch.add_many([-5, -1, 20, 30])
+    sketch.add(99)
+    assert sketch.counts[0] == 2 and sketch.counts[-1] == 3
+    assert sketch.count == 5
+    # MetricStats keeps the estimate inside what was actually seen
+    stats = MetricStats("avgHeartRate")
+    stats.add_many([300, 310, 320])
+    summary = stats.summary()
+    assert 300 <= summary["p50"] <= 320
+
+
+def test_single_value_and_empty_inputs():
+    sketch = HistogramSketch(0, 100, 1)
+    assert sketch.percentile(50) is None
+    sketch.add_many([])
+    assert sketch.count == 0
+
+    stats = MetricStats("finalFrequency")
+    stats.add(42.5)
+    summary = stats.summary()
+    assert summary["count"] == 1
+    assert summary["mean"] == summary["min"] == summary["max"] == 42.5
+    assert summary["std"] == 0.0
+    assert summary["p50"] == summary["p99"] == 42.5
+
+    engine = StatsEngine()
+    engine.add_columns({"mode": np.array([], dtype=np.int8)})
+    assert engine.summary(0, "finalFrequency") is None
+    assert engine.combined_summary(0, "finalFrequency", StatsEngine()) is None
+
+
+def test_chan_merge_matches_a_single_pass():
+    rng = np.random.default_rng(3)
+    values = rng.normal(1e6, 3.0, 10000)  # Large offset, small spread: naive sums lose precision
+    single = RunningStats()
+    for value in values[:500]:
+        single.add(value)
+    single.add_many(values[500:])
+
+    merged = RunningStats()
+    for block in np.array_split(values, 7):
+        part = RunningStats()
+        part.add_many(block)
+        merged.merge(part)
+    merged.merge(RunningStats())  # Merging an empty one changes nothing
+
+    for stats in (single, merged):
+        assert stats.count == len(values)
+        assert stats.mean == pytest.approx(values.mean(), rel=1e-12)
+        assert stats.variance == pytest.approx(values.var(ddof=1), rel=1e-9)
+        assert stats.min == values.min() and stats.max == values.max()
+
+
+def test_engine_combines_modes_and_engines():
+    rng = np.random.default_rng(5)
+    columns = {"mode": rng.integers(0, 3, 3000).astype(np.int8),
+               "finalJumpCount": rng.integers(0, 5000, 3000)}
+    whole = StatsEngine(metrics=("finalJumpCount",))
+    whole.add_columns(columns)
+    parts = [StatsEngine(metrics=("finalJumpCount",)) for _ in range(3)]
+    for part, index in zip(parts, np.array_split(np.arange(3000), 3)):
+        part.add_columns({name: values[index] for name, values in columns.items()})
+
+    for mode in range(3):
+        expected = whole.summary(mode, "finalJumpCount")
+        combined = parts[0].combined_summary(mode, "finalJumpCount", *parts[1:])
+        assert combined["count"] == expected["count"] == int((columns["mode"] == mode).sum())
+        assert combined["mean"] == pytest.approx(expected["mean"])
+        assert combined["std"] == pytest.approx(expected["std"])
+        for q in PERCENTILES:
+            assert combined[f"p{q}"] == expected[f"p{q}"]
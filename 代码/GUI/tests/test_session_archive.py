@@ -0,0 +1,120 @@
+import os
+
+import numpy as np
+
+from ingest import CSV_HEADER
+from record_parser import DTYPES, DeviceRegistry, load_csv_file, parse_lines
+from session_archive import SessionArchive
+
+DAY = 86400.0
+START = 1700000000.0
+
+
+def batch(count, timestamp, device, devices, first_jump=0):
+    lines = [f"{index % 3},{60 + index},120,150,95.5,{first_jump + index}" for index in range(count)]
+    return parse_lines(lines, timestamp, devices.id(device)).columns
+
+
+def filled_archive(path, devices):
+    archive = SessionArchive(str(path), block_records=8)
+    archive.append_columns(batch(20, START, "COM3", devices), devices)
+    archive.append_columns(batch(10, START + DAY, "COM4", devices, first_jump=100), devices)
+    archive.flush()
+    return archive
+
+
+def test_append_and_reopen(tmp_path):
+    devices = DeviceRegistry()
+    devices.id("COM9")  # Registry ids differ from the archive's own
+    archive = filled_archive(tmp_path, devices)
+    assert len(archive) == 30
+    # Blocks hold at most block_records records and never span two days
+    assert all(block["end"] - block["start"] <= 8 for block in archive.blocks)
+    assert len({block["day"] for block in archive.blocks}) == 2
+    archive.close()
+
+    archive = SessionArchive(str(tmp_path), block_records=8)
+    assert len(archive) == 30
+    assert archive.column("finalJumpCount").tolist() == list(range(20)) + list(range(100, 110))
+    assert [archive.devices.name(device_id) for device_id in np.unique(archive.column("device"))] == ["COM3", "COM4"]
+    archive.close()
+
+
+def test_query_filters(tmp_path):
+    devices = DeviceRegistry()
+    archive = filled_archive(tmp_path, devices)
+
+    second_day = archive.query(start=START + DAY / 2)
+    assert second_day["finalJumpCount"].tolist() == list(range(100, 110))
+
+    timer = archive.query(modes=[0])
+    assert (timer["mode"] == 0).all() and len(timer["mode"]) == 7 + 4
+
+    com3 = archive.devices.id("COM3")
+    both = archive.query(end=START + DAY / 2, modes=[1, 2], devices=[com3], names=("finalJumpCount", "device"))
+    assert set(both) == {"finalJumpCount", "device"}
+    assert both["finalJumpCount"].tolist() == [index for index in range(20) if index % 3]
+    assert (both["device"] == com3).all()
+
+    assert len(archive.query(start=START + 2 * DAY)["mode"]) == 0
+    archive.close()
+
+
+def test_torn_tail_is_recovered(tmp_path):
+    devices = DeviceRegistry()
+    archive = filled_archive(tmp_path, devices)
+    archive.close()
+
+    # A crash halfway through a record: one column loses part of its last records
+    jumps = os.path.join(str(tmp_path), "finalJumpCount.bin")
+    itemsize = np.dtype(DTYPES["finalJumpCount"]).itemsize
+    with open(jumps, 'r+b') as file:
+        file.truncate(27 * itemsize + 1)
+
+    archive = SessionArchive(str(tmp_path), block_records=8)
+    assert len(archive) == 27
+    assert archive.blocks[-1]["end"] == 27
+    for name in DTYPES:
+        assert len(archive.column(name)) == 27
+        assert os.path.getsize(os.path.join(str(tmp_path), f"{name}.bin")) == 27 * np.dtype(DTYPES[name]).itemsize
+    assert archive.query(start=START + DAY / 2)["finalJumpCount"].tolist() == list(range(100, 107))
+
+    # Appending continues right after the recovered records
+    archive.append_columns(batch(2, START + DAY, "COM4", devices, first_jump=200), devices)
+    archive.close()
+    archive = SessionArchive(str(tmp_path), block_records=8)
+    assert archive.column("finalJumpCount")[-3:].tolist() == [106, 200, 201]
+    archive.close()
+
+
+def test_records_past_the_index_are_indexed(tmp_path):
+    devices = DeviceRegistry()
+    archive = SessionArchive(str(tmp_path), block_records=8)
+    archive.append_columns(batch(5, START, "COM3", devices), devices)
+    archive.flush()
+    # Column data reaches the disk but the process dies before the index is saved
+    archive.append_columns(batch(5, START, "COM3", devices, first_jump=5), devices)
+    for file in archive._files.values():
+        file.flush()
+
+    reopened = SessionArchive(str(tmp_path), block_records=8)
+    assert len(reopened) == 10
+    assert reopened.query(start=START)["finalJumpCount"].tolist() == list(range(10))
+    reopened.close()
+    archive.close()
+
+
+def test_export_matches_the_session_file_format(tmp_path):
+    devices = DeviceRegistry()
+    archive = filled_archive(tmp_path / "archive", devices)
+    path = str(tmp_path / "JumpRopeData_export.csv")
+    assert archive.export_csv(path, modes=[1]) == 7 + 3
+    with open(path, encoding='utf-8-sig') as file:
+        assert file.readline().rstrip() == ",".join(CSV_HEADER)
+
+    # Session files and exports load back the same way
+    exported = load_csv_file(path, devices).columns
+    expected = archive.query(modes=[1])
+    for name in ("finalJumpCount", "timestamp", "device"):
+        assert exported[name].tolist() == expected[name].tolist()
+    archive.close()
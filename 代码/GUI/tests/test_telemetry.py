@@ -0,0 +1,85 @@
+from record_parser import parse_lines
+from telemetry import FrameDecoder, HeartRate, Jump, SessionEnd, SessionStart, encode_event
+
+SUMMARY = "0,60,120,150,95.5,96"
+
+
+def stream():
+    """A session as the rope sends it with streaming on: frames between text lines"""
+    events = [SessionStart(0, 0, 60, 200), Jump(400, 1, 1), HeartRate(450, 118, 117), Jump(800, 2, 1),
+              SessionEnd(275, 49)]
+    data = b"Mode selected\r\n"
+    # Sequence numbers wrap; SessionEnd gets seq 3, whose CRC ends in the first sync byte
+    for seq, event in enumerate(events, start=255):
+        data += encode_event(event, seq)
+    return data + (SUMMARY + "\r\n").encode(), events
+
+
+def decode(chunks):
+    events = []
+    decoder = FrameDecoder(on_events=events.extend)
+    lines = []
+    for chunk in chunks:
+        lines.extend(decoder.feed(chunk))
+    return lines, events, decoder
+
+
+def test_whole_stream():
+    data, expected = stream()
+    lines, events, decoder = decode([data])
+    assert lines == ["Mode selected", SUMMARY]
+    assert events == expected
+    assert decoder.frames == len(expected)
+    assert decoder.crc_errors == decoder.lost_frames == 0
+    assert decoder.pending() == 0
+
+
+def test_split_at_every_offset():
+    data, expected = stream()
+    for offset in range(len(data) + 1):
+        lines, events, _ = decode([data[:offset], data[offset:]])
+        assert lines == ["Mode selected", SUMMARY], offset
+        assert events == expected, offset
+
+
+def test_byte_at_a_time():
+    data, expected = stream()
+    lines, events, _ = decode([data[i:i + 1] for i in range(len(data))])
+    assert lines == ["Mode selected", SUMMARY]
+    assert events == expected
+
+
+def test_chunk_ending_with_crc_byte_equal_to_sync():
+    # The CRC of this frame ends in 0xA5; that byte belongs to the frame, not to the next line
+    frame = encode_event(SessionEnd(275, 49), 3)
+    assert frame[-1] == 0xA5
+    lines, events, _ = decode([frame, (SUMMARY + "\r\n").encode()])
+    assert events == [SessionEnd(275, 49)]
+    assert lines == [SUMMARY]
+    assert len(parse_lines(lines)) == 1
+
+
+def test_crc_failure_skips_frame_and_keeps_next_line():
+    frame = bytearray(encode_event(Jump(400, 1, 1), 0))
+    frame[7] ^= 0xFF  # Damage the payload
+    data = bytes(frame) + (SUMMARY + "\r\n").encode() + encode_event(Jump(800, 2, 1), 1)
+    lines, events, decoder = decode([data])
+    assert decoder.crc_errors == 1
+    assert lines == [SUMMARY]
+    assert events == [Jump(800, 2, 1)]
+
+
+def test_damaged_length_resyncs_on_next_frame():
+    frame = bytearray(encode_event(Jump(400, 1, 1), 0))
+    frame[4] = 200  # Claims a much longer payload, swallowing the next frame
+    data = bytes(frame) + encode_event(Jump(800, 2, 1), 1) + b"\x00" * 200
+    lines, events, decoder = decode([data])
+    assert decoder.crc_errors == 1
+    assert events == [Jump(800, 2, 1)]
+
+
+def test_sequence_gap_counts_lost_frames():
+    data = encode_event(Jump(400, 1, 1), 5) + encode_event(Jump(800, 2, 1), 8)
+    _, events, decoder = decode([data])
+    assert len(events) == 2
+    assert decoder.lost_frames == 2
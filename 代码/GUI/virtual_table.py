@@ -0,0 +1,75 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class VirtualTable(tk.Frame):
+    """Treeview that only holds the rows currently in view.
+
+    Rows are fetched on demand with row_fn(index) from a data source of
+    row_count_fn() rows, so the widget stays the same size however much
+    data there is. While scrolled to the bottom the table follows new rows.
+    """
+
+    def __init__(self, parent, columns, row_count_fn, row_fn, height=10, **kwargs):
+        tk.Frame.__init__(self, parent, **kwargs)
+        self.row_count_fn = row_count_fn
+        self.row_fn = row_fn
+        self.height = height
+        self.top = 0  # Index of the first visible row
+        self.follow = True  # Keep showing the newest rows
+        self._shown = None  # (top, total) last rendered
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=height)
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=100, anchor=tk.CENTER)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill="y")
+        self.tree.pack(side=tk.LEFT, fill="both", expand=True)
+
+        # Fixed pool of row items that get their values replaced on scroll
+        self._items = [self.tree.insert("", tk.END, values=()) for _ in range(height)]
+
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-1))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(1))
+
+    def refresh(self, force=False):
+        """Re-render the visible rows if the data or the scroll position changed"""
+        total = self.row_count_fn()
+        if self.follow:
+            self.top = max(total - self.height, 0)
+        self.top = min(self.top, max(total - self.height, 0))
+        if not force and self._shown == (self.top, total):
+            return
+        self._shown = (self.top, total)
+
+        for offset, item in enumerate(self._items):
+            index = self.top + offset
+            self.tree.item(item, values=self.row_fn(index) if index < total else ())
+
+        if total:
+            self.scrollbar.set(self.top / total, min(self.top + self.height, total) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll(self, rows):
+        """Scroll by a number of rows (negative is up)"""
+        self.scroll_to(self.top + rows)
+
+    def scroll_to(self, top):
+        total = self.row_count_fn()
+        last_top = max(total - self.height, 0)
+        self.top = min(max(int(top), 0), last_top)
+        self.follow = self.top >= last_top
+        self.refresh()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(amount) * self.row_count_fn())
+        elif action == "scroll":
+            step = self.height if unit == "pages" else 1
+            self.scroll(int(amount) * step)
+
+    def _on_mousewheel(self, event):
+        self.scroll(-1 if event.delta > 0 else 1)
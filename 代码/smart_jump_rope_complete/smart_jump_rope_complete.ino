@@ -61,6 +61,20 @@ unsigned long lastVibrationTime = 0;
 bool isVibrating = false;
 int currentVibInterval = 0;
 
+// ------------------- 遥测流（二进制帧）相关定义 ------------------- //
+// 帧格式: 0xA5 0x5A | 类型 | 序号 | 长度 | 数据(长度字节) | CRC16
+// CRC16 为 CRC-16/CCITT-FALSE（多项式0x1021，初值0xFFFF），覆盖类型、序号、长度和数据，低字节在前
+// 数据字段均为小端；时间为本次运动开始后的毫秒数。上位机发送 'T' 开启、't' 关闭
+const uint8_t FRAME_SYNC1 = 0xA5;
+const uint8_t FRAME_SYNC2 = 0x5A;
+const uint8_t FRAME_SESSION_START = 1;  // 时间(u32) 模式(i8) 最低频率(u16) 最高频率(u16)
+const uint8_t FRAME_JUMP = 2;           // 时间(u32) 计数(u16) 是否有效(u8)
+const uint8_t FRAME_HEART_RATE = 3;     // 时间(u32) 瞬时心率(u8) 平均心率(u8)
+const uint8_t FRAME_SESSION_END = 4;    // 时间(u32) 计数(u16)
+
+bool telemetryEnabled = false;  // 是否发送遥测帧（默认关闭，只发送总结行）
+uint8_t telemetrySeq = 0;       // 帧序号，用于上位机检测丢帧
+
 // ------------------- 霍尔与运动变量（含心率相关） ------------------- //
 int hallValue;             // 当前霍尔值
 int lastHallValue;         // 上一次霍尔值
@@ -144,6 +158,7 @@ void setup() {
 }
 
 void loop() {
+  handleSerialCommands(); // 处理上位机命令
   handleEncoderInput();  // 处理编码器输入
 
   // 运动模式下，实时更新跳绳计数与心率
@@ -249,6 +264,7 @@ void handleButtonPress() {
       avgHeartRate = 0;
       maxHeartRate = 0;
       minHeartRate = 255;
+      sendSessionStartFrame();
       break;
     case SET_MIN_FREQ:
     case SET_MAX_FREQ:
@@ -265,6 +281,7 @@ void handleButtonPress() {
       finalFrequency = (exerciseDuration > 0) ? (float)finalJumpCount / exerciseDuration * 60 : 0;
       // 计算运动期间心率统计值
       calculateHeartRateStats();
+      sendSessionEndFrame();
       
       // 向串口发送数据包：模式,运动时间,平均心率,最大心率,跳绳频率,跳绳次数
       Serial.print(currentExerciseMode);
@@ -347,6 +364,10 @@ void handleModeSelection() {
       currentState = SET_TARGET_COUNT;
       break;
   }
+  // 目标计数模式在设定目标后才开始
+  if (currentSelection != 2) {
+    sendSessionStartFrame();
+  }
 }
 
 // ------------------- 跳绳计数与有效性检测 ------------------- //
@@ -359,6 +380,7 @@ void getJumpCount() {
     if (hallValue == 1) {  // 高电平跳变（触发计数）
       if (isValid) jumpCount++;
       lastJumpTime = currentTime; // 记录动作时间
+      sendJumpFrame(currentTime - exerciseStartTime, isValid);
     }
     lastHallValue = hallValue;
   }
@@ -442,10 +464,92 @@ void updateHeartRate() {
       if (heartRateIndex < HEART_RATE_BUFFER_SIZE) {
         heartRateBuffer[heartRateIndex++] = beatAvg;
       }
+      sendHeartRateFrame(millis() - exerciseStartTime, (uint8_t)beatsPerMinute, (uint8_t)beatAvg);
     }
   }
 }
 
+// ------------------- 遥测帧发送 ------------------- //
+void handleSerialCommands() {
+  while (Serial.available() > 0) {
+    int command = Serial.read();
+    if (command == 'T') {
+      telemetryEnabled = true;
+    } else if (command == 't') {
+      telemetryEnabled = false;
+    }
+  }
+}
+
+uint16_t crc16Update(uint16_t crc, uint8_t data) {
+  crc ^= (uint16_t)data << 8;
+  for (uint8_t i = 0; i < 8; i++) {
+    crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+  }
+  return crc;
+}
+
+void putU16(uint8_t* buffer, uint16_t value) {
+  buffer[0] = value & 0xFF;
+  buffer[1] = value >> 8;
+}
+
+void putU32(uint8_t* buffer, uint32_t value) {
+  for (uint8_t i = 0; i < 4; i++) {
+    buffer[i] = (value >> (8 * i)) & 0xFF;
+  }
+}
+
+// 一次性写出整帧，避免与总结行交错
+void sendTelemetryFrame(uint8_t type, const uint8_t* payload, uint8_t length) {
+  if (!telemetryEnabled) return;
+  uint8_t frame[5 + 16 + 2];
+  frame[0] = FRAME_SYNC1;
+  frame[1] = FRAME_SYNC2;
+  frame[2] = type;
+  frame[3] = telemetrySeq++;
+  frame[4] = length;
+  memcpy(frame + 5, payload, length);
+  uint16_t crc = 0xFFFF;
+  for (uint8_t i = 2; i < 5 + length; i++) {
+    crc = crc16Update(crc, frame[i]);
+  }
+  putU16(frame + 5 + length, crc);
+  Serial.write(frame, 5 + length + 2);
+}
+
+void sendSessionStartFrame() {
+  uint8_t payload[9];
+  putU32(payload, 0);
+  payload[4] = (uint8_t)(int8_t)currentExerciseMode;
+  putU16(payload + 5, minFreq);
+  putU16(payload + 7, maxFreq);
+  sendTelemetryFrame(FRAME_SESSION_START, payload, sizeof(payload));
+}
+
+void sendJumpFrame(unsigned long elapsedMs, bool isValid) {
+  uint8_t payload[7];
+  putU32(payload, elapsedMs);
+  putU16(payload + 4, jumpCount);
+  payload[6] = isValid ? 1 : 0;
+  sendTelemetryFrame(FRAME_JUMP, payload, sizeof(payload));
+}
+
+void sendHeartRateFrame(unsigned long elapsedMs, uint8_t bpm, uint8_t avg) {
+  uint8_t payload[6];
+  putU32(payload, elapsedMs);
+  payload[4] = bpm;
+  payload[5] = avg;
+  sendTelemetryFrame(FRAME_HEART_RATE, payload, sizeof(payload));
+}
+
+void sendSessionEndFrame() {
+  uint8_t payload[6];
+  putU32(payload, exerciseEndTime - exerciseStartTime);
+  putU16(payload + 4, finalJumpCount);
+  sendTelemetryFrame(FRAME_SESSION_END, payload, sizeof(payload));
+}
+
 // ------------------- 计算心率统计值 ------------------- //
 void calculateHeartRateStats() {
   if (heartRateIndex == 0) return; // 无心率数据